@@ -2,20 +2,37 @@ from dash import Dash, html, Output, Input
 import dash_bootstrap_components as dbc
 from layouts import create_layout, get_file_upload, get_data_display, get_sankey_section, get_taxonomy_analysis_section
 from callbacks import register_callbacks
+from data_store import create_store
+from uploads import register_upload_routes
+from metrics import instrument_callbacks
+from log_config import configure_logging
+from watcher import start_watcher
 from info_layouts import get_about_section, get_how_to_use_section  # Import new layouts
 
+# Log levels, format and sampling come from DASHBOARD_LOG_* variables
+configure_logging()
+
 # Initialize the app
 app = Dash(__name__, external_stylesheets=[dbc.themes.CYBORG, dbc.icons.BOOTSTRAP], suppress_callback_exceptions=True)
 server = app.server
 
-# Global variable for uploaded data
-uploaded_data = {}
+# Session-keyed store for uploaded data (backend set by DASHBOARD_STORE)
+dataset_store = create_store()
+
+# Define app layout (a function, so every page load gets its own session id)
+app.layout = create_layout
 
-# Define app layout
-app.layout = create_layout()
+# Chunked upload endpoint; files are spooled to disk instead of sent through callbacks
+register_upload_routes(server)
 
 # Register callbacks
-register_callbacks(app, uploaded_data)
+register_callbacks(app, dataset_store)
+
+# Per-callback latency and payload metrics, served at /metrics
+instrument_callbacks(app)
+
+# Ingests new workflow outputs from DASHBOARD_WATCH_DIR, if set
+start_watcher()
 
 # Callback to switch tabs and ensure correct components are loaded
 @app.callback(
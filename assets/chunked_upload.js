@@ -0,0 +1,138 @@
+// Streams files dropped on or picked from a `.chunked-upload` zone to the
+// /upload endpoint in slices, then hands the resulting upload handle to Dash
+// through the zone's `<id>-handle` store (a list of handles when the zone
+// accepts multiple files). The file never goes through a base64 data URI or
+// a callback payload.
+(function () {
+    var CHUNK_BYTES = 8 * 1024 * 1024;
+    var PARALLEL_FILES = 4;
+
+    function newUploadId() {
+        if (window.crypto && window.crypto.randomUUID) {
+            return window.crypto.randomUUID();
+        }
+        return 'u' + Date.now().toString(16) + Math.random().toString(16).slice(2, 18);
+    }
+
+    function setStatus(zone, text) {
+        var statusId = zone.getAttribute('data-status-id');
+        if (statusId && window.dash_clientside && window.dash_clientside.set_props) {
+            window.dash_clientside.set_props(statusId, {children: text});
+        }
+    }
+
+    function postChunk(uploadId, file, offset, attempt) {
+        var chunk = file.slice(offset, offset + CHUNK_BYTES);
+        return fetch('/upload/' + uploadId + '/chunk?offset=' + offset, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/octet-stream'},
+            body: chunk
+        }).then(function (response) {
+            if (!response.ok) {
+                throw new Error('HTTP ' + response.status);
+            }
+            return response.json();
+        }).catch(function (error) {
+            if (attempt >= 3) {
+                throw error;
+            }
+            return postChunk(uploadId, file, offset, attempt + 1);
+        });
+    }
+
+    function uploadFile(zone, file) {
+        var uploadId = newUploadId();
+        var offset = 0;
+        var sent = false;
+
+        function next() {
+            if (sent && offset >= file.size) {
+                return fetch('/upload/' + uploadId + '/complete', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({filename: file.name})
+                }).then(function (response) {
+                    if (!response.ok) {
+                        throw new Error('HTTP ' + response.status);
+                    }
+                    return response.json();
+                });
+            }
+            return postChunk(uploadId, file, offset, 0).then(function (result) {
+                sent = true;
+                offset = Math.max(result.received, Math.min(offset + CHUNK_BYTES, file.size));
+                setStatus(zone, 'Uploading ' + file.name + '... ' + Math.floor(100 * offset / Math.max(file.size, 1)) + '%');
+                return next();
+            });
+        }
+
+        setStatus(zone, 'Uploading ' + file.name + '...');
+        return next();
+    }
+
+    function uploadFiles(zone, fileList) {
+        var multiple = zone.getAttribute('data-multiple') === 'true';
+        var files = Array.prototype.slice.call(fileList, 0, multiple ? fileList.length : 1);
+        var infos = [];
+        var position = 0;
+
+        // A few files in flight at once; each file's chunks still go in order
+        function worker() {
+            if (position >= files.length) {
+                return Promise.resolve();
+            }
+            var index = position++;
+            return uploadFile(zone, files[index]).then(function (info) {
+                infos[index] = info;
+                setStatus(zone, 'Uploaded ' + infos.filter(Boolean).length + ' of ' + files.length + ' files');
+                return worker();
+            });
+        }
+
+        var workers = [];
+        for (var i = 0; i < Math.min(PARALLEL_FILES, files.length); i++) {
+            workers.push(worker());
+        }
+        Promise.all(workers).then(function () {
+            window.dash_clientside.set_props(zone.id + '-handle', {data: multiple ? infos : infos[0]});
+        }).catch(function (error) {
+            setStatus(zone, 'Error uploading: ' + error.message);
+        });
+    }
+
+    function findZone(target) {
+        return target && target.closest ? target.closest('.chunked-upload') : null;
+    }
+
+    document.addEventListener('click', function (event) {
+        var zone = findZone(event.target);
+        if (!zone) {
+            return;
+        }
+        var input = document.createElement('input');
+        input.type = 'file';
+        input.multiple = zone.getAttribute('data-multiple') === 'true';
+        var accept = zone.getAttribute('data-accept');
+        if (accept) {
+            input.accept = accept;
+        }
+        input.addEventListener('change', function () {
+            uploadFiles(zone, input.files);
+        });
+        input.click();
+    });
+
+    document.addEventListener('dragover', function (event) {
+        if (findZone(event.target)) {
+            event.preventDefault();
+        }
+    });
+
+    document.addEventListener('drop', function (event) {
+        var zone = findZone(event.target);
+        if (zone) {
+            event.preventDefault();
+            uploadFiles(zone, event.dataTransfer.files);
+        }
+    });
+})();
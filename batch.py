@@ -0,0 +1,188 @@
+"""
+Pre-render a dataset bundle from a workflow output directory.
+
+Finds the Summary workbooks and Kraken2 reports below a results
+directory, ingests them in parallel worker processes and writes the
+Parquet datasets together with the default Kraken figures as JSON:
+
+    python batch.py /data/runs/2024-05-01 --output /data/bundles/2024-05-01
+
+The dashboard opens the result by path ("Open a batch bundle"), without
+uploading or parsing anything. Paths typed there are relative to
+DASHBOARD_BUNDLE_DIR.
+"""
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bundle import BUNDLE_MANIFEST, BUNDLE_VERSION, DATASETS_DIR, FIGURES_DIR
+from ingest import ingest_kraken_report, ingest_workbook, load_kraken_report, load_report_aggregates
+from kraken_bar_plot import plot_rank_compositions
+from kraken_compare import build_abundance_table, plot_kraken_comparison
+from kraken_report import kraken_sample_label
+from log_config import configure_logging
+from sankey_plot_fixed import build_sankey_from_aggregates
+from taxonomy_tree import TOP_NODE, load_taxonomy_tree, taxonomy_sunburst
+
+
+WORKBOOK_PATTERNS = ['*.xlsx', '*.xls']
+KRAKEN_PATTERNS = ['*kraken2*.tsv', '*kraken*report*.txt', '*.kreport', '*.kreport2']
+
+# Control defaults of the Taxonomy Analysis tab, so the first view is a cache hit
+KRAKEN_BAR_TOP_N = 10
+COMPARISON_DEFAULTS = [('S', 'bar', 15)]
+
+logger = logging.getLogger('dashboard.batch')
+
+
+def find_workflow_outputs(results_dir, workbook_patterns=WORKBOOK_PATTERNS, kraken_patterns=KRAKEN_PATTERNS):
+    """
+    List the workbooks and Kraken reports below a results directory.
+
+    Hidden directories and Excel lock files (~$...) are skipped.
+
+    Returns:
+        Tuple of (workbook paths, report paths), each sorted.
+    """
+    workbooks, reports = [], []
+    for dirpath, dirnames, filenames in os.walk(results_dir):
+        dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+        for name in filenames:
+            if name.startswith(('~$', '.')):
+                continue
+            path = os.path.join(dirpath, name)
+            if any(fnmatch.fnmatch(name, pattern) for pattern in workbook_patterns):
+                workbooks.append(path)
+            elif any(fnmatch.fnmatch(name, pattern) for pattern in kraken_patterns):
+                reports.append(path)
+    return sorted(workbooks), sorted(reports)
+
+
+def render_kraken_figures(dataset_dir, label):
+    """
+    Figures of one Kraken sample, as (figure cache key, figure JSON) pairs.
+
+    The keys are the ones the Taxonomy Analysis callbacks look up.
+    """
+    dataset_id = os.path.basename(dataset_dir)
+    aggregates = load_report_aggregates(dataset_dir)
+    sankey_fig, _ = build_sankey_from_aggregates(aggregates, sample_name=label)
+    explorer_fig = taxonomy_sunburst(load_taxonomy_tree(dataset_dir), TOP_NODE, sample_name=label)
+    return [
+        (['kraken-bar', dataset_id, KRAKEN_BAR_TOP_N], plot_rank_compositions(aggregates.rank_compositions(KRAKEN_BAR_TOP_N), KRAKEN_BAR_TOP_N).to_json()),
+        (['sankey', dataset_id, label], sankey_fig.to_json()),
+        (['taxonomy', dataset_id, label, TOP_NODE], explorer_fig.to_json()),
+    ]
+
+
+def _ingest(kind, path, data_dir):
+    ingest = ingest_workbook if kind == 'workbook' else ingest_kraken_report
+    return ingest(path, filename=os.path.basename(path), data_dir=data_dir)
+
+
+def write_bundle(results_dir, output_dir, max_workers=None):
+    """
+    Ingest a workflow output directory into a bundle the dashboard can open.
+
+    Files that fail to parse are listed under 'errors' in the manifest
+    instead of stopping the run.
+
+    Args:
+        results_dir (str): Workflow output directory to search.
+        output_dir (str): Bundle directory; datasets already in it are reused.
+        max_workers (int): Worker processes; defaults to the number of cores.
+    Returns:
+        dict: The manifest written to <output_dir>/bundle.json.
+    """
+    workbooks, reports = find_workflow_outputs(results_dir)
+    logger.info("Found %d workbook(s) and %d Kraken report(s) in %s", len(workbooks), len(reports), results_dir)
+
+    data_dir = os.path.join(output_dir, DATASETS_DIR)
+    figures_dir = os.path.join(output_dir, FIGURES_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(figures_dir, exist_ok=True)
+
+    datasets, errors = {}, []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_ingest, 'workbook', path, data_dir): path for path in workbooks}
+        futures.update({pool.submit(_ingest, 'kraken', path, data_dir): path for path in reports})
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                datasets[path] = future.result()
+                logger.info("Ingested %s", path)
+            except Exception as e:
+                logger.error("Could not ingest %s: %s", path, e)
+                errors.append({'source': os.path.relpath(path, results_dir), 'error': str(e)})
+
+        def entry(path, label):
+            return {'label': label, 'source': os.path.relpath(path, results_dir),
+                    'dataset': os.path.relpath(datasets[path], output_dir)}
+
+        workbook_entries = [entry(path, os.path.relpath(path, results_dir)) for path in workbooks if path in datasets]
+        kraken_entries = []
+        labels = {}
+        for path in reports:
+            if path in datasets:
+                label = kraken_sample_label(os.path.basename(path), labels)
+                labels[label] = datasets[path]
+                kraken_entries.append(entry(path, label))
+
+        figures = []
+        rendered = [pool.submit(render_kraken_figures, dataset_dir, label) for label, dataset_dir in labels.items()]
+        for future in rendered:
+            figures.extend(future.result())
+
+    if labels:
+        kraken_ids = tuple(sorted((label, os.path.basename(dataset_dir)) for label, dataset_dir in labels.items()))
+        abundance = build_abundance_table({label: load_kraken_report(dataset_dir) for label, dataset_dir in labels.items()})
+        for rank, plot_type, top_n in COMPARISON_DEFAULTS:
+            fig = plot_kraken_comparison(abundance, rank=rank, top_n=top_n, plot_type=plot_type)
+            figures.append((['kraken-comparison', kraken_ids, rank, plot_type, top_n], fig.to_json()))
+
+    figure_entries = []
+    for i, (key, figure_json) in enumerate(figures):
+        file_name = os.path.join(FIGURES_DIR, f'{i}.json')
+        with open(os.path.join(output_dir, file_name), 'w') as fh:
+            fh.write(figure_json)
+        figure_entries.append({'key': key, 'file': file_name})
+
+    manifest = {
+        'version': BUNDLE_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'results_dir': os.path.abspath(results_dir),
+        'workbooks': workbook_entries,
+        'kraken': kraken_entries,
+        'figures': figure_entries,
+        'errors': errors,
+    }
+    # Written last, so a bundle without its manifest is an unfinished run
+    with open(os.path.join(output_dir, BUNDLE_MANIFEST), 'w') as fh:
+        json.dump(manifest, fh, indent=1)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('results_dir', help='workflow output directory to search')
+    parser.add_argument('--output', '-o', required=True, help='bundle directory to write')
+    parser.add_argument('--workers', type=int, help='worker processes (default: number of cores)')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    if not os.path.isdir(args.results_dir):
+        parser.error(f"{args.results_dir} is not a directory")
+    manifest = write_bundle(args.results_dir, args.output, args.workers)
+    logger.info("Wrote %s: %d workbook(s), %d Kraken report(s), %d figure(s), %d error(s)",
+                args.output, len(manifest['workbooks']), len(manifest['kraken']),
+                len(manifest['figures']), len(manifest['errors']))
+    return 1 if manifest['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
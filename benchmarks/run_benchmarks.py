@@ -0,0 +1,354 @@
+"""
+Benchmarks for the ingest and plotting hot paths.
+
+Runs offline against synthetic data (see synthetic.py) and writes the
+timings and peak memory of each case to a JSON file, so results from
+different commits or deploys can be compared:
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --quick --compare bench.json
+
+Callbacks are timed end to end through Dash's /_dash-update-component
+endpoint, so request parsing and response serialization are included.
+Peak memory is the tracemalloc high-water mark of a separate run; it
+covers Python and NumPy allocations but not Arrow's own allocator, nor
+the ingest worker processes.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import synthetic  # noqa: E402
+
+
+WORKBOOK_SAMPLES = [10, 1_000, 10_000]
+KRAKEN_LINES = [1_000, 100_000]
+QUICK_WORKBOOK_SAMPLES = [10, 1_000]
+QUICK_KRAKEN_LINES = [1_000]
+
+SESSION_ID = 'benchmark'
+JOB_TIMEOUT_SECONDS = 600
+
+
+class DashClient:
+    """Calls callbacks of the dashboard through its HTTP endpoint."""
+
+    def __init__(self, app):
+        self.app = app
+        self.client = app.server.test_client()
+        self._callbacks = {}
+        for output, spec in app.callback_map.items():
+            fn = getattr(spec['callback'], '__wrapped__', spec['callback'])
+            self._callbacks[fn.__name__] = output
+
+    def upload(self, data, filename):
+        """Send a file through the chunked upload routes and return its handle info."""
+        upload_id = uuid.uuid4().hex
+        chunk_size = 8 * 1024 * 1024
+        for offset in range(0, max(len(data), 1), chunk_size):
+            self.client.post(f'/upload/{upload_id}/chunk?offset={offset}', data=data[offset:offset + chunk_size])
+        return self.client.post(f'/upload/{upload_id}/complete', json={'filename': filename}).get_json()
+
+    def call(self, name, inputs, state=(), changed=None):
+        """
+        Run a callback by function name.
+
+        Args:
+            name (str): Callback function name.
+            inputs (list): (component_id, property, value) of every input.
+            state (list): (component_id, property, value) of every state.
+            changed (str): Id of the input that triggered; the first input if None.
+        Returns:
+            Tuple of (response dict, response size in bytes).
+        """
+        output = self._callbacks[name]
+        multi = output.startswith('..')
+        outputs = [
+            {'id': item.rsplit('.', 1)[0], 'property': item.rsplit('.', 1)[1].split('@')[0]}
+            for item in (output.strip('.').split('...') if multi else [output])
+        ]
+        changed = changed or inputs[0][0]
+        body = {
+            'output': output,
+            'outputs': outputs if multi else outputs[0],
+            'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+            'state': [{'id': i, 'property': p, 'value': v} for i, p, v in state],
+            'changedPropIds': [f'{i}.{p}' for i, p, _ in inputs if i == changed],
+        }
+        response = self.client.post('/_dash-update-component', json=body)
+        if response.status_code == 204:
+            return None, 0
+        if response.status_code != 200:
+            raise RuntimeError(f'{name} failed: {response.get_data(as_text=True)[:500]}')
+        return response.get_json()['response'], len(response.get_data())
+
+
+def measure(fn, repeat, setup=None):
+    """
+    Time fn over several runs after a warm-up, then run it once more under
+    tracemalloc.
+
+    Args:
+        fn (callable): The code to time; may return extra fields to record.
+        repeat (int): Number of timed runs.
+        setup (callable): Called before every run, outside the timing.
+    Returns:
+        dict with the run times in seconds, their summary and the peak bytes.
+    """
+    # One untimed run first, so imports and first-call setup are not counted
+    if setup:
+        setup()
+    fn()
+
+    times = []
+    extra = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        extra = fn()
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'times': times,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'peak_bytes': peak,
+    }
+    if isinstance(extra, dict):
+        result.update(extra)
+    return result
+
+
+def wait_for_job(client, name, trigger, job_store, poll, session_id=SESSION_ID):
+    """Start an ingest callback, then poll it until the job finishes."""
+    handle_id, handle = trigger
+    response, _ = client.call(name, [(handle_id, 'data', handle), (poll, 'n_intervals', None)],
+                              [(job_store, 'data', None), ('session-id', 'data', session_id)])
+    job = response[job_store]['data']
+    deadline = time.time() + JOB_TIMEOUT_SECONDS
+    n = 0
+    while time.time() < deadline:
+        time.sleep(0.02)
+        n += 1
+        response, _ = client.call(name, [(handle_id, 'data', handle), (poll, 'n_intervals', n)],
+                                  [(job_store, 'data', job), ('session-id', 'data', session_id)], changed=poll)
+        if response and response.get(poll, {}).get('disabled'):
+            return response
+    raise TimeoutError(f'{name} did not finish')
+
+
+def run(args):
+    # Everything the dashboard writes goes to a scratch directory
+    scratch = tempfile.mkdtemp(prefix='asm-dashboard-bench-')
+    os.environ['DASHBOARD_DATA_DIR'] = os.path.join(scratch, 'data')
+    os.environ['DASHBOARD_SPOOL_DIR'] = os.path.join(scratch, 'spool')
+    os.environ.setdefault('DASHBOARD_STORE', 'memory')
+
+    import app as dashboard
+    from figure_cache import figure_cache
+    from ingest import ingest_kraken_report, ingest_workbook, load_report_aggregates
+    from kraken_bar_plot import plot_rank_compositions, plot_stacked_bar_kraken
+    from kraken_report import read_kraken_report
+    from sankey_plot_fixed import build_sankey_from_aggregates, build_sankey_from_kraken
+
+    client = DashClient(dashboard.app)
+    sample_sizes = QUICK_WORKBOOK_SAMPLES if args.quick else WORKBOOK_SAMPLES
+    line_counts = QUICK_KRAKEN_LINES if args.quick else KRAKEN_LINES
+    results = []
+
+    def record(name, params, result):
+        results.append({'name': name, 'params': params, **result})
+        print(f"{name:<32} {json.dumps(params):<44} median {result['median'] * 1000:9.1f} ms"
+              f"   peak {result['peak_bytes'] / 2**20:8.1f} MiB")
+
+    def clear_data():
+        shutil.rmtree(os.environ['DASHBOARD_DATA_DIR'], ignore_errors=True)
+
+    try:
+        for n_samples in sample_sizes:
+            workbook = synthetic.summary_workbook(n_samples)
+            params = {'samples': n_samples}
+
+            record('ingest_workbook', params, measure(lambda: ingest_workbook(workbook), args.repeat, clear_data))
+
+            def excel_upload():
+                handle = client.upload(workbook, 'Summary-Report.xlsx')
+                wait_for_job(client, 'handle_excel_upload', ('upload-data-handle', handle), 'upload-job', 'upload-job-poll')
+            record('handle_excel_upload', params, measure(excel_upload, args.repeat, clear_data))
+
+            # Leave the workbook loaded for the Assembly Metrics callbacks
+            excel_upload()
+            sheet_cache = dashboard.dataset_store.get(SESSION_ID, 'excel')
+
+            def cold():
+                figure_cache.clear()
+                sheet_cache.clear()
+
+            def dropdowns():
+                _, size = client.call('update_all_axis_dropdowns', [('sheet-dropdown', 'value', 'Summary')],
+                                      [('session-id', 'data', SESSION_ID)])
+                return {'response_bytes': size}
+            record('update_all_axis_dropdowns', params, measure(dropdowns, args.repeat, cold))
+
+            def assembly_metrics(y_axis, render_mode='auto', view=None, has_table=False, changed='sheet-dropdown'):
+                response, size = client.call(
+                    'update_assembly_metrics',
+                    [('sheet-dropdown', 'value', 'Summary'), ('x-axis-dropdown', 'value', 'Sample_name'),
+                     ('y-axis-dropdown', 'value', y_axis), ('coverage-render-mode', 'value', render_mode)],
+                    [('coverage-bar-plot-view', 'data', view), ('data-table-view', 'data', has_table),
+                     ('session-id', 'data', SESSION_ID)],
+                    changed=changed,
+                )
+                return {'response_bytes': size}
+            coverage = 'Coverage_(mean[x]_+/-_stdev[x])'
+            record('update_assembly_metrics', {**params, 'y': 'coverage'},
+                   measure(lambda: assembly_metrics(coverage), args.repeat, cold))
+            record('update_assembly_metrics', {**params, 'y': 'N50'},
+                   measure(lambda: assembly_metrics('N50_[bp]'), args.repeat, cold))
+            record('update_assembly_metrics', {**params, 'y': 'coverage', 'cache': 'warm'},
+                   measure(lambda: assembly_metrics(coverage), args.repeat))
+
+            # An axis change on a rendered plot, answered with Patch updates
+            response, _ = client.call(
+                'update_assembly_metrics',
+                [('sheet-dropdown', 'value', 'Summary'), ('x-axis-dropdown', 'value', 'Sample_name'),
+                 ('y-axis-dropdown', 'value', 'GC_[%]'), ('coverage-render-mode', 'value', 'auto')],
+                [('coverage-bar-plot-view', 'data', None), ('data-table-view', 'data', False),
+                 ('session-id', 'data', SESSION_ID)],
+            )
+            view = response['coverage-bar-plot-view']['data']
+            record('update_assembly_metrics', {**params, 'y': 'N50', 'trigger': 'axis'},
+                   measure(lambda: assembly_metrics('N50_[bp]', view=view, has_table=True, changed='y-axis-dropdown'),
+                           args.repeat, cold))
+
+            def custom_bar():
+                _, size = client.call(
+                    'generate_new_dynamic_bar_plot',
+                    [('sheet-dropdown', 'value', 'Summary'), ('new-x-axis-dropdown', 'value', 'Species'),
+                     ('new-y-axis-dropdown', 'value', 'N50_[bp]'), ('new-bar-render-mode', 'value', 'auto')],
+                    [('new-bar-plot-view', 'data', None), ('session-id', 'data', SESSION_ID)],
+                )
+                return {'response_bytes': size}
+            record('generate_new_dynamic_bar_plot', params, measure(custom_bar, args.repeat, cold))
+
+        for n_lines in line_counts:
+            report = synthetic.kraken_report(n_lines)
+            params = {'lines': n_lines}
+            report_path = os.path.join(scratch, f'report-{n_lines}.tsv')
+            with open(report_path, 'wb') as fh:
+                fh.write(report)
+
+            record('ingest_kraken_report', params,
+                   measure(lambda: ingest_kraken_report(report_path), args.repeat, clear_data))
+
+            def kraken_upload():
+                handle = client.upload(report, 'S0_kraken2.tsv')
+                wait_for_job(client, 'handle_kraken_upload', ('upload-kraken-data-handle', [handle]),
+                             'kraken-upload-job', 'kraken-upload-job-poll')
+            record('handle_kraken_upload', params, measure(kraken_upload, args.repeat, clear_data))
+
+            df = read_kraken_report(report)
+            record('build_sankey_from_kraken', params, measure(lambda: build_sankey_from_kraken(df), args.repeat))
+            bar_df = df.rename(columns={'reads_taxon': 'direct_reads'})
+            record('plot_stacked_bar_kraken', params, measure(lambda: plot_stacked_bar_kraken(bar_df), args.repeat))
+
+            # The same plots from the aggregates written at ingest
+            aggregates = load_report_aggregates(ingest_kraken_report(report_path))
+            record('build_sankey_from_aggregates', params,
+                   measure(lambda: build_sankey_from_aggregates(aggregates), args.repeat))
+            record('plot_rank_compositions', params,
+                   measure(lambda: plot_rank_compositions(aggregates.rank_compositions(10), 10), args.repeat))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    return result['name'], json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results, baseline_path, threshold):
+    """Print the median ratio against a baseline file; return the number of regressions."""
+    with open(baseline_path) as fh:
+        baseline = {result_key(result): result for result in json.load(fh)['results']}
+
+    regressions = 0
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        before = baseline.get(result_key(result))
+        if before is None:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else float('inf')
+        flag = 'REGRESSION' if ratio > threshold else ''
+        regressions += bool(flag)
+        print(f"{result['name']:<32} {json.dumps(result['params']):<44} x{ratio:5.2f} {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', default=os.path.join(tempfile.gettempdir(), 'bench_output.json'),
+                        help='JSON file to write the results to (default: bench_output.json in the temp directory)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case')
+    parser.add_argument('--quick', action='store_true', help='skip the largest inputs')
+    parser.add_argument('--compare', metavar='BASELINE', help='earlier results to compare medians against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='median ratio above which a case counts as a regression')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
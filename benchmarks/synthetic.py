@@ -0,0 +1,97 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from kraken_report import parent_index
+
+
+KRAKEN_RANKS = ['D', 'P', 'C', 'O', 'F', 'G', 'S', 'S1']
+SPECIES = ['K. pneumoniae', 'S. aureus', 'E. coli', 'P. aeruginosa', 'A. baumannii', 'E. faecium']
+
+
+def summary_frame(n_samples, seed=0):
+    """
+    Summary sheet shaped like the assembly workflow's output.
+
+    Args:
+        n_samples (int): Number of rows.
+        seed (int): Random seed.
+    Returns:
+        pd.DataFrame with the workflow's summary columns.
+    """
+    rng = np.random.default_rng(seed)
+    mean = rng.gamma(4, 20, n_samples).round(1)
+    stddev = (mean * rng.uniform(0.05, 0.4, n_samples)).round(1)
+    return pd.DataFrame({
+        'Sample_name': [f'S{i:06d}' for i in range(n_samples)],
+        'Coverage_(mean[x]_+/-_stdev[x])': [f'{m}x_+/-_{s}x' for m, s in zip(mean, stddev)],
+        'Total_Length_[bp]': rng.integers(2_000_000, 7_000_000, n_samples),
+        'N50_[bp]': rng.integers(20_000, 600_000, n_samples),
+        'Contigs_[#]': rng.integers(10, 400, n_samples),
+        'GC_[%]': rng.uniform(30, 70, n_samples).round(2),
+        'Species': rng.choice(SPECIES, n_samples),
+    })
+
+
+def summary_workbook(n_samples, seed=0):
+    """
+    Summary workbook as .xlsx bytes, with a Summary and an Assembly sheet.
+
+    Args:
+        n_samples (int): Number of samples.
+        seed (int): Random seed; different seeds give different file hashes.
+    """
+    df = summary_frame(n_samples, seed)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Summary', index=False)
+        df[['Sample_name', 'N50_[bp]']].to_excel(writer, sheet_name='Assembly', index=False)
+    return buffer.getvalue()
+
+
+def kraken_report(n_lines, minimizers=False, seed=0):
+    """
+    Kraken2 report text with a valid taxonomy: pre-order rows whose clade
+    counts are the sums of their subtrees.
+
+    Args:
+        n_lines (int): Number of report lines.
+        minimizers (bool): Write the 8-column --report-minimizer-data layout.
+        seed (int): Random seed; different seeds give different file hashes.
+    Returns:
+        bytes: The report.
+    """
+    rng = np.random.default_rng(seed)
+    n_taxa = max(n_lines - 2, 0)
+
+    # Random walk over the ranks, one level deeper at most per row, so every
+    # taxon's parent is the closest earlier row one level up
+    steps = rng.integers(-2, 2, n_taxa)
+    depth = np.empty(n_taxa, dtype=np.int64)
+    level = 0
+    for i, step in enumerate(steps):
+        level = max(1, min(len(KRAKEN_RANKS), level + int(step)))
+        depth[i] = level
+    depth = np.concatenate([[0, 0], depth])
+
+    direct = rng.integers(0, 5000, len(depth)).astype(np.int64)
+    direct[1] = 100
+    clade = direct.copy()
+    # Domains hang off root (row 1)
+    parents = parent_index(np.where(np.arange(len(depth)) == 0, -1, depth))
+    for level in range(depth.max(), 0, -1):
+        rows = np.flatnonzero(depth == level)
+        np.add.at(clade, parents[rows], clade[rows])
+
+    tax_id = np.concatenate([[0, 1], np.arange(10, 10 + n_taxa)])
+    ranks = np.concatenate([['U', 'R'], np.asarray(KRAKEN_RANKS)[depth[2:] - 1]])
+    names = ['unclassified', 'root'] + [f'{"  " * d}taxon {t}' for d, t in zip(depth[2:], tax_id[2:])]
+    percentage = 100 * clade / (clade[0] + clade[1])
+
+    columns = [np.char.mod('%6.2f', percentage), clade.astype(str), direct.astype(str)]
+    if minimizers:
+        columns += [(direct * 3).astype(str), (direct * 2).astype(str)]
+    columns += [ranks, tax_id.astype(str), names]
+    lines = ['\t'.join(row) for row in zip(*columns)]
+    return ('\n'.join(lines[:n_lines]) + '\n').encode()
@@ -0,0 +1,72 @@
+import json
+import os
+
+
+# Layout of a dataset bundle written by batch.py:
+#   bundle.json            manifest, see read_bundle
+#   datasets/<sha256>/     ingested workbooks and Kraken reports (see ingest.py)
+#   figures/<n>.json       pre-rendered figures, seeded into the figure cache
+BUNDLE_MANIFEST = 'bundle.json'
+BUNDLE_VERSION = 1
+DATASETS_DIR = 'datasets'
+FIGURES_DIR = 'figures'
+
+
+def get_bundle_root():
+    """Directory the dashboard may open bundles from (DASHBOARD_BUNDLE_DIR, default: working directory)."""
+    return os.environ.get('DASHBOARD_BUNDLE_DIR', os.getcwd())
+
+
+def resolve_bundle_path(path, root=None):
+    """
+    Turn a bundle path typed in the dashboard into a bundle directory.
+
+    Relative paths are taken from the bundle root, and paths that end up
+    outside of it are refused, since the path comes from the browser.
+
+    Raises:
+        ValueError: The path is outside the bundle root.
+        FileNotFoundError: There is no bundle at the path.
+    """
+    root = os.path.realpath(root or get_bundle_root())
+    bundle_dir = os.path.realpath(os.path.join(root, os.path.expanduser(path.strip())))
+    if os.path.commonpath([root, bundle_dir]) != root:
+        raise ValueError(f"{path} is outside the bundle directory")
+    if not os.path.isfile(os.path.join(bundle_dir, BUNDLE_MANIFEST)):
+        raise FileNotFoundError(f"No bundle found at {path}")
+    return bundle_dir
+
+
+def read_bundle(bundle_dir):
+    """
+    Read a bundle manifest, with dataset and figure paths made absolute.
+
+    Returns:
+        dict with 'workbooks' and 'kraken' lists of {'label', 'source',
+        'dataset'}, 'figures' as [{'key', 'file'}] and the 'errors' of the
+        batch run.
+    """
+    with open(os.path.join(bundle_dir, BUNDLE_MANIFEST)) as fh:
+        manifest = json.load(fh)
+    if manifest.get('version') != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported bundle version {manifest.get('version')}")
+    for entry in manifest['workbooks'] + manifest['kraken']:
+        entry['dataset'] = os.path.join(bundle_dir, entry['dataset'])
+    for entry in manifest['figures']:
+        entry['file'] = os.path.join(bundle_dir, entry['file'])
+    return manifest
+
+
+def _as_key(value):
+    """JSON turns the tuples of a figure cache key into lists; turn them back."""
+    if isinstance(value, list):
+        return tuple(_as_key(item) for item in value)
+    return value
+
+
+def seed_figure_cache(manifest, cache):
+    """Put the pre-rendered figures of a bundle into a FigureCache."""
+    for entry in manifest['figures']:
+        with open(entry['file']) as fh:
+            cache.put_json(_as_key(entry['key']), fh.read())
+    return len(manifest['figures'])
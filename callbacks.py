@@ -1,112 +1,263 @@
-from dash import Input, Output, State, html
+import logging
+import os
+import uuid
+
+from dash import Input, Output, State, html, no_update
 import pandas as pd
-import base64
-import io
 import plotly.graph_objects as go
-from dash.dash_table import DataTable
 from plots import generate_sankey_plot
 from plotly.colors import qualitative
 from plotly.colors import sequential
-from sankey_plot_fixed import build_sankey_from_kraken 
-from kraken_bar_plot import plot_stacked_bar_kraken
+from sankey_plot_fixed import build_sankey_from_aggregates, build_sankey_table, SANKEY_TABLE_ID, SANKEY_TABLE_COLUMNS
+from kraken_bar_plot import plot_rank_compositions
+from metrics import timed
+import query_engine
+from metric_plots import build_metric_figure, figure_patch, figure_view
+from kraken_compare import build_abundance_table, plot_abundance_matrix, plot_kraken_comparison
+from figure_cache import figure_cache
+from bundle import read_bundle, resolve_bundle_path, seed_figure_cache
+from ingest import find_dataset, find_ingested, get_history_dir, ingest_kraken_report, ingest_workbook, load_kraken_report, load_report_aggregates, touch_dataset
+from kraken_report import kraken_sample_label
+from jobs import job_status, submit_job
+from run_history import MAX_TREND_SAMPLES, history_metrics, plot_trend, query_trend
+from sheet_cache import SheetCache
+from tables import server_side_table, table_page, table_patch
+from taxonomy_tree import TOP_NODE, explorer_target, load_taxonomy_tree, taxonomy_sunburst
+from uploads import discard_upload, upload_path
+from watcher import watched_datasets
 
 from dash.exceptions import PreventUpdate
 from dash import callback_context
 
 
-def register_callbacks(app, uploaded_data):
-
-    # Callback for Dashboard file upload (Excel)
+logger = logging.getLogger('dashboard.callbacks')
+# Upload progress polls run every interval; sample them with DASHBOARD_LOG_SAMPLE
+poll_logger = logging.getLogger('dashboard.callbacks.poll')
+
+
+TABLE_STYLE = dict(
+    style_table={'overflowX': 'auto', 'backgroundColor': '#2c2f34'},
+    style_header={'fontWeight': 'bold', 'color': 'white', 'backgroundColor': '#1e1e1e'},
+    style_filter={'backgroundColor': '#1e1e1e'},
+    style_data={'color': 'white', 'backgroundColor': '#2c2f34'},
+)
+
+
+def register_callbacks(app, dataset_store):
+
+    def get_sheet(session_id, sheet_name, columns=None):
+        """Return a sheet (or some of its columns) of the session's workbook, or None if nothing is uploaded."""
+        sheet_cache = dataset_store.get(session_id, 'excel')
+        if sheet_cache is None:
+            return None
+        return sheet_cache.get(sheet_name, columns)
+
+    def session_kraken_dirs(session_id):
+        """The session's Kraken dataset directories ({label: dir}), marked as in use in the catalog."""
+        kraken_dirs = dataset_store.get(session_id, 'kraken-dirs') or {}
+        for dataset_dir in kraken_dirs.values():
+            touch_dataset(dataset_dir)
+        return kraken_dirs
+
+    def kraken_dataset_ids(session_id):
+        """Content hash of each sample's Kraken report, used in figure cache keys."""
+        kraken_dirs = session_kraken_dirs(session_id)
+        return {label: os.path.basename(dataset_dir) for label, dataset_dir in kraken_dirs.items()}
+
+    def kraken_dataset_id(session_id, sample):
+        return kraken_dataset_ids(session_id).get(sample)
+
+    def kraken_aggregates(session_id, sample):
+        """Read-only ReportAggregates of a sample's Kraken report, or None if it is not loaded."""
+        dataset_dir = session_kraken_dirs(session_id).get(sample)
+        return load_report_aggregates(dataset_dir) if dataset_dir else None
+
+    def cached_status(sha256, kind):
+        """Job status of a file found in the catalog, looked up again by its hash on the server."""
+        dataset_dir = find_dataset(sha256, kind)
+        return {'state': 'done', 'result': dataset_dir} if dataset_dir else None
+
+    def store_kraken_reports(session_id, kraken_dirs):
+        """
+        Open ingested Kraken reports ({label: dataset dir}) in the session.
+
+        Nothing is read here: the plots load a report's ingest-time
+        aggregates when it is shown, and without the query engine the
+        cross-sample abundance table is built by the first comparison.
+
+        Returns:
+            list of the sample labels.
+        """
+        for dataset_dir in kraken_dirs.values():
+            touch_dataset(dataset_dir)
+        dataset_store.put(session_id, 'kraken-dirs', kraken_dirs)
+        dataset_store.delete(session_id, 'kraken-abundance')
+        return list(kraken_dirs)
+
+    def session_abundance(session_id, kraken_dirs):
+        """Cross-sample abundance table of the session's reports, built from the full reports on first use."""
+        abundance = dataset_store.get(session_id, 'kraken-abundance')
+        if abundance is None:
+            with timed('parse'):
+                abundance = build_abundance_table({label: load_kraken_report(dataset_dir) for label, dataset_dir in kraken_dirs.items()})
+            dataset_store.put(session_id, 'kraken-abundance', abundance)
+        return abundance
+
+    def metric_selection(sheet_cache, sheet_name, x_axis, y_axis):
+        """Rows of the x/y selection without missing values, with the parsed columns of a composite y."""
+        composite = sheet_cache.composite_columns(sheet_name).get(y_axis)
+        stat_columns = [composite['mean'], composite['stddev']] if composite is not None else []
+        return sheet_cache.selection(sheet_name, [x_axis, y_axis] + stat_columns), composite
+
+    def get_sheet_columns(session_id, sheet_name):
+        sheet_cache = dataset_store.get(session_id, 'excel')
+        if sheet_cache is None:
+            return None
+        return sheet_cache.columns(sheet_name)
+
+    # Callback for Dashboard file upload (Excel). A new upload starts an ingest job in
+    # the process pool; the interval then polls the job until the workbook is ready.
     @app.callback(
         [
             Output('upload-status', 'children'),
-            Output('sheet-dropdown', 'options')
+            Output('sheet-dropdown', 'options'),
+            Output('upload-job', 'data'),
+            Output('upload-job-poll', 'disabled'),
+            Output('history-version', 'data')
         ],
-        [Input('upload-data', 'contents')],
-        [State('upload-data', 'filename')],
+        [Input('upload-data-handle', 'data'), Input('upload-job-poll', 'n_intervals')],
+        [State('upload-job', 'data'), State('session-id', 'data')],
         prevent_initial_call=True
     )
-    def handle_excel_upload(upload_contents, upload_filename):
-        if not upload_contents:
-            raise PreventUpdate
+    def handle_excel_upload(upload, n_intervals, job, session_id):
+        if callback_context.triggered_id == 'upload-data-handle':
+            if not upload:
+                raise PreventUpdate
+            upload_filename = upload['filename']
+            if not (upload_filename.endswith('.xlsx') or upload_filename.endswith('.xls')):
+                discard_upload(upload['handle'])
+                return f"Unsupported format: {upload_filename}", [], None, True, no_update
+
+            logger.debug("Excel upload: %s", upload_filename)
+            # A workbook ingested before (same SHA-256) is opened from the catalog without parsing
+            dataset_dir = find_ingested(upload_path(upload['handle']), 'workbook')
+            if dataset_dir is not None:
+                discard_upload(upload['handle'])
+                sheet_cache = SheetCache(dataset_dir)
+                dataset_store.put(session_id, 'excel', sheet_cache)
+                sheet_options = [{'label': sheet, 'value': sheet} for sheet in sheet_cache.sheet_names]
+                return f"Uploaded: {upload_filename}", sheet_options, None, True, no_update
+
+            # Convert every sheet to Parquet once; later reads only touch the needed columns
+            job_id = submit_job(ingest_workbook, upload_path(upload['handle']), upload_filename)
+            return f"Processing {upload_filename}...", no_update, {'id': job_id, 'upload': upload}, False, no_update
+
+        if not job:
+            return no_update, no_update, no_update, True, no_update
+
+        upload_filename = job['upload']['filename']
+        status = job_status(job['id'])
+        if status is None:
+            return f"Error uploading file: processing of {upload_filename} was lost", [], None, True, no_update
+        poll_logger.debug("Job %s for %s: %s", job['id'], upload_filename, status['state'])
+        if status['state'] in ('queued', 'running'):
+            progress = f" ({status['done']}/{status['total']} sheets)" if status.get('total') else ""
+            return f"Processing {upload_filename}...{progress}", no_update, no_update, False, no_update
+
+        discard_upload(job['upload']['handle'])
+        if status['state'] == 'error':
+            logger.error("Error processing %s: %s", upload_filename, status['error'])
+            return f"Error uploading file: {status['error']}", [], None, True, no_update
 
         try:
-            content_type, content_string = upload_contents.split(',')
-            decoded = io.BytesIO(base64.b64decode(content_string))
-
-            if upload_filename.endswith('.xlsx') or upload_filename.endswith('.xls'):
-                print("Detected Excel file")  # Debugging
-                excel_data = pd.ExcelFile(decoded)
-                uploaded_data['data'] = excel_data
-                sheets = excel_data.sheet_names
-            else:
-                return f"Unsupported format: {upload_filename}", []
-
+            sheet_cache = SheetCache(status['result'])
+            dataset_store.put(session_id, 'excel', sheet_cache)
         except Exception as e:
-            print(f"Error processing file: {e}")
-            return f"Error uploading file: {e}", []
+            logger.exception("Error loading %s", upload_filename)
+            return f"Error uploading file: {e}", [], None, True, no_update
 
-        sheet_options = [{'label': sheet, 'value': sheet} for sheet in sheets]
-        return f"Uploaded: {upload_filename}", sheet_options
+        sheet_options = [{'label': sheet, 'value': sheet} for sheet in sheet_cache.sheet_names]
+        return f"Uploaded: {upload_filename}", sheet_options, None, True, job['id']
 
 
 
-    # Callback for Taxonomy Analysis Kraken TSV upload
+    # Callback for Taxonomy Analysis Kraken TSV upload. Every report is its own ingest
+    # job, so a batch is parsed in parallel across the pool's processes.
     @app.callback(
         [
             Output('kraken-upload-status', 'children'),
-            Output('kraken-sheet-dropdown', 'options')
+            Output('kraken-sheet-dropdown', 'options'),
+            Output('kraken-upload-job', 'data'),
+            Output('kraken-upload-job-poll', 'disabled')
         ],
-        [Input('upload-kraken-data', 'contents')],
-        [State('upload-kraken-data', 'filename')],
+        [Input('upload-kraken-data-handle', 'data'), Input('kraken-upload-job-poll', 'n_intervals')],
+        [State('kraken-upload-job', 'data'), State('session-id', 'data')],
         prevent_initial_call=True
     )
-    def handle_kraken_upload(kraken_contents, kraken_filename):
-        print("\n=== DEBUG: Kraken Upload Callback Triggered ===")  # Debugging log
+    def handle_kraken_upload(kraken_uploads, n_intervals, job, session_id):
+        if callback_context.triggered_id == 'upload-kraken-data-handle':
+            if not kraken_uploads:
+                raise PreventUpdate
+            if isinstance(kraken_uploads, dict):
+                kraken_uploads = [kraken_uploads]
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Kraken upload: %s", [upload['filename'] for upload in kraken_uploads])
+            # Reports ingested before are taken from the catalog; only the others are parsed.
+            # The job store is sent to the browser, so it holds their hashes, not their paths.
+            cached = [find_ingested(upload_path(upload['handle']), 'kraken') for upload in kraken_uploads]
+            job_ids = [
+                None if dataset_dir else submit_job(ingest_kraken_report, upload_path(upload['handle']), upload['filename'])
+                for upload, dataset_dir in zip(kraken_uploads, cached)
+            ]
+            cached_ids = [os.path.basename(dataset_dir) if dataset_dir else None for dataset_dir in cached]
+            job = {'ids': job_ids, 'cached': cached_ids, 'uploads': kraken_uploads}
+            if any(job_ids):
+                return f"Processing {len(kraken_uploads)} Kraken report(s)...", no_update, job, False
+
+        if not job:
+            return no_update, no_update, no_update, True
+
+        statuses = [
+            cached_status(sha256, 'kraken') if sha256 else job_status(job_id)
+            for job_id, sha256 in zip(job['ids'], job['cached'])
+        ]
+        finished = sum(1 for status in statuses if status is None or status['state'] in ('done', 'error'))
+        poll_logger.debug("Kraken jobs: %d/%d finished", finished, len(statuses))
+        if finished < len(statuses):
+            return f"Processing Kraken reports... ({finished}/{len(statuses)} parsed)", no_update, no_update, False
 
-        if not kraken_contents:
-            print("DEBUG: No file detected in upload-kraken-data.")
-            raise PreventUpdate
+        for upload in job['uploads']:
+            discard_upload(upload['handle'])
 
         try:
-            print(f"DEBUG: Kraken File Uploaded - {kraken_filename}")  # Debugging
-
-            # Decode file
-            content_type, content_string = kraken_contents.split(',')
-            decoded = io.BytesIO(base64.b64decode(content_string))
-
-            # Read Kraken TSV with tab separator
-            df = pd.read_csv(decoded, sep='\t', header=None)
-
-            # Debugging: Print first few rows
-            print(f"DEBUG: First few rows of the uploaded Kraken file:\n{df.head()}")
-
-            # Define expected Kraken TSV column headers
-            kraken_columns = ['percentage', 'reads_clade', 'reads_taxon', 'rank', 'NCBI_tax_ID', 'name']
-
-            # Verify column count
-            if df.shape[1] == len(kraken_columns):
-                df.columns = kraken_columns
-            else:
-                print(f"DEBUG: Unexpected column count in Kraken TSV (Expected: {len(kraken_columns)}, Found: {df.shape[1]})")
-                return f"Error: Unexpected number of columns in Kraken TSV", []
-
-            # Store in global uploaded_data dictionary
-            uploaded_data['data'] = {"Kraken TSV": df}
-
-            # Populate dropdowns
-            sample_label = kraken_filename.split("_")[0]  # Use "3N09_L006_L000" as label
-            kraken_sheets = [sample_label]
-            uploaded_data['data'] = {sample_label: df}
-
-            kraken_options = [{'label': sheet, 'value': sheet} for sheet in kraken_sheets]
-
-            print("DEBUG: Kraken TSV successfully stored in uploaded_data.")
-            return f"Uploaded: {kraken_filename}", kraken_options  # ✅ Fixed: Now returns only 2 values
+            # One dropdown entry per sample; failed reports are reported, not fatal
+            kraken_dirs = {}
+            errors = []
+            for upload, status in zip(job['uploads'], statuses):
+                if status is None or status['state'] == 'error':
+                    errors.append(f"{upload['filename']}: {status['error'] if status else 'processing was lost'}")
+                    continue
+                kraken_dirs[kraken_sample_label(upload['filename'], kraken_dirs)] = status['result']
+
+            if not kraken_dirs:
+                logger.error("No Kraken report could be loaded: %s", errors)
+                return f"Error: {'; '.join(errors)}", [], None, True
+
+            kraken_reports = store_kraken_reports(session_id, kraken_dirs)
+
+            kraken_options = [{'label': sheet, 'value': sheet} for sheet in kraken_reports]
+
+            logger.debug("Stored %d Kraken report(s)", len(kraken_reports))
+            filenames = [upload['filename'] for upload in job['uploads']]
+            status = f"Uploaded: {filenames[0]}" if len(filenames) == 1 else f"Uploaded {len(kraken_reports)} of {len(filenames)} Kraken reports"
+            if errors:
+                status += f" (failed: {'; '.join(errors)})"
+            return status, kraken_options, None, True
 
         except Exception as e:
-            print(f"ERROR: Failed to process Kraken TSV file - {e}")
-            return f"Error processing file: {e}", []
+            logger.exception("Failed to process Kraken reports")
+            return f"Error processing file: {e}", [], None, True
 
 
 
@@ -118,216 +269,222 @@ def register_callbacks(app, uploaded_data):
             Output('new-x-axis-dropdown', 'options'),
             Output('new-y-axis-dropdown', 'options')
         ],
-        Input('sheet-dropdown', 'value')
+        Input('sheet-dropdown', 'value'),
+        State('session-id', 'data')
     )
-    def update_all_axis_dropdowns(sheet_name):
-        if sheet_name and 'data' in uploaded_data:
+    def update_all_axis_dropdowns(sheet_name, session_id):
+        if sheet_name:
             try:
-                df = uploaded_data['data'].parse(sheet_name)
-                
-                # Force numeric conversion
-                for col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
+                sheet_cache = dataset_store.get(session_id, 'excel')
+                if sheet_cache is None:
+                    return [], [], [], []
 
-                # Extract numeric columns for Y-axis and all columns for X-axis
-                all_cols = df.columns.tolist()
-                numeric_cols = df.select_dtypes(include='number').columns.tolist()
+                # Column kinds were inferred at ingest, no data is read here
+                schema = sheet_cache.schema(sheet_name)
+                all_cols = sheet_cache.columns(sheet_name)
+                numeric_cols = [col for col in all_cols if schema.get(col, {}).get('kind') == 'numeric']
+                # Composite "mean +/- stddev" columns are plotted with error bars by the coverage plot
+                coverage_cols = [col for col in all_cols if schema.get(col, {}).get('kind') in ('numeric', 'composite')]
 
-                # Debugging: Print column types
-                print("All Columns:", all_cols)
-                print("Numeric Columns:", numeric_cols)
+                logger.debug("Sheet %s: %d columns, %d numeric", sheet_name, len(all_cols), len(numeric_cols))
 
                 return (
                     [{'label': col, 'value': col} for col in all_cols],
-                    [{'label': col, 'value': col} for col in numeric_cols],
+                    [{'label': col, 'value': col} for col in coverage_cols],
                     [{'label': col, 'value': col} for col in all_cols],
                     [{'label': col, 'value': col} for col in numeric_cols]
                 )
-            except Exception as e:
-                print(f"Error updating axis dropdowns: {e}")
+            except Exception:
+                logger.exception("Error updating axis dropdowns for sheet %s", sheet_name)
                 return [], [], [], []
         return [], [], [], []
 
 
 
 
+    def build_coverage_figure(df, composite, x_axis, y_axis, render_mode):
+        """Build the coverage plot of a selection, with error bars for composite columns."""
+        if composite is not None:
+            # Composite "mean +/- stddev" columns were parsed into numbers at ingest
+            y_values = df[composite['mean']]
+            error_values = df[composite['stddev']]
+        else:
+            y_values = pd.to_numeric(df[y_axis], errors='coerce')
+            error_values = None
+
+        # Large tables switch to WebGL or aggregated views, see metric_plots
+        return build_metric_figure(
+            df[x_axis], y_values, error_values,
+            mode=render_mode,
+            title=f"{y_axis}" if error_values is not None else f"{y_axis} Plot",
+            x_title=x_axis,
+            y_title="Coverage (Mean ± StdDev)" if error_values is not None else y_axis,
+        )
+
+    # One callback for everything the sheet/x/y selection drives: the selected rows are
+    # read and filtered once (SheetCache.selection) and fan out to the plot and the table.
+    # Axis changes only swap the traces and table rows in place (dash.Patch) when the
+    # rendered view, stored next to each component, is unchanged.
     @app.callback(
-        Output('coverage-bar-plot', 'figure'),
+        [
+            Output('coverage-bar-plot', 'figure'),
+            Output('coverage-bar-plot-view', 'data'),
+            Output('data-table-container', 'children'),
+            Output('data-table-view', 'data')
+        ],
         Input('sheet-dropdown', 'value'),
         Input('x-axis-dropdown', 'value'),
         Input('y-axis-dropdown', 'value'),
+        Input('coverage-render-mode', 'value'),
+        State('coverage-bar-plot-view', 'data'),
+        State('data-table-view', 'data'),
+        State('session-id', 'data')
     )
-    def generate_coverage_bar_plot(sheet_name, x_axis, y_axis):
-        if sheet_name and x_axis and y_axis and 'data' in uploaded_data:
-            try:
-                df = uploaded_data['data'].parse(sheet_name)
+    def update_assembly_metrics(sheet_name, x_axis, y_axis, render_mode, view, has_table, session_id):
+        no_data = html.Div("No data to display", className="text-muted")
+        if not (sheet_name and x_axis and y_axis):
+            return go.Figure().update_layout(title="No Data to Display"), None, no_data, False
 
-                if "Coverage" in y_axis and "mean" in y_axis:
-                    coverage_data = df[y_axis].str.extract(r'(?P<mean>[\d.]+)x_.*(?P<stddev>[\d.]+)x')
-                    df['mean'] = pd.to_numeric(coverage_data['mean'], errors='coerce')
-                    df['stddev'] = pd.to_numeric(coverage_data['stddev'], errors='coerce')
-                    df = df.dropna(subset=['mean'])
+        try:
+            sheet_cache = dataset_store.get(session_id, 'excel')
+            if sheet_cache is None:
+                return go.Figure().update_layout(title="No Data to Display"), None, no_data, False
 
-                    x_values = df[x_axis]
-                    y_values = df['mean']
-                    error_values = df['stddev']
-                else:
-                    df = df.dropna(subset=[x_axis, y_axis])
-                    x_values = df[x_axis]
-                    y_values = pd.to_numeric(df[y_axis], errors='coerce')
-                    error_values = None
-
-                unique_x_values = x_values.unique()
-                color_palette = qualitative.Alphabet
-                # color_palette = sequential.Viridis
-                color_map = {value: color for value, color in zip(unique_x_values, color_palette)}
-                colors = x_values.map(color_map)
-
-                fig = go.Figure()
-                fig.add_trace(go.Bar(
-                    x=x_values,
-                    y=y_values,
-                    error_y=dict(
-                        type='data',
-                        array=error_values,
-                        visible=error_values is not None
-                    ),
-                    marker=dict(color=colors),
-                ))
-
-                fig.update_layout(
-                    title=f"{y_axis}" if error_values is not None else f"{y_axis} Plot",
-                    xaxis_title=x_axis,
-                    yaxis_title="Coverage (Mean ± StdDev)" if error_values is not None else y_axis,
-                    xaxis=dict(tickangle=-45),
-                    plot_bgcolor='#2c2f34',
-                    paper_bgcolor='#1e1e1e',
-                    font_color="white"
-                )
+            with timed('parse'):
+                df, composite = metric_selection(sheet_cache, sheet_name, x_axis, y_axis)
+        except Exception as e:
+            logger.exception("Error reading selection %s/%s from sheet %s", x_axis, y_axis, sheet_name)
+            return (go.Figure().update_layout(title=f"Error: {e}"), None,
+                    html.Div(f"Error displaying data: {e}", className="text-danger"), False)
 
-                return fig
+        triggered = callback_context.triggered_id
+        axis_changed = triggered in ('x-axis-dropdown', 'y-axis-dropdown')
 
-            except Exception as e:
-                print(f"Error generating bar plot: {e}")
-                return go.Figure().update_layout(title=f"Error: {e}")
+        try:
+            cache_key = ('coverage', sheet_cache.dataset_id, sheet_name, x_axis, y_axis, render_mode)
+            fig = figure_cache.get(cache_key)
+            if fig is None:
+                with timed('figure'):
+                    fig = build_coverage_figure(df, composite, x_axis, y_axis, render_mode)
+                figure_cache.put(cache_key, fig)
+                fig = fig.to_plotly_json()
+
+            new_view = {'mode': render_mode, 'traces': figure_view(fig)}
+            if axis_changed and view == new_view:
+                fig, new_view = figure_patch(fig), no_update
+        except Exception as e:
+            logger.exception("Error generating bar plot of %s/%s", x_axis, y_axis)
+            fig, new_view = go.Figure().update_layout(title=f"Error: {e}"), None
 
-        return go.Figure().update_layout(title="No Data to Display")
+        # The render mode only affects the plot
+        if triggered == 'coverage-render-mode':
+            return fig, new_view, no_update, no_update
+
+        try:
+            columns = [{"name": col, "id": col} for col in [x_axis, y_axis]]
+            if axis_changed and has_table:
+                return fig, new_view, table_patch(df, columns), no_update
+            table = server_side_table(
+                'data-table',
+                df,
+                columns,
+                **TABLE_STYLE
+            )
+            return fig, new_view, table, True
+        except Exception as e:
+            return fig, new_view, html.Div(f"Error displaying data: {e}", className="text-danger"), False
 
 
 
     @app.callback(
         [
             Output('new-bar-plot', 'figure'),
-            Output('new-bar-plot-table', 'children')  # New output for data table
+            Output('new-bar-plot-table', 'children'),  # New output for data table
+            Output('new-bar-plot-view', 'data')
         ],
         [
             Input('sheet-dropdown', 'value'),
             Input('new-x-axis-dropdown', 'value'),
-            Input('new-y-axis-dropdown', 'value')
-        ]
+            Input('new-y-axis-dropdown', 'value'),
+            Input('new-bar-render-mode', 'value')
+        ],
+        State('new-bar-plot-view', 'data'),
+        State('session-id', 'data')
     )
-    def generate_new_dynamic_bar_plot(sheet_name, x_axis, y_axis):
-        if sheet_name and x_axis and y_axis and 'data' in uploaded_data:
+    def generate_new_dynamic_bar_plot(sheet_name, x_axis, y_axis, render_mode, view, session_id):
+        if sheet_name and x_axis and y_axis:
             try:
-                df = uploaded_data['data'].parse(sheet_name)
-                df = df.dropna(subset=[x_axis, y_axis])  # Remove rows with NaN values
-                x_values = df[x_axis]
-                y_values = pd.to_numeric(df[y_axis], errors='coerce')
-                
-                # Create color mapping for bar plot
-                unique_x_values = x_values.unique()
-                color_palette = qualitative.Plotly
-                color_map = {value: color_palette[i % len(color_palette)] for i, value in enumerate(unique_x_values)}
-                colors = x_values.map(color_map)
-
-                # Generate the bar plot
-                fig = go.Figure(
-                    go.Bar(
-                        x=x_values,
-                        y=y_values,
-                        marker=dict(color=colors),
-                    )
-                )
-
-                fig.update_layout(
-                    title="Custom Bar Plot",
-                    xaxis_title=x_axis,
-                    yaxis_title=y_axis,
-                    plot_bgcolor='#2c2f34',
-                    paper_bgcolor='#1e1e1e',
-                    font_color="white"
-                )
-
-                # Generate Data Table
-                table = DataTable(
-                    data=df[[x_axis, y_axis]].to_dict('records'),
-                    columns=[{"name": col, "id": col} for col in [x_axis, y_axis]],
-                    style_table={'overflowX': 'auto', 'backgroundColor': '#2c2f34'},
-                    style_header={'fontWeight': 'bold', 'color': 'white', 'backgroundColor': '#1e1e1e'},
-                    style_data={'color': 'white', 'backgroundColor': '#2c2f34'},
-                    page_size=10,
+                sheet_cache = dataset_store.get(session_id, 'excel')
+                if sheet_cache is None:
+                    return go.Figure().update_layout(title="Select X and Y Axis"), html.Div("No data to display", className="text-muted"), None
+                with timed('parse'):
+                    df = sheet_cache.selection(sheet_name, [x_axis, y_axis])  # Rows without NaN values
+
+                cache_key = ('custom-bar', sheet_cache.dataset_id, sheet_name, x_axis, y_axis, render_mode)
+                fig = figure_cache.get(cache_key)
+                if fig is None:
+                    with timed('figure'):
+                        fig = build_metric_figure(
+                            df[x_axis], df[y_axis],
+                            mode=render_mode,
+                            title="Custom Bar Plot",
+                            x_title=x_axis,
+                            y_title=y_axis,
+                            palette=qualitative.Plotly,
+                        )
+                    figure_cache.put(cache_key, fig)
+                    fig = fig.to_plotly_json()
+
+                # Same view after an axis change: patch the figure and the table in place
+                columns = [{"name": col, "id": col} for col in [x_axis, y_axis]]
+                new_view = {'mode': render_mode, 'traces': figure_view(fig)}
+                if callback_context.triggered_id in ('new-x-axis-dropdown', 'new-y-axis-dropdown') and view == new_view:
+                    return figure_patch(fig), table_patch(df, columns), no_update
+
+                # Generate Data Table (first page only, the rest is paged server-side)
+                table = server_side_table(
+                    'new-bar-plot-data-table',
+                    df,
+                    columns,
+                    **TABLE_STYLE
                 )
 
-                return fig, table  # Return both figure and table
+                return fig, table, new_view  # Return both figure and table
 
             except Exception as e:
-                return go.Figure().update_layout(title=f"Error: {e}"), html.Div(f"Error displaying data: {e}")
+                return go.Figure().update_layout(title=f"Error: {e}"), html.Div(f"Error displaying data: {e}"), None
 
-        return go.Figure().update_layout(title="Select X and Y Axis"), html.Div("No data to display", className="text-muted")
+        return go.Figure().update_layout(title="Select X and Y Axis"), html.Div("No data to display", className="text-muted"), None
 
 
 
 
 
 
-    @app.callback(
-        Output('data-table-container', 'children'),
-        Input('sheet-dropdown', 'value'),
-        Input('x-axis-dropdown', 'value'),
-        Input('y-axis-dropdown', 'value')
-    )
-    def display_data_table(sheet_name, x_axis, y_axis):
-        if sheet_name and x_axis and y_axis and 'data' in uploaded_data:
-            try:
-                df = uploaded_data['data'].parse(sheet_name)
-                filtered_df = df[[x_axis, y_axis]].dropna()
-                table = DataTable(
-                    data=filtered_df.to_dict('records'),
-                    columns=[{"name": i, "id": i} for i in filtered_df.columns],
-                    style_table={'overflowX': 'auto', 'backgroundColor': '#2c2f34'},
-                    style_header={'fontWeight': 'bold', 'color': 'white', 'backgroundColor': '#1e1e1e'},
-                    style_data={'color': 'white', 'backgroundColor': '#2c2f34'},
-                    page_size=10,
-                )
-                return table
-            except Exception as e:
-                return html.Div(f"Error displaying data: {e}", className="text-danger")
-        return html.Div("No data to display", className="text-muted")
-
     @app.callback(
         Output('sample-dropdown', 'options'),
-        Input('sankey-sheet-dropdown', 'value')
+        Input('sankey-sheet-dropdown', 'value'),
+        State('session-id', 'data')
     )
-    def populate_sample_dropdown(sheet_name):
-        print("populate_sample_dropdown triggered")
-        if sheet_name and 'data' in uploaded_data:
+    def populate_sample_dropdown(sheet_name, session_id):
+        if sheet_name:
             try:
-                excel_data = uploaded_data['data']
-                df = excel_data.parse(sheet_name)
-                print(f"Loaded sheet: {sheet_name}, Rows: {len(df)}, Columns: {list(df.columns)}")
-
-                # Normalize column names
-                df.columns = df.columns.str.strip()
+                columns = get_sheet_columns(session_id, sheet_name)
+                if columns is None:
+                    return []
 
-                if 'Sample_name' not in df.columns:
-                    print(f"'Sample_name' not found in sheet {sheet_name}. Available columns: {df.columns}")
+                # Normalize column names, then read only the sample column
+                sample_columns = [col for col in columns if col.strip() == 'Sample_name']
+                if not sample_columns:
+                    logger.warning("'Sample_name' not found in sheet %s", sheet_name)
                     return []
 
-                sample_names = df['Sample_name'].dropna().unique()
-                print(f"Sample names found: {sample_names}")
+                df = get_sheet(session_id, sheet_name, sample_columns[:1])
+                sample_names = df[sample_columns[0]].dropna().unique()
+                logger.debug("Sheet %s: %d rows, %d samples", sheet_name, len(df), len(sample_names))
                 return [{'label': name, 'value': name} for name in sample_names]
-            except Exception as e:
-                print(f"Error loading samples: {e}")
+            except Exception:
+                logger.exception("Error loading samples from sheet %s", sheet_name)
                 return []
         return []
 
@@ -335,21 +492,30 @@ def register_callbacks(app, uploaded_data):
 
     @app.callback(
         [Output('sankey-plot', 'figure'), Output('sankey-table', 'children')],
-        [Input('kraken-sheet-dropdown', 'value')]
+        [Input('kraken-sheet-dropdown', 'value')],
+        State('session-id', 'data')
     )
-    def generate_sankey_plot_callback(sheet_name):
-        if sheet_name and 'data' in uploaded_data:
+    def generate_sankey_plot_callback(sheet_name, session_id):
+        if sheet_name:
             try:
-                data_source = uploaded_data['data']
-                if isinstance(data_source, dict) and sheet_name in data_source:
-                    df = data_source[sheet_name]
-                else:
+                with timed('parse'):
+                    aggregates = kraken_aggregates(session_id, sheet_name)
+                if aggregates is None:
                     return (
                         go.Figure().update_layout(title="Error: Kraken TSV Data Not Found"),
                         html.Div("Error: Kraken TSV Data Not Found")
                     )
 
-                fig, table = build_sankey_from_kraken(df, sample_name=sheet_name)
+                # On a cache hit only the table's first page is rebuilt
+                cache_key = ('sankey', kraken_dataset_id(session_id, sheet_name), sheet_name)
+                fig = figure_cache.get(cache_key)
+                if fig is not None:
+                    taxa, _ = aggregates.sankey_taxa()
+                    return fig, build_sankey_table(taxa)
+
+                with timed('figure'):
+                    fig, table = build_sankey_from_aggregates(aggregates, sample_name=sheet_name)
+                figure_cache.put(cache_key, fig)
                 return fig, table
 
             except Exception as e:
@@ -367,48 +533,365 @@ def register_callbacks(app, uploaded_data):
 
     @app.callback(
         Output('kraken-bar-plot', 'figure'),
-        [Input('kraken-sheet-dropdown', 'value')]
+        [Input('kraken-sheet-dropdown', 'value'),
+         Input('kraken-bar-top-n', 'value')],
+        State('session-id', 'data')
     )
-    def generate_kraken_stacked_bar_plot(sheet_name):
-        print(f"\n=== DEBUG: Kraken Sheet Selected: {sheet_name} ===")  # Debugging log
-
-        if sheet_name and 'data' in uploaded_data:
+    def generate_kraken_stacked_bar_plot(sheet_name, top_n, session_id):
+        if sheet_name:
             try:
-                df = uploaded_data['data'].get(sheet_name, None)
-
-                if df is None:
-                    print("DEBUG: No data found for selected Kraken sheet.")
+                with timed('parse'):
+                    aggregates = kraken_aggregates(session_id, sheet_name)
+                if aggregates is None:
+                    logger.warning("No Kraken data for sample %s", sheet_name)
                     return go.Figure().update_layout(title="Error: No data found")
 
-                # Debug: Print DataFrame Columns
-                print(f"DEBUG: DataFrame Columns: {df.columns.tolist()}")
-
-                # Ensure required columns exist
-                required_columns = {"rank", "reads_taxon", "name"}
-                if not required_columns.issubset(df.columns):
-                    print("DEBUG: Missing required Kraken columns.")
-                    return go.Figure().update_layout(title="Error: Missing required columns")
-
-                # Rename columns for consistency
-                rename_mapping = {"rank": "rank", "reads_taxon": "direct_reads", "name": "name"}
-                df.rename(columns=rename_mapping, inplace=True)
-
-                # Convert direct_reads to integers
-                df["direct_reads"] = pd.to_numeric(df["direct_reads"], errors="coerce").fillna(0).astype(int)
+                top_n = int(top_n or 10)
+                cache_key = ('kraken-bar', kraken_dataset_id(session_id, sheet_name), top_n)
+                cached_fig = figure_cache.get(cache_key)
+                if cached_fig is not None:
+                    return cached_fig
 
-                # Pass to plotting function
-                fig = plot_stacked_bar_kraken(df)
-
-                print("DEBUG: Kraken bar plot successfully generated.")  # Debug log
+                # Top-N lists precomputed at ingest; the shared report frame is not touched
+                with timed('figure'):
+                    fig = plot_rank_compositions(aggregates.rank_compositions(top_n), top_n)
+                figure_cache.put(cache_key, fig)
                 return fig
 
             except Exception as e:
-                print(f"ERROR: Kraken bar plot generation failed - {e}")
+                logger.exception("Kraken bar plot failed for sample %s", sheet_name)
                 return go.Figure().update_layout(title=f"Error: {e}")
 
-        print("DEBUG: No Kraken sheet selected.")
         return go.Figure().update_layout(title="No Data to Display")
 
 
 
+    # Server-side paging, sorting and filtering for the DataTables. The tables are
+    # created with their first page; these callbacks serve every later page from
+    # the cached frames so only the visible rows cross the wire.
+    @app.callback(
+        [Output('data-table', 'data'), Output('data-table', 'page_count')],
+        [
+            Input('data-table', 'page_current'),
+            Input('data-table', 'page_size'),
+            Input('data-table', 'sort_by'),
+            Input('data-table', 'filter_query')
+        ],
+        [
+            State('sheet-dropdown', 'value'),
+            State('x-axis-dropdown', 'value'),
+            State('y-axis-dropdown', 'value'),
+            State('session-id', 'data')
+        ],
+        prevent_initial_call=True
+    )
+    def page_data_table(page_current, page_size, sort_by, filter_query, sheet_name, x_axis, y_axis, session_id):
+        columns = get_sheet_columns(session_id, sheet_name) if sheet_name else None
+        if columns is None or x_axis not in columns or y_axis not in columns:
+            raise PreventUpdate
+        sheet_cache = dataset_store.get(session_id, 'excel')
+        if query_engine.engine_enabled():
+            composite = sheet_cache.composite_columns(sheet_name).get(y_axis)
+            stat_columns = [composite['mean'], composite['stddev']] if composite is not None else []
+            with timed('query'):
+                return query_engine.parquet_page(sheet_cache.parquet_path(sheet_name), [x_axis, y_axis], page_current, page_size,
+                                                 sort_by, filter_query, required=[x_axis, y_axis] + stat_columns)
+        with timed('parse'):
+            filtered_df, _ = metric_selection(sheet_cache, sheet_name, x_axis, y_axis)
+        return table_page(filtered_df, page_current, page_size, sort_by, filter_query, columns=[x_axis, y_axis])
+
+    @app.callback(
+        [Output('new-bar-plot-data-table', 'data'), Output('new-bar-plot-data-table', 'page_count')],
+        [
+            Input('new-bar-plot-data-table', 'page_current'),
+            Input('new-bar-plot-data-table', 'page_size'),
+            Input('new-bar-plot-data-table', 'sort_by'),
+            Input('new-bar-plot-data-table', 'filter_query')
+        ],
+        [
+            State('sheet-dropdown', 'value'),
+            State('new-x-axis-dropdown', 'value'),
+            State('new-y-axis-dropdown', 'value'),
+            State('session-id', 'data')
+        ],
+        prevent_initial_call=True
+    )
+    def page_new_bar_plot_table(page_current, page_size, sort_by, filter_query, sheet_name, x_axis, y_axis, session_id):
+        columns = get_sheet_columns(session_id, sheet_name) if sheet_name else None
+        if columns is None or x_axis not in columns or y_axis not in columns:
+            raise PreventUpdate
+        sheet_cache = dataset_store.get(session_id, 'excel')
+        if query_engine.engine_enabled():
+            with timed('query'):
+                return query_engine.parquet_page(sheet_cache.parquet_path(sheet_name), [x_axis, y_axis],
+                                                 page_current, page_size, sort_by, filter_query)
+        df = sheet_cache.selection(sheet_name, [x_axis, y_axis])
+        return table_page(df, page_current, page_size, sort_by, filter_query, columns=[x_axis, y_axis])
+
+    @app.callback(
+        [Output(SANKEY_TABLE_ID, 'data'), Output(SANKEY_TABLE_ID, 'page_count')],
+        [
+            Input(SANKEY_TABLE_ID, 'page_current'),
+            Input(SANKEY_TABLE_ID, 'page_size'),
+            Input(SANKEY_TABLE_ID, 'sort_by'),
+            Input(SANKEY_TABLE_ID, 'filter_query')
+        ],
+        [State('kraken-sheet-dropdown', 'value'), State('session-id', 'data')],
+        prevent_initial_call=True
+    )
+    def page_sankey_table(page_current, page_size, sort_by, filter_query, sheet_name, session_id):
+        aggregates = kraken_aggregates(session_id, sheet_name)
+        if aggregates is None:
+            raise PreventUpdate
+        taxa, _ = aggregates.sankey_taxa()
+        columns = [col['id'] for col in SANKEY_TABLE_COLUMNS]
+        return table_page(taxa, page_current, page_size, sort_by, filter_query, columns=columns)
+
+    @app.callback(
+        Output('kraken-comparison-plot', 'figure'),
+        [
+            Input('kraken-sheet-dropdown', 'options'),
+            Input('kraken-comparison-rank', 'value'),
+            Input('kraken-comparison-type', 'value'),
+            Input('kraken-comparison-top-n', 'value')
+        ],
+        State('session-id', 'data')
+    )
+    def generate_kraken_comparison_plot(kraken_options, rank, plot_type, top_n, session_id):
+        kraken_dirs = session_kraken_dirs(session_id)
+        if not kraken_dirs:
+            return go.Figure().update_layout(title="Upload Kraken reports to compare samples")
+        try:
+            rank, top_n = rank or 'S', int(top_n or 15)
+            cache_key = ('kraken-comparison', tuple(sorted(kraken_dataset_ids(session_id).items())), rank, plot_type, top_n)
+            fig = figure_cache.get(cache_key)
+            if fig is None:
+                if query_engine.engine_enabled():
+                    with timed('query'):
+                        matrix = query_engine.abundance_matrix(kraken_dirs, rank=rank, top_n=top_n)
+                    with timed('figure'):
+                        fig = plot_abundance_matrix(matrix, rank=rank, top_n=top_n, plot_type=plot_type)
+                else:
+                    abundance = session_abundance(session_id, kraken_dirs)
+                    with timed('figure'):
+                        fig = plot_kraken_comparison(abundance, rank=rank, top_n=top_n, plot_type=plot_type)
+                figure_cache.put(cache_key, fig)
+            return fig
+        except Exception as e:
+            logger.exception("Kraken comparison plot failed")
+            return go.Figure().update_layout(title=f"Error: {e}")
+
+    # Dropdown options live in the tab content, which is rebuilt on every tab switch;
+    # restore them from the session's datasets when the dropdowns appear
+    @app.callback(
+        Output('sheet-dropdown', 'options', allow_duplicate=True),
+        Input('sheet-dropdown', 'id'),
+        State('session-id', 'data'),
+        prevent_initial_call='initial_duplicate'
+    )
+    def restore_sheet_options(_, session_id):
+        sheet_cache = dataset_store.get(session_id, 'excel')
+        if sheet_cache is None:
+            raise PreventUpdate
+        return [{'label': sheet, 'value': sheet} for sheet in sheet_cache.sheet_names]
+
+    @app.callback(
+        Output('kraken-sheet-dropdown', 'options', allow_duplicate=True),
+        Input('kraken-sheet-dropdown', 'id'),
+        State('session-id', 'data'),
+        prevent_initial_call='initial_duplicate'
+    )
+    def restore_kraken_options(_, session_id):
+        kraken_dirs = dataset_store.get(session_id, 'kraken-dirs')
+        if not kraken_dirs:
+            raise PreventUpdate
+        return [{'label': sample, 'value': sample} for sample in kraken_dirs]
 
+    # Open a bundle written by batch.py: its datasets are already converted and its
+    # default figures rendered, so nothing is parsed here
+    @app.callback(
+        [
+            Output('bundle-status', 'children'),
+            Output('sheet-dropdown', 'options', allow_duplicate=True),
+            Output('history-version', 'data', allow_duplicate=True)
+        ],
+        Input('bundle-open', 'n_clicks'),
+        [State('bundle-path', 'value'), State('session-id', 'data')],
+        prevent_initial_call=True
+    )
+    def open_bundle(n_clicks, path, session_id):
+        if not path:
+            raise PreventUpdate
+        try:
+            bundle_dir = resolve_bundle_path(path)
+            manifest = read_bundle(bundle_dir)
+            seed_figure_cache(manifest, figure_cache)
+
+            sheet_options = no_update
+            if manifest['workbooks']:
+                sheet_cache = SheetCache(manifest['workbooks'][0]['dataset'])
+                dataset_store.put(session_id, 'excel', sheet_cache)
+                sheet_options = [{'label': sheet, 'value': sheet} for sheet in sheet_cache.sheet_names]
+            if manifest['kraken']:
+                store_kraken_reports(session_id, {entry['label']: entry['dataset'] for entry in manifest['kraken']})
+        except Exception as e:
+            logger.warning("Could not open bundle %s: %s", path, e)
+            return f"Error opening bundle: {e}", no_update, no_update
+
+        status = f"Opened {path}: {len(manifest['workbooks'])} workbook(s), {len(manifest['kraken'])} Kraken report(s)"
+        if len(manifest['workbooks']) > 1:
+            status += f" (showing {manifest['workbooks'][0]['label']})"
+        if manifest['errors']:
+            status += f", {len(manifest['errors'])} file(s) failed in the batch run"
+        return status, sheet_options, uuid.uuid4().hex
+
+    # Taxonomy explorer: every figure holds a few levels below the focused node,
+    # and clicking a segment loads the levels below it from the report's index
+    @app.callback(
+        [
+            Output('taxonomy-explorer', 'figure'),
+            Output('taxonomy-explorer-node', 'data'),
+            Output('taxonomy-explorer-path', 'children')
+        ],
+        [
+            Input('kraken-sheet-dropdown', 'value'),
+            Input('taxonomy-explorer', 'clickData'),
+            Input('taxonomy-explorer-top', 'n_clicks')
+        ],
+        [State('taxonomy-explorer-node', 'data'), State('session-id', 'data')]
+    )
+    def explore_taxonomy(sample, click_data, top_clicks, focused, session_id):
+        if not sample:
+            return go.Figure().update_layout(title="No Data to Display"), TOP_NODE, ""
+        dataset_dir = session_kraken_dirs(session_id).get(sample)
+        if dataset_dir is None:
+            return go.Figure().update_layout(title="Error: No data found"), TOP_NODE, ""
+
+        try:
+            tree = load_taxonomy_tree(dataset_dir)
+            node = TOP_NODE
+            if callback_context.triggered_id == 'taxonomy-explorer':
+                point = (click_data or {}).get('points', [{}])[0]
+                node = explorer_target(tree, TOP_NODE if focused is None else focused, point.get('id'))
+                if node is None:
+                    raise PreventUpdate
+
+            cache_key = ('taxonomy', os.path.basename(dataset_dir), sample, node)
+            fig = figure_cache.get(cache_key)
+            if fig is None:
+                with timed('figure'):
+                    fig = taxonomy_sunburst(tree, node, sample_name=sample)
+                figure_cache.put(cache_key, fig)
+
+            path = ["All reads"] + [str(tree.node(n)['name']) for n in tree.lineage(node)]
+            if node != TOP_NODE:
+                path.append(str(tree.node(node)['name']))
+            return fig, node, " › ".join(path)
+        except PreventUpdate:
+            raise
+        except Exception as e:
+            logger.exception("Taxonomy explorer failed for sample %s", sample)
+            return go.Figure().update_layout(title=f"Error: {e}"), TOP_NODE, ""
+
+    # Workflow outputs ingested by the results watcher (DASHBOARD_WATCH_DIR). The options
+    # come from the watcher's index; the server-side dataset paths never reach the browser.
+    def watched_options(kind):
+        return [{'label': label, 'value': key} for key, label, _ in watched_datasets(kind)]
+
+    # The watcher adds the workbooks it ingests to the run history, so a new one also
+    # bumps the history version
+    @app.callback(
+        [Output('watch-workbook-dropdown', 'options'), Output('history-version', 'data', allow_duplicate=True)],
+        Input('watch-workbook-dropdown-poll', 'n_intervals'),
+        State('watch-workbook-dropdown', 'options'),
+        prevent_initial_call='initial_duplicate'
+    )
+    def refresh_watched_workbooks(n_intervals, options):
+        new_options = watched_options('workbook')
+        if new_options == options:
+            return no_update, no_update
+        return new_options, uuid.uuid4().hex
+
+    @app.callback(
+        Output('watch-kraken-dropdown', 'options'),
+        Input('watch-kraken-dropdown-poll', 'n_intervals'),
+        State('watch-kraken-dropdown', 'options')
+    )
+    def refresh_watched_reports(n_intervals, options):
+        new_options = watched_options('kraken')
+        return no_update if new_options == options else new_options
+
+    @app.callback(
+        [Output('upload-status', 'children', allow_duplicate=True), Output('sheet-dropdown', 'options', allow_duplicate=True)],
+        Input('watch-workbook-dropdown', 'value'),
+        State('session-id', 'data'),
+        prevent_initial_call=True
+    )
+    def open_watched_workbook(key, session_id):
+        if not key:
+            raise PreventUpdate
+        datasets = {entry_key: (label, dataset_dir) for entry_key, label, dataset_dir in watched_datasets('workbook')}
+        if key not in datasets:
+            return f"{key} is no longer in the watched results", no_update
+        label, dataset_dir = datasets[key]
+        sheet_cache = SheetCache(dataset_dir)
+        dataset_store.put(session_id, 'excel', sheet_cache)
+        return f"Loaded: {label}", [{'label': sheet, 'value': sheet} for sheet in sheet_cache.sheet_names]
+
+    @app.callback(
+        [Output('kraken-upload-status', 'children', allow_duplicate=True), Output('kraken-sheet-dropdown', 'options', allow_duplicate=True)],
+        Input('watch-kraken-dropdown', 'value'),
+        State('session-id', 'data'),
+        prevent_initial_call=True
+    )
+    def open_watched_reports(keys, session_id):
+        if not keys:
+            raise PreventUpdate
+        datasets = {entry_key: (label, dataset_dir) for entry_key, label, dataset_dir in watched_datasets('kraken')}
+        kraken_dirs = dict(datasets[key] for key in keys if key in datasets)
+        if not kraken_dirs:
+            return "The selected reports are no longer in the watched results", no_update
+        try:
+            store_kraken_reports(session_id, kraken_dirs)
+        except Exception as e:
+            logger.exception("Failed to load watched Kraken reports")
+            return f"Error processing file: {e}", no_update
+        return f"Loaded {len(kraken_dirs)} watched Kraken report(s)", [{'label': sample, 'value': sample} for sample in kraken_dirs]
+
+    # Run history: trends of the summary sheets of every workbook ingested into the data directory.
+    # The metric list is only re-read when history-version changes: an upload's ingest job
+    # finished, the watcher ingested a new workbook or a bundle was opened.
+    @app.callback(
+        Output('history-metric-dropdown', 'options'),
+        [Input('history-version', 'data'), Input('history-last-runs', 'value')],
+        State('history-metric-dropdown', 'options')
+    )
+    def update_history_metrics(_, last_runs, options):
+        new_options = [{'label': metric, 'value': metric} for metric in history_metrics(get_history_dir(), last_runs or None)]
+        return no_update if new_options == options else new_options
+
+    @app.callback(
+        Output('history-sample-dropdown', 'options'),
+        [Input('history-metric-dropdown', 'value'), Input('history-last-runs', 'value')]
+    )
+    def update_history_samples(metric, last_runs):
+        if not metric:
+            return []
+        samples = query_trend(get_history_dir(), metric, last_runs or None, columns=['sample'])['sample']
+        return sorted(set(samples.to_pylist()))
+
+    @app.callback(
+        Output('history-trend-plot', 'figure'),
+        [Input('history-metric-dropdown', 'value'), Input('history-last-runs', 'value'), Input('history-sample-dropdown', 'value')]
+    )
+    def update_history_plot(metric, last_runs, samples):
+        if not metric:
+            return go.Figure().update_layout(title="Select a metric")
+        samples = (samples or [])[:MAX_TREND_SAMPLES]
+        try:
+            with timed('query'):
+                table = query_trend(get_history_dir(), metric, last_runs or None, samples)
+            return plot_trend(table, metric, samples)
+        except Exception as e:
+            logger.exception("Failed to query the run history for %s", metric)
+            return go.Figure().update_layout(title=f"Error: {e}")
@@ -0,0 +1,148 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+
+
+CATALOG_NAME = 'catalog.sqlite'
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024 * 1024
+# Datasets used more recently than this may still be open in a session
+DEFAULT_MIN_IDLE = 4 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    sha256 TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    filename TEXT,
+    nbytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+)
+"""
+
+
+def directory_nbytes(path):
+    """Total size of the files in a directory tree."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def remove_dataset_dir(dataset_dir):
+    """Delete a dataset directory; it is renamed away first, so readers never see it half deleted."""
+    trash_dir = tempfile.mkdtemp(dir=os.path.dirname(dataset_dir), prefix='.stale-')
+    try:
+        os.rename(dataset_dir, os.path.join(trash_dir, 'dataset'))
+    except OSError:
+        pass
+    shutil.rmtree(trash_dir, ignore_errors=True)
+
+
+class DatasetCatalog:
+    """
+    SQLite index of the ingested datasets in a data directory.
+
+    Datasets are directories named after the SHA-256 of the uploaded file
+    (see ingest.py). The catalog records their kind, conversion version,
+    size and last use, so a repeat upload is answered from the hash alone
+    and the directory can be kept under a size cap by evicting the least
+    recently used datasets. Each call opens its own connection, so the
+    catalog is safe to use from the web workers and the ingest processes.
+
+    Args:
+        data_dir (str): The data directory.
+        max_bytes (int): Size cap for all datasets (DASHBOARD_CATALOG_MAX_BYTES).
+        min_idle (float): Seconds since last use before a dataset may be
+            evicted (DASHBOARD_STORE_TTL, the session lifetime).
+    """
+
+    def __init__(self, data_dir, max_bytes=None, min_idle=None):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, CATALOG_NAME)
+        self.max_bytes = int(max_bytes or os.environ.get('DASHBOARD_CATALOG_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.min_idle = float(min_idle if min_idle is not None else os.environ.get('DASHBOARD_STORE_TTL', DEFAULT_MIN_IDLE))
+
+    def _connect(self):
+        os.makedirs(self.data_dir, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(_SCHEMA)
+        return connection
+
+    def lookup(self, sha256, version, kind=None):
+        """
+        Dataset directory of a file hash, or None if it has not been ingested
+        with this conversion version. A hit counts as a use.
+        """
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute('SELECT kind, version FROM datasets WHERE sha256 = ?', (sha256,)).fetchone()
+            if row is None or row[1] != version or (kind is not None and row[0] != kind):
+                return None
+            dataset_dir = os.path.join(self.data_dir, sha256)
+            if not os.path.isdir(dataset_dir):
+                connection.execute('DELETE FROM datasets WHERE sha256 = ?', (sha256,))
+                return None
+            connection.execute('UPDATE datasets SET last_used_at = ? WHERE sha256 = ?', (time.time(), sha256))
+        return dataset_dir
+
+    def touch(self, sha256):
+        """Mark a dataset as used, e.g. read by a session, so evict keeps it for another min_idle seconds."""
+        with closing(self._connect()) as connection, connection:
+            connection.execute('UPDATE datasets SET last_used_at = ? WHERE sha256 = ?', (time.time(), sha256))
+
+    def register(self, dataset_dir, kind, version, filename=None):
+        """Record a dataset written (or found) by ingest, then evict if the cap is exceeded."""
+        sha256 = os.path.basename(dataset_dir)
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                'INSERT INTO datasets (sha256, kind, version, filename, nbytes, created_at, last_used_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(sha256) DO UPDATE SET kind = excluded.kind, version = excluded.version, '
+                'nbytes = excluded.nbytes, last_used_at = excluded.last_used_at',
+                (sha256, kind, version, filename, directory_nbytes(dataset_dir), now, now),
+            )
+        self.evict(keep=sha256)
+
+    def evict(self, keep=None):
+        """
+        Delete least recently used datasets until the total is under max_bytes.
+
+        Datasets used within min_idle seconds, and `keep`, are never evicted,
+        so the total can stay above the cap while they are in use.
+
+        Returns:
+            list of evicted hashes.
+        """
+        with closing(self._connect()) as connection, connection:
+            total = connection.execute('SELECT COALESCE(SUM(nbytes), 0) FROM datasets').fetchone()[0]
+            if total <= self.max_bytes:
+                return []
+            candidates = connection.execute(
+                'SELECT sha256, nbytes FROM datasets WHERE last_used_at < ? ORDER BY last_used_at',
+                (time.time() - self.min_idle,),
+            ).fetchall()
+            evicted = []
+            for sha256, nbytes in candidates:
+                if total <= self.max_bytes:
+                    break
+                if sha256 == keep:
+                    continue
+                remove_dataset_dir(os.path.join(self.data_dir, sha256))
+                connection.execute('DELETE FROM datasets WHERE sha256 = ?', (sha256,))
+                total -= nbytes
+                evicted.append(sha256)
+        return evicted
+
+    def stats(self):
+        with closing(self._connect()) as connection:
+            count, nbytes = connection.execute('SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM datasets').fetchone()
+        return {'datasets': count, 'nbytes': nbytes, 'max_bytes': self.max_bytes}
@@ -0,0 +1,310 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+DEFAULT_TTL = 4 * 60 * 60  # seconds an idle session keeps its data
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# Live values a DiskBackend keeps per process to skip unpickling unchanged files
+DEFAULT_MEMO_ENTRIES = 32
+
+
+def estimate_nbytes(value):
+    """
+    Best-effort size of a stored value, used for memory accounting.
+
+    Values with an nbytes attribute report their current size; for caches
+    such as SheetCache that grows as sheets are read, see MemoryBackend._evict.
+    """
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class MemoryBackend:
+    """
+    In-process LRU with a sliding TTL and a memory budget.
+
+    Values are kept as live objects, so this backend is only shared between
+    the threads of one worker process.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            # A cache handed out here may have grown since the last request
+            self._evict()
+            return value
+
+    def set(self, key, value):
+        size = estimate_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self.nbytes += size
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.nbytes -= size
+
+    def _resize_live(self):
+        # Values with a live nbytes (SheetCache) grow after they are stored;
+        # re-read it so the budget reflects what they hold now
+        for key, (value, size, expires_at) in self._entries.items():
+            if hasattr(value, 'nbytes'):
+                live_size = int(value.nbytes)
+                if live_size != size:
+                    self._entries[key] = (value, live_size, expires_at)
+                    self.nbytes += live_size - size
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, (_, _, expires_at) in self._entries.items() if expires_at < now]:
+            self._remove(key)
+        self._resize_live()
+        # Keep the most recent entry even if it alone exceeds the budget
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+
+class DiskBackend:
+    """
+    Pickled values in a shared directory, one file per key.
+
+    Every gunicorn worker pointed at the same directory sees the same data.
+    File modification times drive the TTL and the LRU eviction, and a small
+    per-process memo avoids unpickling a file that has not changed. The memo
+    is an LRU of at most memo_entries values, and an entry is dropped as soon
+    as its file is found missing or expired, whichever worker removed it.
+    """
+
+    def __init__(self, directory, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, memo_entries=DEFAULT_MEMO_ENTRIES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memo_entries = memo_entries
+        os.makedirs(directory, exist_ok=True)
+        self._memo = OrderedDict()  # path -> (mtime_ns, value)
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.pkl')
+
+    @property
+    def nbytes(self):
+        return sum(size for _, _, size in self._files())
+
+    def _remember(self, path, mtime_ns, value):
+        with self._lock:
+            self._memo[path] = (mtime_ns, value)
+            self._memo.move_to_end(path)
+            while len(self._memo) > self.memo_entries:
+                self._memo.popitem(last=False)
+
+    def _forget(self, path):
+        with self._lock:
+            self._memo.pop(path, None)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            # Removed by another worker's eviction; drop the live copy too
+            self._forget(path)
+            return None
+        if stat.st_mtime + self.ttl < time.time():
+            self._unlink(path)
+            return None
+
+        with self._lock:
+            memo = self._memo.get(path)
+        if memo is not None and memo[0] == stat.st_mtime_ns:
+            value = memo[1]
+        else:
+            try:
+                with open(path, 'rb') as fh:
+                    value = pickle.load(fh)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                self._forget(path)
+                return None
+
+        # Touching the file refreshes the sliding TTL and the LRU position
+        try:
+            os.utime(path)
+            self._remember(path, os.stat(path).st_mtime_ns, value)
+        except FileNotFoundError:
+            self._forget(path)
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        # Atomic rename so other workers never read a half-written file
+        os.replace(tmp_path, path)
+        self._remember(path, os.stat(path).st_mtime_ns, value)
+        self._evict()
+
+    def delete(self, key):
+        self._unlink(self._path(key))
+
+    def _files(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((entry.path, stat.st_mtime, stat.st_size))
+        return files
+
+    def _unlink(self, path):
+        self._forget(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        now = time.time()
+        files = []
+        for path, mtime, size in self._files():
+            if mtime + self.ttl < now:
+                self._unlink(path)
+            else:
+                files.append((mtime, path, size))
+        files.sort()
+        total = sum(size for _, _, size in files)
+        while total > self.max_bytes and len(files) > 1:
+            _, path, size = files.pop(0)
+            self._unlink(path)
+            total -= size
+
+
+class RedisBackend:
+    """
+    Pickled values in Redis or any server speaking its protocol
+    (Valkey, KeyDB, a local redis-server). Redis handles the TTL and,
+    with a maxmemory-policy of allkeys-lru, the eviction.
+    """
+
+    def __init__(self, url, ttl=DEFAULT_TTL, prefix='asm-dashboard:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis backend requires the 'redis' package (pip install redis)") from e
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @property
+    def nbytes(self):
+        return int(self._client.info('memory').get('used_memory', 0))
+
+    def get(self, key):
+        payload = self._client.get(self.prefix + key)
+        if payload is None:
+            return None
+        self._client.expire(self.prefix + key, self.ttl)
+        return pickle.loads(payload)
+
+    def set(self, key, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._client.setex(self.prefix + key, self.ttl, payload)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+
+class DatasetStore:
+    """
+    Uploaded datasets keyed by browser session.
+
+    Args:
+        backend: A MemoryBackend, DiskBackend or RedisBackend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _key(session_id, name):
+        return f"{session_id}:{name}"
+
+    def get(self, session_id, name):
+        if not session_id:
+            return None
+        return self.backend.get(self._key(session_id, name))
+
+    def put(self, session_id, name, value):
+        if not session_id:
+            raise ValueError("A session id is required to store data")
+        self.backend.set(self._key(session_id, name), value)
+
+    def delete(self, session_id, name):
+        if session_id:
+            self.backend.delete(self._key(session_id, name))
+
+
+def create_store(spec=None, ttl=None):
+    """
+    Build a DatasetStore from a backend spec.
+
+    Args:
+        spec (str): 'memory' (default), 'disk:<directory>' or a redis:// URL.
+            Falls back to the DASHBOARD_STORE environment variable.
+        ttl (int): Idle seconds before a session's data expires. Falls back
+            to DASHBOARD_STORE_TTL.
+    Returns:
+        DatasetStore
+    """
+    spec = spec or os.environ.get('DASHBOARD_STORE', 'memory')
+    ttl = int(ttl or os.environ.get('DASHBOARD_STORE_TTL', DEFAULT_TTL))
+
+    if spec == 'memory':
+        backend = MemoryBackend(ttl=ttl)
+    elif spec.startswith('disk:'):
+        backend = DiskBackend(spec[len('disk:'):], ttl=ttl)
+    elif spec.startswith(('redis://', 'rediss://', 'unix://')):
+        backend = RedisBackend(spec, ttl=ttl)
+    else:
+        raise ValueError(f"Unknown DASHBOARD_STORE backend: {spec}")
+    return DatasetStore(backend)
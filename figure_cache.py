@@ -0,0 +1,70 @@
+import json
+import threading
+from collections import OrderedDict
+
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class FigureCache:
+    """
+    LRU of serialized Plotly figures, bounded by the size of their JSON.
+
+    Keys are built from the content hash of the dataset and the plot
+    parameters, so a figure is shared by every session that looks at the
+    same data the same way. Hits return the figure as a plain dict, which
+    dcc.Graph accepts directly.
+
+    Args:
+        max_bytes (int): Memory budget for the stored JSON.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            figure_json = self._figures.get(key)
+            if figure_json is None:
+                self.misses += 1
+                return None
+            self._figures.move_to_end(key)
+            self.hits += 1
+        return json.loads(figure_json)
+
+    def put(self, key, fig):
+        self.put_json(key, fig.to_json())
+
+    def put_json(self, key, figure_json):
+        """Store an already serialized figure, e.g. one pre-rendered by batch.py."""
+        with self._lock:
+            if key in self._figures:
+                self.nbytes -= len(self._figures.pop(key))
+            self._figures[key] = figure_json
+            self.nbytes += len(figure_json)
+            while self.nbytes > self.max_bytes and len(self._figures) > 1:
+                _, evicted = self._figures.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._figures),
+                'nbytes': self.nbytes,
+            }
+
+
+# Shared by all callbacks of the process
+figure_cache = FigureCache()
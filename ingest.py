@@ -0,0 +1,241 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from functools import lru_cache
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from catalog import DatasetCatalog, remove_dataset_dir
+from kraken_aggregates import read_report_aggregates, write_report_aggregates
+from kraken_report import read_kraken_report
+from run_history import append_run
+from sheet_schema import add_composite_columns, infer_schema
+from taxonomy_tree import TAXONOMY_INDEX_NAME, build_taxonomy_index
+
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'asm-dashboard-data')
+MANIFEST_NAME = 'manifest.json'
+KRAKEN_REPORT_NAME = 'report.parquet'
+# Bumped when the conversion changes; older dataset directories are converted again
+MANIFEST_VERSION = 5
+HISTORY_DIR_NAME = 'history'
+# Seconds between two catalog updates of the last use of the same dataset
+TOUCH_INTERVAL = 60
+
+logger = logging.getLogger('dashboard.ingest')
+
+_last_touched = {}  # sha256 -> time.monotonic() of the last catalog update
+
+
+def get_data_dir():
+    return os.environ.get('DASHBOARD_DATA_DIR', DEFAULT_DATA_DIR)
+
+
+def get_catalog():
+    return DatasetCatalog(get_data_dir())
+
+
+def get_history_dir():
+    """Run history of the ingested workbooks (DASHBOARD_HISTORY_DIR, default: 'history' in the data directory)."""
+    return os.environ.get('DASHBOARD_HISTORY_DIR') or os.path.join(get_data_dir(), HISTORY_DIR_NAME)
+
+
+def content_hash(source):
+    """SHA-256 of raw bytes or of a file, read in blocks."""
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _to_arrow(df):
+    """Convert a parsed sheet to an Arrow table, stringifying mixed-type columns."""
+    df = df.rename(columns=str)
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Excel columns often mix numbers and text ('45', 'N/A'); keep them as text
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _is_current(dataset_dir):
+    try:
+        return read_manifest(dataset_dir).get('version') == MANIFEST_VERSION
+    except FileNotFoundError:
+        return False
+
+
+def _publish(staging_dir, dataset_dir):
+    if os.path.exists(dataset_dir) and not _is_current(dataset_dir):
+        # Move the outdated conversion aside; open memory maps of it stay valid
+        remove_dataset_dir(dataset_dir)
+    try:
+        os.rename(staging_dir, dataset_dir)
+    except OSError:
+        # Another worker finished converting the same file first
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def _register(dataset_dir, kind, filename, data_dir, run_date=None):
+    # Only the shared data directory is cataloged and size-capped; datasets
+    # written elsewhere (batch bundles) are never evicted
+    if data_dir is None:
+        get_catalog().register(dataset_dir, kind, MANIFEST_VERSION, filename)
+        if kind == 'workbook':
+            try:
+                append_run(get_history_dir(), dataset_dir, read_manifest(dataset_dir), run_date)
+            except Exception:
+                # The upload itself succeeded; the run is only missing from the trends
+                logger.exception("Could not add %s to the run history", filename)
+
+
+def touch_dataset(dataset_dir):
+    """
+    Record that a session is reading a dataset, so the catalog does not evict it.
+
+    Meant to be called on every read: each process updates the catalog at
+    most once per TOUCH_INTERVAL per dataset. Datasets outside the data
+    directory (batch bundles) are not cataloged and are left alone.
+    """
+    if os.path.dirname(os.path.abspath(dataset_dir)) != os.path.abspath(get_data_dir()):
+        return
+    sha256 = os.path.basename(dataset_dir)
+    now = time.monotonic()
+    if sha256 in _last_touched and now - _last_touched[sha256] < TOUCH_INTERVAL:
+        return
+    _last_touched[sha256] = now
+    try:
+        get_catalog().touch(sha256)
+    except sqlite3.Error as e:
+        # The read itself does not depend on the catalog
+        logger.warning("Could not record the use of dataset %s: %s", sha256, e)
+
+
+def find_dataset(sha256, kind):
+    """Dataset directory of an ingested file, by its SHA-256, or None if the catalog does not list it."""
+    return get_catalog().lookup(sha256, MANIFEST_VERSION, kind)
+
+
+def find_ingested(path, kind):
+    """
+    Dataset directory of a file ingested before, found by its SHA-256 in
+    the catalog, or None if it needs to be ingested.
+    """
+    return find_dataset(content_hash(path), kind)
+
+
+def ingest_workbook(source, filename=None, progress=None, data_dir=None, run_date=None):
+    """
+    Convert every sheet of an uploaded workbook to Parquet, once.
+
+    The dataset directory is named after the SHA-256 of the workbook, so
+    ingesting the same bytes again reuses the existing conversion. Composite
+    metric columns ("83.7x_+/-_10.3x") are parsed here into float32 mean and
+    stddev columns, listed per sheet under 'composites' in the manifest, next
+    to the column 'schema' of sheet_schema.infer_schema.
+
+    Args:
+        source: The raw workbook bytes or a path to the file.
+        filename (str): Original file name, kept in the manifest.
+        progress (callable): Called as progress(done, total, message) per sheet.
+        data_dir (str): Where datasets are written; defaults to get_data_dir(),
+            whose datasets are recorded in the catalog and the run history.
+        run_date (datetime.date): Date of the run in the history; defaults to today.
+    Returns:
+        str: Path of the dataset directory.
+    """
+    target_dir = data_dir or get_data_dir()
+    dataset_dir = os.path.join(target_dir, content_hash(source))
+    if _is_current(dataset_dir):
+        _register(dataset_dir, 'workbook', filename, data_dir, run_date)
+        return dataset_dir
+
+    os.makedirs(target_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(dir=target_dir, prefix='.ingest-')
+    try:
+        excel_data = pd.ExcelFile(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+        sheets = []
+        for i, sheet_name in enumerate(excel_data.sheet_names):
+            if progress:
+                progress(i, len(excel_data.sheet_names), f"Converting sheet {sheet_name}")
+            file_name = f'sheet-{i}.parquet'
+            df, composites = add_composite_columns(excel_data.parse(sheet_name).rename(columns=str))
+            pq.write_table(_to_arrow(df), os.path.join(staging_dir, file_name))
+            sheets.append({'name': sheet_name, 'file': file_name, 'composites': composites,
+                           'schema': infer_schema(df, composites)})
+
+        with open(os.path.join(staging_dir, MANIFEST_NAME), 'w') as fh:
+            json.dump({'kind': 'workbook', 'version': MANIFEST_VERSION, 'filename': filename, 'sheets': sheets}, fh)
+        _publish(staging_dir, dataset_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    _register(dataset_dir, 'workbook', filename, data_dir, run_date)
+    return dataset_dir
+
+
+def ingest_kraken_report(path, filename=None, progress=None, data_dir=None):
+    """
+    Parse a Kraken2 report and store it as Parquet, keyed by its SHA-256.
+
+    The compact dtypes of read_kraken_report (categoricals, unsigned counts)
+    survive the round trip, so load_kraken_report returns the same frame.
+    The parent/child index of taxonomy_tree and the plot aggregates of
+    kraken_aggregates are written next to it.
+
+    Returns:
+        str: Path of the dataset directory.
+    """
+    target_dir = data_dir or get_data_dir()
+    dataset_dir = os.path.join(target_dir, content_hash(path))
+    if _is_current(dataset_dir):
+        _register(dataset_dir, 'kraken', filename, data_dir)
+        return dataset_dir
+
+    os.makedirs(target_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(dir=target_dir, prefix='.ingest-')
+    try:
+        if progress:
+            progress(0, 1, f"Parsing {filename or os.path.basename(path)}")
+        df = read_kraken_report(path)
+        df.to_parquet(os.path.join(staging_dir, KRAKEN_REPORT_NAME), index=False)
+        build_taxonomy_index(df).to_parquet(os.path.join(staging_dir, TAXONOMY_INDEX_NAME), index=False)
+        write_report_aggregates(df, staging_dir)
+        with open(os.path.join(staging_dir, MANIFEST_NAME), 'w') as fh:
+            json.dump({'kind': 'kraken', 'version': MANIFEST_VERSION, 'filename': filename, 'rows': len(df)}, fh)
+        _publish(staging_dir, dataset_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    _register(dataset_dir, 'kraken', filename, data_dir)
+    return dataset_dir
+
+
+def load_kraken_report(dataset_dir):
+    return pd.read_parquet(os.path.join(dataset_dir, KRAKEN_REPORT_NAME))
+
+
+@lru_cache(maxsize=16)
+def load_report_aggregates(dataset_dir):
+    """Read-only ReportAggregates of an ingested Kraken report; dataset directories never change, so it is cached."""
+    return read_report_aggregates(dataset_dir, load_kraken_report(dataset_dir))
+
+
+def read_manifest(dataset_dir):
+    with open(os.path.join(dataset_dir, MANIFEST_NAME)) as fh:
+        return json.load(fh)
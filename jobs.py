@@ -0,0 +1,168 @@
+import functools
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ingest import get_data_dir
+
+
+# Status files of jobs older than this are removed when new jobs are submitted
+STALE_JOB_SECONDS = 24 * 60 * 60
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_jobs_dir():
+    return os.path.join(get_data_dir(), 'jobs')
+
+
+def get_executor():
+    """
+    Shared process pool for ingest jobs.
+
+    Sized by DASHBOARD_INGEST_WORKERS (default: number of cores). Workers are
+    spawned rather than forked, since the web server process is threaded.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_workers = int(os.environ.get('DASHBOARD_INGEST_WORKERS', 0)) or os.cpu_count() or 1
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def _reset_executor(broken=None):
+    """Drop the shared pool; with broken given, only if it is still the shared one."""
+    global _executor
+    with _executor_lock:
+        if broken is not None and _executor is not broken:
+            return
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+class JobProgress:
+    """
+    Status file of one ingest job, written by the worker process and read
+    by whichever web worker serves the polling callback.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        try:
+            with open(self.path) as fh:
+                return json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def update(self, **fields):
+        state = self.read() or {}
+        state.update(fields)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(state, fh)
+        os.replace(tmp_path, self.path)
+
+    def __call__(self, done, total, message=''):
+        """Report progress from inside the job function."""
+        self.update(done=done, total=total, message=message)
+
+
+def _run_job(job_path, fn, args, kwargs):
+    progress = JobProgress(job_path)
+    progress.update(state='running')
+    try:
+        result = fn(*args, progress=progress, **kwargs)
+    except Exception as e:
+        progress.update(state='error', error=str(e))
+        return
+    progress.update(state='done', result=result)
+
+
+def _job_finished(job_path, executor, future):
+    """
+    Record a job whose worker never got to report its outcome.
+
+    _run_job handles exceptions raised by the job itself. If the worker
+    process dies (killed for memory, os._exit, a crash in native code), the
+    future fails with BrokenProcessPool instead and the status file would
+    stay 'running'. The broken pool is replaced so later jobs can run.
+    """
+    if future.cancelled():
+        error = "Job was cancelled"
+    else:
+        exc = future.exception()
+        if exc is None:
+            return
+        if isinstance(exc, BrokenProcessPool):
+            _reset_executor(broken=executor)
+        error = str(exc) or type(exc).__name__
+    progress = JobProgress(job_path)
+    if (progress.read() or {}).get('state') != 'done':
+        progress.update(state='error', error=error)
+
+
+def _submit(job_path, fn, args, kwargs):
+    executor = get_executor()
+    future = executor.submit(_run_job, job_path, fn, args, kwargs)
+    future.add_done_callback(functools.partial(_job_finished, job_path, executor))
+
+
+def _remove_stale_jobs(jobs_dir):
+    cutoff = time.time() - STALE_JOB_SECONDS
+    for entry in os.scandir(jobs_dir):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def submit_job(fn, *args, **kwargs):
+    """
+    Run fn(*args, progress=..., **kwargs) in the ingest pool.
+
+    fn must be importable and return something JSON-serializable (for
+    ingest, the path of the dataset it wrote).
+
+    Returns:
+        str: Job id to pass to job_status.
+    """
+    jobs_dir = get_jobs_dir()
+    os.makedirs(jobs_dir, exist_ok=True)
+    _remove_stale_jobs(jobs_dir)
+    job_id = uuid.uuid4().hex
+    job_path = os.path.join(jobs_dir, f'{job_id}.json')
+    JobProgress(job_path).update(state='queued', done=0, total=0, message='')
+    try:
+        _submit(job_path, fn, args, kwargs)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start a fresh pool for this and later jobs
+        _reset_executor()
+        _submit(job_path, fn, args, kwargs)
+    return job_id
+
+
+def job_status(job_id):
+    """
+    Return the state of a job: a dict with 'state' ('queued', 'running',
+    'done' or 'error'), 'done', 'total', 'message', and 'result' or 'error'.
+    """
+    if not job_id or not job_id.isalnum():
+        return None
+    return JobProgress(os.path.join(get_jobs_dir(), f'{job_id}.json')).read()
+
@@ -0,0 +1,184 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from kraken_bar_plot import OTHER_LABEL
+from kraken_report import nearest_ancestor_in, parent_index, report_depth
+
+
+# Written at ingest next to the report:
+#   aggregates.parquet   one row per report row: parent, nearest Sankey ancestor,
+#                        position among the Sankey candidates and fraction of all reads
+#   composition.parquet  reads per (rank, name), largest first within each rank
+AGGREGATES_NAME = 'aggregates.parquet'
+COMPOSITION_NAME = 'composition.parquet'
+# Ranks of the Sankey diagram and of the stacked bar chart
+SANKEY_RANKS = ('G', 'S')
+BAR_RANKS = ('G', 'S')
+
+_REPORT_COLUMNS = ['reads_clade', 'reads_taxon', 'rank', 'NCBI_tax_ID', 'name']
+
+
+def build_report_aggregates(df):
+    """
+    Aggregates of a Kraken report that do not depend on plot settings.
+
+    Args:
+        df (pd.DataFrame): Kraken report in report order, as read by
+            kraken_report.read_kraken_report.
+    Returns:
+        Tuple of DataFrames (per-row aggregates, rank composition), see
+        AGGREGATES_NAME and COMPOSITION_NAME.
+    """
+    parents = parent_index(report_depth(df))
+    reads_clade = df['reads_clade'].to_numpy()
+    total_reads = reads_clade[parents < 0].sum()
+    ranks = df['rank'].to_numpy()
+
+    # Sankey candidates: taxa at the shown ranks with reads, largest clade first
+    eligible = np.isin(ranks, SANKEY_RANKS) & (reads_clade >= 1)
+    candidates = np.flatnonzero(eligible)
+    candidates = candidates[np.argsort(-reads_clade[candidates].astype(np.int64), kind='stable')]
+    sankey_order = np.full(len(df), -1, dtype=np.int64)
+    sankey_order[candidates] = np.arange(len(candidates))
+
+    nodes = pd.DataFrame({
+        'parent': parents,
+        'sankey_ancestor': nearest_ancestor_in(parents, eligible),
+        'sankey_order': sankey_order,
+        'fraction': reads_clade / total_reads if total_reads else np.zeros(len(df)),
+    })
+
+    reads = df.groupby(['rank', 'name'], observed=True)['reads_taxon'].sum().reset_index(name='reads')
+    reads = reads[reads['reads'] > 0]
+    reads = reads.sort_values(['rank', 'reads'], ascending=[True, False], kind='stable', ignore_index=True)
+    reads['proportion'] = reads['reads'] / reads.groupby('rank', observed=True)['reads'].transform('sum')
+    composition = reads.astype({'rank': str, 'name': str})
+    return nodes, composition
+
+
+def write_report_aggregates(df, dataset_dir):
+    nodes, composition = build_report_aggregates(df)
+    nodes.to_parquet(os.path.join(dataset_dir, AGGREGATES_NAME), index=False)
+    composition.to_parquet(os.path.join(dataset_dir, COMPOSITION_NAME), index=False)
+
+
+def _read_only(values):
+    values = np.asarray(values)
+    values.flags.writeable = False
+    return values
+
+
+class ReportAggregates:
+    """
+    Read-only view of one Kraken report and its ingest-time aggregates.
+
+    The stacked bar chart and the Sankey diagram read from it: per-rank
+    composition lists are cut to top N, and the Sankey taxa are picked from
+    the precomputed candidate order and ancestor links. Every array is
+    read-only, and each call builds its own small result, so one instance
+    is shared by all callbacks.
+
+    Args:
+        report (pd.DataFrame): The ingested report (load_kraken_report).
+        nodes (pd.DataFrame): Per-row aggregates (AGGREGATES_NAME).
+        composition (pd.DataFrame): Rank composition (COMPOSITION_NAME).
+    """
+
+    def __init__(self, report, nodes, composition):
+        self._report = {col: _read_only(report[col].to_numpy()) for col in _REPORT_COLUMNS}
+        self.parents = _read_only(nodes['parent'].to_numpy())
+        self.fraction = _read_only(nodes['fraction'].to_numpy())
+        self._ancestor = _read_only(nodes['sankey_ancestor'].to_numpy())
+        order = nodes['sankey_order'].to_numpy()
+        candidates = np.flatnonzero(order >= 0)
+        self._candidates = _read_only(candidates[np.argsort(order[candidates])])
+        self.total_reads = int(self._report['reads_clade'][self.parents < 0].sum())
+
+        self._composition = {}
+        for rank, rows in composition.groupby('rank', sort=False):
+            self._composition[rank] = (_read_only(rows['name'].to_numpy(dtype=object)),
+                                       _read_only(rows['reads'].to_numpy(dtype=np.int64)))
+
+    def rank_composition(self, rank, top_n=10):
+        """
+        Top taxa of one rank and the remainder, as kraken_bar_plot.rank_composition.
+
+        Returns:
+            Tuple of numpy arrays (names, reads, proportions), largest first,
+            ending with an "Other" entry when taxa were left out.
+        """
+        names, reads = self._composition.get(rank, (np.array([], dtype=object), np.array([], dtype=np.int64)))
+        total = int(reads.sum())
+        top_names, counts = names[:top_n], reads[:top_n]
+        if len(names) > top_n:
+            top_names = np.append(top_names, OTHER_LABEL)
+            counts = np.append(counts, total - counts.sum())
+        proportions = counts / total if total > 0 else np.zeros(len(counts))
+        return top_names, counts, proportions
+
+    def rank_compositions(self, top_n=10, ranks=BAR_RANKS):
+        """{rank: rank_composition(rank, top_n)}, the input of kraken_bar_plot.plot_rank_compositions."""
+        return {rank: self.rank_composition(rank, top_n) for rank in ranks}
+
+    def sankey_taxa(self, top_n=10):
+        """
+        Taxa and links of the Sankey diagram, as sankey_plot_fixed.select_sankey_taxa
+        with its default ranks and minimum reads.
+
+        Returns:
+            tuple: (taxa DataFrame, dict of 'source', 'target' and 'value' arrays)
+        """
+        selected = np.zeros(len(self.parents), dtype=bool)
+        candidates = self._candidates if top_n is None else self._candidates[:top_n]
+        selected[candidates] = True
+
+        # Pull in the shown ancestors, so every link follows a real parent/child relationship
+        frontier = self._ancestor[candidates]
+        frontier = frontier[frontier >= 0]
+        while len(frontier):
+            new = frontier[~selected[frontier]]
+            selected[new] = True
+            frontier = self._ancestor[new]
+            frontier = frontier[frontier >= 0]
+
+        shown = np.flatnonzero(selected)
+        report = {col: values[shown] for col, values in self._report.items()}
+        taxa = pd.DataFrame({
+            'percentage': self.fraction[shown],
+            'reads_clade': report['reads_clade'],
+            'reads_taxon': report['reads_taxon'],
+            'rank': report['rank'],
+            'NCBI_tax_ID': report['NCBI_tax_ID'],
+            'name': report['name'],
+            'name_clean': report['name'],
+        })
+
+        # The ancestors of shown taxa are shown, so the nearest shown ancestor is the nearest candidate
+        node_of = np.full(len(selected), -1, dtype=np.int64)
+        node_of[shown] = np.arange(len(shown))
+        shown_ancestor = self._ancestor[shown]
+        has_parent = shown_ancestor >= 0
+        links = {
+            'source': node_of[shown_ancestor[has_parent]],
+            'target': np.flatnonzero(has_parent),
+            'value': report['reads_clade'][has_parent],
+        }
+        return taxa, links
+
+
+def read_report_aggregates(dataset_dir, report):
+    """
+    ReportAggregates of an ingested report; see ingest.load_report_aggregates for the cached loader.
+
+    Datasets converted before the aggregates existed (in older batch
+    bundles) get them computed from the report instead.
+    """
+    if not os.path.exists(os.path.join(dataset_dir, AGGREGATES_NAME)):
+        return ReportAggregates(report, *build_report_aggregates(report))
+    return ReportAggregates(
+        report,
+        pd.read_parquet(os.path.join(dataset_dir, AGGREGATES_NAME)),
+        pd.read_parquet(os.path.join(dataset_dir, COMPOSITION_NAME)),
+    )
@@ -1,64 +1,115 @@
 # kraken_bar_plot.py
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.colors as pc
 
-def plot_stacked_bar_kraken(df, top_n=10):
+OTHER_LABEL = "Other"
+RANK_LABELS = {"G": "Genus", "S": "Species"}
+
+
+def rank_composition(df, rank, top_n=10):
+    """
+    Top taxa of one rank and the remainder, as proportions of the rank's reads.
+
+    Args:
+        df (pd.DataFrame): Kraken report with stripped names and direct_reads.
+        rank (str): Rank code, e.g. 'G' or 'S'.
+        top_n (int): Number of taxa kept individually.
+    Returns:
+        Tuple of numpy arrays (names, reads, proportions), largest first,
+        ending with an "Other" entry when taxa were left out.
+    """
+    reads = df.loc[df["rank"] == rank].groupby("name", observed=True)["direct_reads"].sum()
+    reads = reads[reads > 0].sort_values(ascending=False)
+    total = int(reads.sum())
+
+    top = reads.head(top_n)
+    names = top.index.astype(str).to_numpy(dtype=object)
+    counts = top.to_numpy(dtype=np.int64)
+    if len(reads) > top_n:
+        names = np.append(names, OTHER_LABEL)
+        counts = np.append(counts, total - counts.sum())
+
+    proportions = counts / total if total > 0 else np.zeros(len(counts))
+    return names, counts, proportions
+
+
+def plot_stacked_bar_kraken(df, top_n=10, ranks=("G", "S")):
+    """
+    Stacked bar chart of the top taxa per rank, one trace per rank.
+
+    Each rank is drawn as a single go.Bar whose segments are stacked with
+    an explicit base, and the per-taxon name and read count travel in
+    customdata, so the figure size does not grow with the number of traces.
+
+    Args:
+        df (pd.DataFrame): Kraken report with rank, name and direct_reads columns.
+        top_n (int): Number of taxa shown per rank; the rest is grouped as "Other".
+        ranks (tuple): Ranks to plot, one bar each.
+    Returns:
+        Plotly figure object.
+    """
     if not {'rank', 'direct_reads', 'name'}.issubset(df.columns):
         return go.Figure().update_layout(title="Error: Required columns missing")
 
-    df["name"] = df["name"].str.strip()
-
-    genus_df = df[df["rank"] == "G"].groupby("name", as_index=False)["direct_reads"].sum()
-    species_df = df[df["rank"] == "S"].groupby("name", as_index=False)["direct_reads"].sum()
+    # Strip on a copy, the report frame is shared and its indentation encodes the tree
+    df = df.assign(name=df["name"].str.strip())
 
-    if genus_df.empty and species_df.empty:
-        return go.Figure().update_layout(title="No Genus/Species-Level Data Available")
+    return plot_rank_compositions({rank: rank_composition(df, rank, top_n) for rank in ranks}, top_n)
 
-    genus_df = genus_df.sort_values("direct_reads", ascending=False).head(top_n)
-    species_df = species_df.sort_values("direct_reads", ascending=False).head(top_n)
 
-    genus_total = genus_df["direct_reads"].sum()
-    species_total = species_df["direct_reads"].sum()
+def plot_rank_compositions(compositions, top_n=10):
+    """
+    Stacked bar chart of per-rank compositions, as drawn by plot_stacked_bar_kraken.
 
-    genus_df["proportion"] = genus_df["direct_reads"] / genus_total if genus_total > 0 else 0
-    species_df["proportion"] = species_df["direct_reads"] / species_total if species_total > 0 else 0
+    Args:
+        compositions (dict): {rank: (names, reads, proportions)}, as returned
+            by rank_composition or ReportAggregates.rank_composition.
+        top_n (int): Number of taxa shown per rank, for the title.
+    Returns:
+        Plotly figure object.
+    """
+    if all(len(names) == 0 for names, _, _ in compositions.values()):
+        return go.Figure().update_layout(title="No Genus/Species-Level Data Available")
 
-    # Colors
+    # Colors, shared by taxa that appear in several ranks
     color_palette = pc.qualitative.Bold
-    all_names = pd.concat([genus_df["name"], species_df["name"]]).unique()
-    color_map = {name: color_palette[i % len(color_palette)] for i, name in enumerate(all_names)}
+    all_names = pd.unique(np.concatenate([names for names, _, _ in compositions.values()]))
+    color_map = {name: color_palette[i % len(color_palette)] for i, name in enumerate(all_names) if name != OTHER_LABEL}
+    color_map[OTHER_LABEL] = "#7f7f7f"
 
     fig = go.Figure()
 
-    for _, row in genus_df.iterrows():
-        fig.add_trace(go.Bar(
-            x=["Genus"],
-            y=[row["proportion"]],
-            name=f"G: {row['name']}",
-            hovertemplate=f"{row['name']}<br>Proportion: {row['proportion']:.2%}",
-            marker=dict(color=color_map[row["name"]])
-        ))
-
-    for _, row in species_df.iterrows():
+    for rank, (names, counts, proportions) in compositions.items():
+        if len(names) == 0:
+            continue
+        rank_label = RANK_LABELS.get(rank, rank)
         fig.add_trace(go.Bar(
-            x=["Species"],
-            y=[row["proportion"]],
-            name=f"S: {row['name']}",
-            hovertemplate=f"{row['name']}<br>Proportion: {row['proportion']:.2%}",
-            marker=dict(color=color_map[row["name"]])
+            x=np.full(len(names), rank_label),
+            y=proportions,
+            base=np.concatenate([[0], np.cumsum(proportions)[:-1]]),
+            name=rank_label,
+            customdata=np.column_stack([names, counts]),
+            marker=dict(color=[color_map[name] for name in names], line=dict(color="#1e1e1e", width=0.5)),
+            text=names,
+            textposition="inside",
+            insidetextanchor="middle",
+            hovertemplate="%{customdata[0]}<br>Reads: %{customdata[1]:,}<br>Proportion: %{y:.2%}<extra>%{x}</extra>",
         ))
 
     fig.update_layout(
-        title="Top Taxa - Stacked Bar Chart of Kraken2 Reads",
+        title=f"Top {top_n} Taxa - Stacked Bar Chart of Kraken2 Reads",
         xaxis_title="Taxonomic Rank",
         yaxis_title="Proportion of Reads",
-        barmode="stack",
+        yaxis=dict(tickformat=".0%", range=[0, 1]),
+        barmode="overlay",
+        showlegend=False,
+        uniformtext=dict(minsize=9, mode="hide"),
         font=dict(size=12, color="white"),
         plot_bgcolor="#2c2f34",
         paper_bgcolor="#1e1e1e",
-        legend=dict(title="Taxa", font=dict(size=10)),
         margin=dict(t=60, b=60)
     )
 
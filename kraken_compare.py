@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.colors as pc
+
+from kraken_report import report_depth
+
+
+OTHER_LABEL = "Other"
+
+
+def build_abundance_table(reports, ranks=('G', 'S')):
+    """
+    Combine per-sample Kraken2 reports into one long, columnar abundance table.
+
+    Only taxa with reads are kept, so the table is the sparse form of the
+    sample x taxon matrix: one row per (sample, taxon) with a non-zero count.
+
+    Args:
+        reports (dict): {sample_label: report DataFrame}.
+        ranks (tuple): Ranks to keep.
+    Returns:
+        pd.DataFrame with categorical sample, rank and name columns, a uint32
+        tax_id, uint64 reads (clade reads) and float32 fraction of the
+        sample's total reads.
+    """
+    parts = []
+    for sample, df in reports.items():
+        reads = df["reads_clade"].to_numpy()
+        total_reads = reads[report_depth(df) == 0].sum()
+        keep = df["rank"].isin(ranks).to_numpy() & (reads > 0)
+        part = pd.DataFrame({
+            "sample": sample,
+            "rank": df["rank"].to_numpy()[keep],
+            "tax_id": df["NCBI_tax_ID"].to_numpy()[keep],
+            "name": df["name"].astype(str).str.strip().to_numpy()[keep],
+            "reads": reads[keep],
+        })
+        part["fraction"] = (part["reads"] / total_reads if total_reads else 0.0)
+        parts.append(part)
+
+    if not parts:
+        return pd.DataFrame(columns=["sample", "rank", "tax_id", "name", "reads", "fraction"])
+
+    table = pd.concat(parts, ignore_index=True)
+    return table.astype({
+        "sample": pd.CategoricalDtype(list(reports)),
+        "rank": "category",
+        "tax_id": np.uint32,
+        "name": "category",
+        "reads": np.uint64,
+        "fraction": np.float32,
+    })
+
+
+def abundance_matrix(table, rank="S", top_n=15, value="fraction"):
+    """
+    Pivot the top taxa of one rank into a dense samples x taxa matrix.
+
+    Taxa are ranked by their summed value across samples; the remainder of
+    each sample's value at that rank is collected in an "Other" column.
+
+    Args:
+        table (pd.DataFrame): Output of build_abundance_table.
+        rank (str): Rank to compare.
+        top_n (int): Number of taxa to show.
+        value (str): 'fraction' or 'reads'.
+    Returns:
+        pd.DataFrame indexed by sample.
+    """
+    subset = table[table["rank"] == rank]
+    totals = subset.groupby("tax_id", observed=True)[value].sum()
+    top_ids = totals.nlargest(top_n).index
+
+    top = subset[subset["tax_id"].isin(top_ids)]
+    # Only the observed names become columns; samples without any top taxon still get a row
+    matrix = top.pivot_table(index="sample", columns="name", values=value, aggfunc="sum", observed=True, fill_value=0)
+    matrix = matrix.reindex(
+        index=table["sample"].cat.categories,
+        columns=top.groupby("name", observed=True)[value].sum().sort_values(ascending=False).index,
+        fill_value=0,
+    )
+
+    other = subset.groupby("sample", observed=False)[value].sum() - matrix.sum(axis=1)
+    if (other > 0).any():
+        matrix[OTHER_LABEL] = other.clip(lower=0)
+    return matrix
+
+
+def plot_kraken_comparison(table, rank="S", top_n=15, plot_type="bar"):
+    """
+    Plot the top taxa across all samples as a stacked bar chart or heatmap.
+
+    Args:
+        table (pd.DataFrame): Output of build_abundance_table.
+        rank (str): 'G' or 'S'.
+        top_n (int): Number of taxa shown individually.
+        plot_type (str): 'bar' or 'heatmap'.
+    Returns:
+        Plotly figure object.
+    """
+    return plot_abundance_matrix(abundance_matrix(table, rank=rank, top_n=top_n), rank, top_n, plot_type)
+
+
+def plot_abundance_matrix(matrix, rank="S", top_n=15, plot_type="bar"):
+    """
+    Plot a samples x taxa matrix from abundance_matrix (or query_engine.abundance_matrix).
+
+    Args:
+        matrix (pd.DataFrame): Proportions indexed by sample, one column per taxon.
+        rank (str): 'G' or 'S', for the labels.
+        top_n (int): Number of taxa shown individually, for the title.
+        plot_type (str): 'bar' or 'heatmap'.
+    Returns:
+        Plotly figure object.
+    """
+    rank_label = {"G": "Genus", "S": "Species"}.get(rank, rank)
+    if matrix.empty:
+        return go.Figure().update_layout(title=f"No {rank_label}-Level Data Available")
+
+    samples = matrix.index.astype(str).tolist()
+    fig = go.Figure()
+
+    if plot_type == "heatmap":
+        fig.add_trace(go.Heatmap(
+            z=matrix.to_numpy().T,
+            x=samples,
+            y=matrix.columns.astype(str).tolist(),
+            colorscale="Viridis",
+            colorbar=dict(title="Proportion", tickformat=".0%"),
+            hovertemplate="%{x}<br>%{y}<br>Proportion: %{z:.2%}<extra></extra>",
+        ))
+        fig.update_layout(yaxis=dict(autorange="reversed"))
+    else:
+        color_palette = pc.qualitative.Bold
+        for i, name in enumerate(matrix.columns):
+            fig.add_trace(go.Bar(
+                x=samples,
+                y=matrix[name].to_numpy(),
+                name=str(name),
+                marker=dict(color="#7f7f7f" if name == OTHER_LABEL else color_palette[i % len(color_palette)]),
+                hovertemplate=f"{name}<br>%{{x}}<br>Proportion: %{{y:.2%}}<extra></extra>",
+            ))
+        fig.update_layout(barmode="stack", yaxis=dict(tickformat=".0%"))
+
+    fig.update_layout(
+        title=f"Top {top_n} {rank_label} Across {len(samples)} Samples",
+        xaxis_title="Sample",
+        yaxis_title="Proportion of Reads" if plot_type != "heatmap" else rank_label,
+        font=dict(size=12, color="white"),
+        plot_bgcolor="#2c2f34",
+        paper_bgcolor="#1e1e1e",
+        legend=dict(title="Taxa", font=dict(size=10)),
+        xaxis=dict(tickangle=-45),
+        margin=dict(t=60, b=100)
+    )
+    return fig
@@ -0,0 +1,191 @@
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+# Standard `kraken2 --report` columns
+KRAKEN_COLUMNS = ['percentage', 'reads_clade', 'reads_taxon', 'rank', 'NCBI_tax_ID', 'name']
+# `kraken2 --report --report-minimizer-data` adds two minimizer counts
+KRAKEN_MINIMIZER_COLUMNS = [
+    'percentage', 'reads_clade', 'reads_taxon', 'minimizers', 'distinct_minimizers', 'rank', 'NCBI_tax_ID', 'name'
+]
+COUNT_COLUMNS = ['reads_clade', 'reads_taxon', 'minimizers', 'distinct_minimizers']
+
+DEFAULT_CHUNKSIZE = 100_000
+
+_READ_DTYPES = {
+    'percentage': 'float32',
+    'reads_clade': 'uint64',
+    'reads_taxon': 'uint64',
+    'minimizers': 'uint64',
+    'distinct_minimizers': 'uint64',
+    'rank': str,
+    'NCBI_tax_ID': 'uint32',
+    'name': str,
+}
+
+
+def indent_depth(names):
+    """
+    Return the tree depth of each Kraken2 report row.
+
+    Kraken2 indents the name column by two spaces per level below the root.
+
+    Args:
+        names (pd.Series): The raw, unstripped name column.
+    Returns:
+        np.ndarray of int32 depths.
+    """
+    names = names.astype(str)
+    return ((names.str.len() - names.str.lstrip(' ').str.len()) // 2).to_numpy(dtype=np.int32)
+
+
+def parent_index(depth):
+    """
+    Derive each row's parent position from the depths of a report in file order.
+
+    A report is a pre-order walk of the taxonomy, so the parent of a row is the
+    closest earlier row one level up. That lookup is a searchsorted per depth
+    level, which keeps the whole pass vectorized.
+
+    Args:
+        depth (array-like): Tree depth of each row, in report order.
+    Returns:
+        np.ndarray of int64 parent positions, -1 for top-level rows.
+    """
+    depth = np.asarray(depth)
+    parents = np.full(len(depth), -1, dtype=np.int64)
+    positions = np.arange(len(depth))
+
+    for level in np.unique(depth):
+        if level <= 0:
+            continue
+        rows = positions[depth == level]
+        candidates = positions[depth == level - 1]
+        if len(candidates) == 0:
+            continue
+        slot = np.searchsorted(candidates, rows) - 1
+        parents[rows] = np.where(slot >= 0, candidates[np.maximum(slot, 0)], -1)
+    return parents
+
+
+def nearest_ancestor_in(parents, mask):
+    """
+    For every row, find the closest ancestor for which mask is True.
+
+    Every unresolved row moves one level up per numpy pass, so the number of
+    passes is bounded by the tree depth rather than the number of rows.
+
+    Args:
+        parents (np.ndarray): Output of parent_index.
+        mask (np.ndarray): Boolean array marking eligible ancestors.
+    Returns:
+        np.ndarray of ancestor positions, -1 where there is none.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    ancestor = parents.copy()
+    pending = ancestor >= 0
+    pending[pending] = ~mask[ancestor[pending]]
+    while pending.any():
+        ancestor[pending] = parents[ancestor[pending]]
+        pending &= ancestor >= 0
+        pending[pending] = ~mask[ancestor[pending]]
+    return ancestor
+
+
+def kraken_sample_label(filename, existing):
+    """Sample label from a report file name ("3N09_L006_L000..." -> "3N09"), kept unique."""
+    label = filename.split("_")[0]
+    if label in existing:
+        label = filename.rsplit(".", 1)[0]
+    suffix = 2
+    base = label
+    while label in existing:
+        label = f"{base} ({suffix})"
+        suffix += 1
+    return label
+
+
+def report_depth(df):
+    """Depth of each row, from a parsed 'depth' column if present, else from the name indentation."""
+    if 'depth' in df.columns:
+        return df['depth'].to_numpy()
+    return indent_depth(df['name'])
+
+
+def _report_columns(fh):
+    """Pick the column layout from the first line without consuming it."""
+    position = fh.tell()
+    first_line = fh.readline()
+    fh.seek(position)
+    if not first_line.strip():
+        raise ValueError("Empty Kraken report")
+
+    n_columns = first_line.count(b'\t') + 1
+    if n_columns == len(KRAKEN_COLUMNS):
+        return KRAKEN_COLUMNS
+    if n_columns == len(KRAKEN_MINIMIZER_COLUMNS):
+        return KRAKEN_MINIMIZER_COLUMNS
+    raise ValueError(
+        f"Unexpected number of columns in Kraken report (expected {len(KRAKEN_COLUMNS)} "
+        f"or {len(KRAKEN_MINIMIZER_COLUMNS)}, found {n_columns})"
+    )
+
+
+def _compact_chunk(chunk):
+    names = chunk['name']
+    chunk['depth'] = indent_depth(names).astype(np.uint8)
+    chunk['name'] = pd.Categorical(names.str.strip())
+    chunk['rank'] = pd.Categorical(chunk['rank'])
+    return chunk
+
+
+def read_kraken_report(source, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Parse a Kraken2 report in chunks into a compact DataFrame.
+
+    Accepts the 6-column report and the 8-column report written with
+    --report-minimizer-data. The name indentation is moved into a uint8
+    'depth' column and the names are stripped. Rank and name are stored as
+    categoricals, tax IDs as uint32, and read counts as uint32 unless a
+    count needs uint64.
+
+    Args:
+        source: A file path, the raw report bytes, or a binary file object.
+        chunksize (int): Rows parsed per chunk.
+    Returns:
+        pd.DataFrame in report order.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if isinstance(source, str) or hasattr(source, '__fspath__'):
+        with open(source, 'rb') as fh:
+            return read_kraken_report(fh, chunksize=chunksize)
+
+    columns = _report_columns(source)
+    reader = pd.read_csv(
+        source,
+        sep='\t',
+        header=None,
+        names=columns,
+        dtype={col: _READ_DTYPES[col] for col in columns},
+        quoting=csv.QUOTE_NONE,
+        na_filter=False,
+        chunksize=chunksize,
+    )
+    chunks = [_compact_chunk(chunk) for chunk in reader]
+
+    categorical = ['rank', 'name']
+    df = pd.concat([chunk.drop(columns=categorical) for chunk in chunks], ignore_index=True)
+    # Plain concat would fall back to object dtype when chunk categories differ
+    for col in categorical:
+        df[col] = union_categoricals([chunk[col] for chunk in chunks])
+
+    for col in COUNT_COLUMNS:
+        if col in df.columns and (df.empty or df[col].max() <= np.iinfo(np.uint32).max):
+            df[col] = df[col].astype(np.uint32)
+
+    return df[columns + ['depth']]
@@ -1,6 +1,69 @@
+import os
+import uuid
+
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 
+from metric_plots import RENDER_MODES
+from run_history import DEFAULT_LAST_RUNS
+from watcher import DEFAULT_WATCH_INTERVAL, get_watch_dir
+
+
+# Drop zone handled by assets/chunked_upload.js: files are streamed to the
+# /upload endpoint and only the resulting handle lands in '<id>-handle'
+def get_chunked_upload(component_id, prompt, status_id, accept=None, multiple=False):
+    return html.Div(
+        [
+            html.Div([
+                html.I(className="bi bi-upload me-2"),
+                'Drag and Drop or ',
+                html.A(prompt, className="text-primary fw-bold")
+            ]),
+            dcc.Store(id=f'{component_id}-handle'),
+        ],
+        id=component_id,
+        className='chunked-upload',
+        style={
+            'width': '100%',
+            'height': '70px',
+            'lineHeight': '70px',
+            'borderWidth': '2px',
+            'borderStyle': 'dashed',
+            'borderRadius': '10px',
+            'textAlign': 'center',
+            'margin': '10px',
+            'backgroundColor': '#f8f9fa',
+            'color': '#000000',
+            'cursor': 'pointer'
+        },
+        **{
+            'data-status-id': status_id,
+            'data-accept': accept or '',
+            'data-multiple': 'true' if multiple else 'false',
+        }
+    )
+
+
+# Workflow outputs picked up by the results watcher; only shown when DASHBOARD_WATCH_DIR is set
+def get_watch_selector(component_id, label, multi=False):
+    if get_watch_dir() is None:
+        return None
+    interval = float(os.environ.get('DASHBOARD_WATCH_INTERVAL', DEFAULT_WATCH_INTERVAL))
+    return html.Div(
+        [
+            html.Label(label, className="fw-bold"),
+            dcc.Dropdown(
+                id=component_id,
+                multi=multi,
+                placeholder="Select from the watched results directory",
+                style={'color': '#000000', 'backgroundColor': '#ffffff'}
+            ),
+            # Refreshes the options from the watcher's index
+            dcc.Interval(id=f'{component_id}-poll', interval=interval * 1000),
+        ],
+        className="mt-3"
+    )
+
 
 # File upload section
 def get_file_upload():
@@ -12,29 +75,14 @@ def get_file_upload():
             ),
             dbc.CardBody(
                 [
-                    dcc.Upload(
-                        id='upload-data',
-                        children=html.Div([
-                            html.I(className="bi bi-upload me-2"),
-                            'Drag and Drop or ',
-                            html.A('Select a File', className="text-primary fw-bold")
-                        ]),
-                        style={
-                            'width': '100%',
-                            'height': '70px',
-                            'lineHeight': '70px',
-                            'borderWidth': '2px',
-                            'borderStyle': 'dashed',
-                            'borderRadius': '10px',
-                            'textAlign': 'center',
-                            'margin': '10px',
-                            'backgroundColor': '#f8f9fa',
-                            'color': '#000000'
-                        },
-                        multiple=False
-                    ),
+                    get_chunked_upload('upload-data', 'Select a File', 'upload-status', accept='.xlsx,.xls'),
                     # Add this Div to display upload status
                     html.Div(id='upload-status', className='mt-2 text-success'),
+                    # Ingest job of the last upload, polled until the workbook is converted
+                    dcc.Store(id='upload-job'),
+                    dcc.Interval(id='upload-job-poll', interval=500, disabled=True),
+                    # Changes only when an ingest adds a run to the history
+                    dcc.Store(id='history-version'),
                     html.Div(
                         [
                             html.Label("Select a Sheet:", className="fw-bold mt-3"),
@@ -49,6 +97,19 @@ def get_file_upload():
                         ],
                         className="mt-3"
                     ),
+                    # Datasets pre-rendered by batch.py, opened by path instead of uploaded
+                    html.Div(
+                        [
+                            html.Label("Or open a batch bundle:", className="fw-bold"),
+                            dbc.InputGroup([
+                                dbc.Input(id='bundle-path', type='text', placeholder="Bundle directory written by batch.py"),
+                                dbc.Button("Open", id='bundle-open', color='secondary'),
+                            ]),
+                            html.Div(id='bundle-status', className='mt-2 text-success'),
+                        ],
+                        className="mt-3"
+                    ),
+                    get_watch_selector('watch-workbook-dropdown', "Or pick a watched workbook:"),
                 ]
             ),
         ],
@@ -65,7 +126,7 @@ def get_data_display():
                 dbc.Card(
                     [
                         dbc.CardHeader(html.H5("Spreadsheet Data", className="text-white"), className="bg-secondary"),
-                        dbc.CardBody([dcc.Loading(children=[html.Div(id="data-table-container")], type="default")]),
+                        dbc.CardBody([dcc.Loading(children=[html.Div(id="data-table-container")], type="default"), dcc.Store(id="data-table-view")]),
                     ],
                     className="shadow-sm mb-4"
                 ),
@@ -89,7 +150,13 @@ def get_data_display():
                                     dcc.Dropdown(id='y-axis-dropdown', placeholder="Select column for Y-axis",
                                     style={'color': '#000000', 'backgroundColor': '#ffffff'})
                                 ], className="mb-3"),
+                                html.Div([
+                                    html.Label("Render As:", className="fw-bold"),
+                                    dcc.Dropdown(id='coverage-render-mode', options=RENDER_MODES, value='auto', clearable=False,
+                                        style={'color': '#000000', 'backgroundColor': '#ffffff'})
+                                ], className="mb-3"),
                                 dcc.Graph(id='coverage-bar-plot', style={'height': '500px'}),
+                                dcc.Store(id='coverage-bar-plot-view'),
                             ]
                         ),
                     ],
@@ -134,7 +201,13 @@ def get_data_display():
                                             dcc.Dropdown(id='new-y-axis-dropdown', placeholder="Select column for Y-axis",
                                             style={'color': '#000000', 'backgroundColor': '#ffffff'})
                                         ], className="mb-3"),
+                                        html.Div([
+                                            html.Label("Render As:", className="fw-bold"),
+                                            dcc.Dropdown(id='new-bar-render-mode', options=RENDER_MODES, value='auto', clearable=False,
+                                                style={'color': '#000000', 'backgroundColor': '#ffffff'})
+                                        ], className="mb-3"),
                                         dcc.Graph(id='new-bar-plot', style={'height': '500px'}),
+                                        dcc.Store(id='new-bar-plot-view'),
                                     ]
                                 ),
                             ],
@@ -143,10 +216,39 @@ def get_data_display():
                         width=6  # Takes half the width
                     ),
                 ]
-            )
-
-
+            ),
 
+            # Run History Section
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader(html.H5("Run History", className="text-white"), className="bg-secondary"),
+                        dbc.CardBody(
+                            [
+                                dbc.Row([
+                                    dbc.Col([
+                                        html.Label("Metric:", className="fw-bold"),
+                                        dcc.Dropdown(id='history-metric-dropdown', placeholder="Select a summary metric",
+                                            style={'color': '#000000', 'backgroundColor': '#ffffff'})
+                                    ], width=5),
+                                    dbc.Col([
+                                        html.Label("Samples:", className="fw-bold"),
+                                        dcc.Dropdown(id='history-sample-dropdown', multi=True, placeholder="All samples (mean and range)",
+                                            style={'color': '#000000', 'backgroundColor': '#ffffff'})
+                                    ], width=5),
+                                    dbc.Col([
+                                        html.Label("Last Runs:", className="fw-bold"),
+                                        dbc.Input(id='history-last-runs', type='number', min=1, step=1, value=DEFAULT_LAST_RUNS, debounce=True)
+                                    ], width=2),
+                                ], className="mb-3"),
+                                dcc.Loading(dcc.Graph(id='history-trend-plot', style={'height': '500px'}), type="default"),
+                            ]
+                        ),
+                    ],
+                    className="shadow-sm mb-4"
+                ),
+                width=12
+            ),
         ]
     )
 
@@ -221,36 +323,19 @@ def get_taxonomy_analysis_section():
     return dbc.Container(
         [
             html.H3("Taxonomy Analysis", className="text-primary"),
-            html.P("Upload a Kraken2 TSV file to analyze taxonomic classifications."),
+            html.P("Upload one or more Kraken2 TSV files to analyze taxonomic classifications."),
 
             # File Upload Section for Kraken TSV
             dbc.Card(
                 [
-                    dbc.CardHeader(html.H5("Upload Kraken TSV File", className="text-white"), className="bg-primary"),
+                    dbc.CardHeader(html.H5("Upload Kraken TSV Files", className="text-white"), className="bg-primary"),
                     dbc.CardBody(
                         [
-                            dcc.Upload(
-                                id='upload-kraken-data',
-                                children=html.Div([
-                                    html.I(className="bi bi-upload me-2"),
-                                    'Drag and Drop or ',
-                                    html.A('Select a Kraken TSV File', className="text-primary fw-bold")
-                                ]),
-                                style={
-                                    'width': '100%',
-                                    'height': '70px',
-                                    'lineHeight': '70px',
-                                    'borderWidth': '2px',
-                                    'borderStyle': 'dashed',
-                                    'borderRadius': '10px',
-                                    'textAlign': 'center',
-                                    'margin': '10px',
-                                    'backgroundColor': '#f8f9fa',
-                                    'color': '#000000'
-                                },
-                                multiple=False
-                            ),
-                            html.Div(id='kraken-upload-status', className='mt-2 text-success')
+                            get_chunked_upload('upload-kraken-data', 'Select Kraken TSV Files', 'kraken-upload-status', multiple=True),
+                            html.Div(id='kraken-upload-status', className='mt-2 text-success'),
+                            dcc.Store(id='kraken-upload-job'),
+                            dcc.Interval(id='kraken-upload-job-poll', interval=500, disabled=True),
+                            get_watch_selector('watch-kraken-dropdown', "Or pick watched Kraken reports:", multi=True),
                         ]
                     ),
                 ],
@@ -280,12 +365,80 @@ def get_taxonomy_analysis_section():
                 [
                     dbc.CardHeader(html.H5("Kraken Bar Plot", className="text-white"), className="bg-secondary"),
                     dbc.CardBody(
-                        dcc.Graph(id="kraken-bar-plot", figure={}, style={"height": "600px"})
+                        [
+                            html.Label("Top Taxa:", className="fw-bold"),
+                            dcc.Input(id='kraken-bar-top-n', type='number', min=1, max=100, step=1, value=10,
+                                style={'color': '#000000', 'backgroundColor': '#ffffff', 'width': '100px'}, className="mb-3 ms-2"),
+                            dcc.Graph(id="kraken-bar-plot", figure={}, style={"height": "600px"}),
+                        ]
                     ),
                 ],
                 className="shadow-sm mb-4"
             ),
 
+            # Taxonomy explorer, expanded on demand
+            dbc.Card(
+                [
+                    dbc.CardHeader(html.H5("Taxonomy Explorer", className="text-white"), className="bg-secondary"),
+                    dbc.CardBody(
+                        [
+                            html.P("Click a segment to expand it, or the centre to go up one level.", className="text-muted"),
+                            html.Div(
+                                [
+                                    dbc.Button("Top", id='taxonomy-explorer-top', color='secondary', size='sm', className="me-2"),
+                                    html.Span(id='taxonomy-explorer-path', className="fw-bold"),
+                                ],
+                                className="mb-2"
+                            ),
+                            dcc.Graph(id='taxonomy-explorer', style={'height': '700px'}),
+                            dcc.Store(id='taxonomy-explorer-node'),
+                        ]
+                    ),
+                ],
+                className="shadow-sm mb-4"
+            ),
+
+
+            # Multi-sample comparison
+            dbc.Card(
+                [
+                    dbc.CardHeader(html.H5("Sample Comparison", className="text-white"), className="bg-secondary"),
+                    dbc.CardBody(
+                        [
+                            dbc.Row(
+                                [
+                                    dbc.Col([
+                                        html.Label("Rank:", className="fw-bold"),
+                                        dbc.RadioItems(
+                                            id='kraken-comparison-rank',
+                                            options=[{'label': 'Genus', 'value': 'G'}, {'label': 'Species', 'value': 'S'}],
+                                            value='S',
+                                            inline=True
+                                        ),
+                                    ], width=4),
+                                    dbc.Col([
+                                        html.Label("Plot Type:", className="fw-bold"),
+                                        dbc.RadioItems(
+                                            id='kraken-comparison-type',
+                                            options=[{'label': 'Stacked Bar', 'value': 'bar'}, {'label': 'Heatmap', 'value': 'heatmap'}],
+                                            value='bar',
+                                            inline=True
+                                        ),
+                                    ], width=4),
+                                    dbc.Col([
+                                        html.Label("Top Taxa:", className="fw-bold"),
+                                        dcc.Input(id='kraken-comparison-top-n', type='number', min=1, max=100, step=1, value=15,
+                                            style={'color': '#000000', 'backgroundColor': '#ffffff', 'width': '100px'}),
+                                    ], width=4),
+                                ],
+                                className="mb-3"
+                            ),
+                            dcc.Graph(id='kraken-comparison-plot', style={'height': '600px'}),
+                        ]
+                    ),
+                ],
+                className="shadow-sm mb-4"
+            ),
 
             # Sankey Plot Section
             dbc.Card(
@@ -331,6 +484,8 @@ def get_content():
 
 def create_layout():
     return dbc.Container([
+        # Keyed per browser tab; sessionStorage keeps the id across reloads
+        dcc.Store(id='session-id', storage_type='session', data=str(uuid.uuid4())),
         dbc.Row(
             dbc.Col(
                 html.Div(
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+import random
+import sys
+
+
+# All dashboard loggers live under this name, e.g. 'dashboard.callbacks'
+ROOT_LOGGER = 'dashboard'
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, for log collectors."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of the DEBUG and INFO records of some loggers.
+
+    Meant for loggers of high-frequency callbacks (polling, per-request
+    metrics). Warnings and errors always pass.
+
+    Args:
+        rates (dict): {logger name: fraction of records kept}; a name also
+            covers its child loggers.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        name = record.name
+        while name:
+            if name in self.rates:
+                return random.random() < self.rates[name]
+            name = name.rpartition('.')[0]
+        return True
+
+
+def parse_sample_rates(spec):
+    """Parse 'dashboard.metrics=0.1,dashboard.callbacks=0.5' into {name: rate}."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, rate = item.partition('=')
+        try:
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            raise ValueError(f"Invalid log sampling rate: {item!r}") from None
+    return rates
+
+
+def configure_logging(level=None, fmt=None, sample=None):
+    """
+    Set up the 'dashboard' loggers. Safe to call more than once.
+
+    Defaults come from the environment: DASHBOARD_LOG_LEVEL (INFO),
+    DASHBOARD_LOG_FORMAT ('text' or 'json') and DASHBOARD_LOG_SAMPLE
+    (see parse_sample_rates). Records below the level are dropped before
+    their message is formatted, so debug logging costs nothing when off.
+    """
+    level = (level or os.environ.get('DASHBOARD_LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or os.environ.get('DASHBOARD_LOG_FORMAT', 'text')
+    rates = parse_sample_rates(sample if sample is not None else os.environ.get('DASHBOARD_LOG_SAMPLE'))
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
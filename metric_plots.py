@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from dash import Patch
+from plotly.colors import qualitative
+
+
+# Up to this many rows a metric is drawn as one SVG bar per row
+BAR_ROW_LIMIT = 500
+# Above this many rows a per-row WebGL scatter is downsampled on the server
+MAX_SCATTER_POINTS = 10_000
+# An x column with at most this many distinct values is treated as a grouping
+MAX_GROUPS = 50
+# Values per group sent to the browser for violin plots
+MAX_VIOLIN_POINTS = 2_000
+HISTOGRAM_BINS = 60
+
+RENDER_MODES = [
+    {'label': 'Auto', 'value': 'auto'},
+    {'label': 'Bar', 'value': 'bar'},
+    {'label': 'Scatter (WebGL)', 'value': 'scatter'},
+    {'label': 'Box', 'value': 'box'},
+    {'label': 'Violin', 'value': 'violin'},
+    {'label': 'Histogram', 'value': 'histogram'},
+]
+
+
+def category_colors(values, palette=qualitative.Alphabet):
+    """
+    Color per value, cycling through the palette.
+
+    Args:
+        values (pd.Series): Category of each bar.
+        palette (list): Colors to cycle through.
+    Returns:
+        np.ndarray of colors, one per value.
+    """
+    codes, _ = pd.factorize(values)
+    return np.asarray(palette, dtype=object)[codes % len(palette)]
+
+
+def minmax_downsample(y, max_points):
+    """
+    Indices of a downsampled series that keep its shape.
+
+    The rows are split into max_points // 2 consecutive buckets and the
+    minimum and maximum of each bucket are kept, so peaks and dips survive.
+
+    Args:
+        y (np.ndarray): Values in plotting order, without NaN.
+        max_points (int): Upper bound on the number of indices returned.
+    Returns:
+        np.ndarray of sorted row indices.
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = np.arange(n) * (max_points // 2) // n
+    order = np.lexsort((y, buckets))
+    starts = np.searchsorted(buckets[order], np.arange(max_points // 2))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def resolve_render_mode(mode, n_rows, n_groups):
+    """Pick the view for 'auto': bars for small tables, otherwise box per group or a WebGL scatter."""
+    if mode and mode != 'auto':
+        return mode
+    if n_rows <= BAR_ROW_LIMIT:
+        return 'bar'
+    return 'box' if n_groups <= MAX_GROUPS else 'scatter'
+
+
+def _box_stats(y, groups):
+    """Quartiles and Tukey fences per group, so only five numbers per box are sent."""
+    grouped = pd.Series(y).groupby(np.asarray(groups), sort=False)
+    stats = grouped.quantile([0, 0.25, 0.5, 0.75, 1]).unstack()
+    q1, q3 = stats[0.25], stats[0.75]
+    iqr = q3 - q1
+    clipped = pd.DataFrame({'y': y, 'group': np.asarray(groups)})
+    clipped = clipped.join(pd.DataFrame({'low': q1 - 1.5 * iqr, 'high': q3 + 1.5 * iqr}), on='group')
+    inside = clipped[(clipped['y'] >= clipped['low']) & (clipped['y'] <= clipped['high'])].groupby('group', sort=False)['y']
+    return stats.assign(lowerfence=inside.min(), upperfence=inside.max())
+
+
+def build_metric_figure(x, y, error=None, mode='auto', title=None, x_title=None, y_title=None,
+                        palette=qualitative.Alphabet):
+    """
+    Plot a per-sample metric, switching to WebGL or aggregated views for large tables.
+
+    Small tables are drawn as before, one colored bar per row. Large ones
+    become a box (or violin) per x value when x is a grouping column, a
+    histogram of y, or a WebGL scatter that is downsampled on the server
+    above MAX_SCATTER_POINTS rows.
+
+    Args:
+        x (pd.Series): Category (e.g. sample name) of each row.
+        y (pd.Series): Numeric metric of each row.
+        error (pd.Series): Optional standard deviation of each row.
+        mode (str): One of the RENDER_MODES values.
+        title (str): Figure title.
+        x_title (str): X-axis title.
+        y_title (str): Y-axis title.
+        palette (list): Bar colors, cycled per x value.
+    Returns:
+        Plotly figure object.
+    """
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.to_numeric(pd.Series(y), errors='coerce').reset_index(drop=True)
+    keep = y.notna().to_numpy() & x.notna().to_numpy()
+    x, y = x[keep].reset_index(drop=True), y[keep].to_numpy()
+    error = pd.Series(error).reset_index(drop=True)[keep].to_numpy() if error is not None else None
+
+    n_groups = x.nunique()
+    mode = resolve_render_mode(mode, len(y), n_groups)
+    fig = go.Figure()
+
+    if mode == 'bar':
+        fig.add_trace(go.Bar(
+            x=x,
+            y=y,
+            error_y=dict(type='data', array=error, visible=error is not None),
+            marker=dict(color=category_colors(x, palette)),
+        ))
+
+    elif mode == 'scatter':
+        idx = minmax_downsample(y, MAX_SCATTER_POINTS)
+        fig.add_trace(go.Scattergl(
+            x=x.to_numpy()[idx],
+            y=y[idx],
+            mode='markers',
+            marker=dict(color=y[idx], colorscale='Viridis', size=5),
+            error_y=dict(type='data', array=error[idx], visible=True) if error is not None else None,
+            hovertemplate='%{x}<br>%{y}<extra></extra>',
+        ))
+        if len(idx) < len(y):
+            title = f"{title} ({len(idx):,} of {len(y):,} rows, min/max per bucket)"
+        fig.update_xaxes(showticklabels=len(idx) <= BAR_ROW_LIMIT)
+
+    elif mode == 'box':
+        stats = _box_stats(y, x)
+        labels = stats.index.astype(str).tolist()
+        fig.add_trace(go.Box(
+            x=labels,
+            q1=stats[0.25].to_numpy(),
+            median=stats[0.5].to_numpy(),
+            q3=stats[0.75].to_numpy(),
+            lowerfence=stats['lowerfence'].to_numpy(),
+            upperfence=stats['upperfence'].to_numpy(),
+            marker=dict(color='#636EFA'),
+        ))
+
+    elif mode == 'violin':
+        rng = np.random.default_rng(0)
+        for i, (group, values) in enumerate(pd.Series(y).groupby(x.to_numpy(), sort=False)):
+            values = values.to_numpy()
+            if len(values) > MAX_VIOLIN_POINTS:
+                values = rng.choice(values, MAX_VIOLIN_POINTS, replace=False)
+            fig.add_trace(go.Violin(
+                x=np.full(len(values), str(group)),
+                y=values,
+                name=str(group),
+                line_color=qualitative.Plotly[i % len(qualitative.Plotly)],
+                points=False,
+                box_visible=True,
+            ))
+        fig.update_layout(showlegend=False)
+
+    else:
+        # Binned on the server: only the bin counts are sent
+        counts, edges = np.histogram(y, bins=HISTOGRAM_BINS)
+        fig.add_trace(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            marker=dict(color='#636EFA'),
+            customdata=np.column_stack([edges[:-1], edges[1:]]),
+            hovertemplate='%{customdata[0]:.4g} – %{customdata[1]:.4g}<br>Rows: %{y}<extra></extra>',
+        ))
+        x_title, y_title = y_title, 'Rows'
+
+    fig.update_layout(
+        title=title,
+        xaxis_title=x_title,
+        yaxis_title=y_title,
+        xaxis=dict(tickangle=-45),
+        plot_bgcolor='#2c2f34',
+        paper_bgcolor='#1e1e1e',
+        font_color="white"
+    )
+    return fig
+
+
+def figure_view(fig):
+    """
+    Trace types of a figure. Stored with the render mode next to the graph,
+    so the next callback can tell whether a partial update is enough.
+
+    Args:
+        fig (dict): Figure as a plain dict.
+    """
+    return [trace.get('type') for trace in fig['data']]
+
+
+def figure_patch(fig):
+    """
+    Partial update that swaps the traces and titles of a rendered metric figure.
+
+    The template and styling of the layout are left on the client. Only
+    valid when the rendered figure has the same view (see figure_view).
+
+    Args:
+        fig (dict): The new figure as a plain dict.
+    """
+    layout = fig['layout']
+    patch = Patch()
+    patch['data'] = fig['data']
+    patch['layout']['title']['text'] = layout.get('title', {}).get('text')
+    for axis in ('xaxis', 'yaxis'):
+        patch['layout'][axis]['title']['text'] = layout.get(axis, {}).get('title', {}).get('text')
+        if 'showticklabels' in layout.get(axis, {}):
+            patch['layout'][axis]['showticklabels'] = layout[axis]['showticklabels']
+    return patch
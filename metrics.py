@@ -0,0 +1,177 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+
+CALLBACK_PATH = '/_dash-update-component'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+logger = logging.getLogger('dashboard.metrics')
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram per label set."""
+
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['counts'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            for bound, count in zip(self.buckets, series['counts']):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series["count"]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series["sum"]}')
+            lines.append(f'{self.name}_count{{{label_text}}} {series["count"]}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class CallbackMetrics:
+    """
+    Latency and payload statistics of the Dash callbacks of this process.
+
+    Each worker process keeps its own numbers; Prometheus scrapes every
+    worker (or the sum is taken at query time).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.duration = Histogram(
+            'dash_callback_duration_seconds', 'Wall time of a callback request.',
+            DURATION_BUCKETS, ('callback',))
+        self.phase = Histogram(
+            'dash_callback_phase_seconds', 'Time spent in a phase (parse, figure) of a callback.',
+            DURATION_BUCKETS, ('callback', 'phase'))
+        self.response_bytes = Histogram(
+            'dash_callback_response_bytes', 'Size of the serialized callback response.',
+            BYTES_BUCKETS, ('callback',))
+        self.errors = {}
+
+    def observe(self, callback, duration, response_bytes, phases, status):
+        with self._lock:
+            self.duration.observe((callback,), duration)
+            self.response_bytes.observe((callback,), response_bytes)
+            for phase, seconds in phases.items():
+                self.phase.observe((callback, phase), seconds)
+            if status >= 400:
+                self.errors[callback] = self.errors.get(callback, 0) + 1
+
+    def render(self, extra_lines=()):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = self.duration.render() + self.phase.render() + self.response_bytes.render()
+            lines += ['# HELP dash_callback_errors_total Callback requests that failed.',
+                      '# TYPE dash_callback_errors_total counter']
+            lines += [f'dash_callback_errors_total{{callback="{_escape(name)}"}} {count}'
+                      for name, count in sorted(self.errors.items())]
+        return '\n'.join(lines + list(extra_lines)) + '\n'
+
+
+callback_metrics = CallbackMetrics()
+
+
+@contextmanager
+def timed(phase):
+    """
+    Time a phase of the current callback, e.g. with timed('parse'): ...
+
+    Outside a request (tests, the ingest workers) this does nothing.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and 'callback_phases' in g:
+            g.callback_phases[phase] = g.callback_phases.get(phase, 0.0) + time.perf_counter() - start
+
+
+def _figure_cache_lines():
+    from figure_cache import figure_cache
+
+    stats = figure_cache.stats()
+    return [
+        '# HELP dash_figure_cache_requests_total Figure cache lookups by result.',
+        '# TYPE dash_figure_cache_requests_total counter',
+        f'dash_figure_cache_requests_total{{result="hit"}} {stats["hits"]}',
+        f'dash_figure_cache_requests_total{{result="miss"}} {stats["misses"]}',
+        '# HELP dash_figure_cache_bytes Size of the cached figure JSON.',
+        '# TYPE dash_figure_cache_bytes gauge',
+        f'dash_figure_cache_bytes {stats["nbytes"]}',
+    ]
+
+
+def instrument_callbacks(app, metrics=callback_metrics):
+    """
+    Record the latency and response size of every Dash callback.
+
+    Hooks the Flask requests to the callback endpoint, labels them with the
+    callback's function name, writes one structured log line per request
+    (logger 'dashboard.metrics', JSON at INFO) and serves all metrics at
+    GET /metrics in the Prometheus text format. Parse and figure-build
+    times come from timed() blocks inside the callbacks.
+    """
+    server = app.server
+    names = {}
+
+    def callback_name(output):
+        if output not in names:
+            for key, spec in app.callback_map.items():
+                fn = getattr(spec['callback'], '__wrapped__', spec['callback'])
+                names[key] = fn.__name__
+        return names.get(output, output)
+
+    @server.before_request
+    def start_callback_timer():
+        if request.path.endswith(CALLBACK_PATH):
+            g.callback_start = time.perf_counter()
+            g.callback_phases = {}
+
+    @server.after_request
+    def record_callback(response):
+        if 'callback_start' not in g:
+            return response
+        duration = time.perf_counter() - g.callback_start
+        body = request.get_json(silent=True) or {}
+        callback = callback_name(body.get('output', 'unknown'))
+        size = response.calculate_content_length() or 0
+        metrics.observe(callback, duration, size, g.callback_phases, response.status_code)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('%s', json.dumps({
+                'event': 'callback',
+                'callback': callback,
+                'trigger': (body.get('changedPropIds') or [None])[0],
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                **{f'{phase}_ms': round(seconds * 1000, 2) for phase, seconds in g.callback_phases.items()},
+                'response_bytes': size,
+            }))
+        return response
+
+    @server.route('/metrics')
+    def prometheus_metrics():
+        return Response(metrics.render(_figure_cache_lines()), mimetype='text/plain; version=0.0.4')
@@ -1,5 +1,9 @@
+import logging
+
 import plotly.graph_objects as go
 
+logger = logging.getLogger('dashboard.plots')
+
 # Function to create the bar plot
 def generate_bar_plot(x, y, error_y=None):
     fig = go.Figure()
@@ -51,10 +55,10 @@ def generate_sankey_plot(nodes, links):
         return fig
 
     except KeyError as e:
-        print(f"KeyError in generate_sankey_plot: {e}")
+        logger.error("Missing key in generate_sankey_plot: %s", e)
         return go.Figure().update_layout(title=f"Error: Missing key {e}")
     except Exception as e:
-        print(f"Error in generate_sankey_plot: {e}")
+        logger.exception("Error in generate_sankey_plot")
         return go.Figure().update_layout(title=f"Error: {e}")
 
 
@@ -0,0 +1,203 @@
+"""
+Optional DuckDB query layer over the ingested Parquet files.
+
+With the duckdb package installed, table pages and the cross-sample Kraken
+comparison are computed by an in-process DuckDB database straight from the
+Parquet files: only the needed columns are read, filters, sorting and
+aggregation run in DuckDB's multi-threaded engine under a memory limit,
+and only the result (one page, or a samples x taxa matrix) becomes a
+DataFrame. Without duckdb, or with DASHBOARD_QUERY_ENGINE=pandas, the
+callbacks keep using the in-memory frames.
+"""
+import math
+import os
+import threading
+
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+from ingest import KRAKEN_REPORT_NAME
+from kraken_compare import OTHER_LABEL
+from tables import DEFAULT_PAGE_SIZE, split_filter_part
+
+
+SQL_OPERATORS = {'eq': '=', 'ne': '<>', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+DEFAULT_MEMORY_LIMIT = '1GB'
+
+_database = None
+_lock = threading.Lock()
+
+
+def engine_enabled():
+    """Whether queries go through DuckDB (installed, and DASHBOARD_QUERY_ENGINE is not 'pandas')."""
+    return duckdb is not None and os.environ.get('DASHBOARD_QUERY_ENGINE', 'duckdb') == 'duckdb'
+
+
+def _cursor():
+    """
+    A new cursor on the process-wide in-memory database.
+
+    DuckDB connections are not thread-safe, so each query gets its own
+    cursor; they share the database's buffer pool, thread pool and
+    Parquet metadata cache. DASHBOARD_DUCKDB_MEMORY_LIMIT (default 1GB)
+    and DASHBOARD_DUCKDB_THREADS (default: number of cores) apply to all
+    queries of the process together.
+    """
+    global _database
+    with _lock:
+        if _database is None:
+            config = {'memory_limit': os.environ.get('DASHBOARD_DUCKDB_MEMORY_LIMIT', DEFAULT_MEMORY_LIMIT)}
+            if os.environ.get('DASHBOARD_DUCKDB_THREADS'):
+                config['threads'] = int(os.environ['DASHBOARD_DUCKDB_THREADS'])
+            _database = duckdb.connect(':memory:', config=config)
+            _database.execute('SET enable_object_cache = true')
+        return _database.cursor()
+
+
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def where_clause(filter_query, columns, required=()):
+    """
+    Translate a DataTable filter_query into a SQL WHERE clause.
+
+    Mirrors tables.apply_filter: numeric values compare numerically,
+    anything else as text, 'contains' ignores case. Clauses on columns not
+    in `columns` are ignored.
+
+    Args:
+        filter_query (str): DataTable filter_query property.
+        columns (list): Columns that may be filtered on.
+        required (list): Columns whose missing values are dropped.
+    Returns:
+        tuple: (SQL text starting with WHERE, or '', list of parameters)
+    """
+    conditions = [f'{quote_identifier(col)} IS NOT NULL' for col in required]
+    params = []
+    for filter_part in filter_query.split(' && ') if filter_query else []:
+        col_name, operator, value = split_filter_part(filter_part)
+        if col_name not in columns:
+            continue
+        column = quote_identifier(col_name)
+        if operator in SQL_OPERATORS:
+            if isinstance(value, float):
+                conditions.append(f'TRY_CAST({column} AS DOUBLE) {SQL_OPERATORS[operator]} ?')
+                params.append(value)
+            else:
+                conditions.append(f'CAST({column} AS VARCHAR) {SQL_OPERATORS[operator]} ?')
+                params.append(str(value))
+        elif operator == 'contains':
+            conditions.append(f'contains(lower(CAST({column} AS VARCHAR)), lower(?))')
+            params.append(str(value))
+        elif operator == 'datestartswith':
+            conditions.append(f'starts_with(CAST({column} AS VARCHAR), ?)')
+            params.append(str(value))
+    return ('WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+
+def order_clause(sort_by, columns):
+    """ORDER BY for a DataTable sort_by list; ties keep file order, like the stable pandas sort."""
+    terms = [f"{quote_identifier(col['column_id'])} {'ASC' if col['direction'] == 'asc' else 'DESC'} NULLS LAST"
+             for col in sort_by or [] if col['column_id'] in columns]
+    return 'ORDER BY ' + ', '.join(terms + ['file_row_number'])
+
+
+def parquet_page(path, columns, page_current=0, page_size=DEFAULT_PAGE_SIZE, sort_by=None, filter_query='', required=None):
+    """
+    Filter, sort and slice a Parquet file for a server-side DataTable.
+
+    The same contract as tables.table_page, but only the page is read into
+    memory.
+
+    Args:
+        path (str): Parquet file, e.g. a sheet of an ingested workbook.
+        columns (list): Columns to send.
+        page_current (int): Zero-based page index.
+        page_size (int): Rows per page.
+        sort_by (list): DataTable sort_by property.
+        filter_query (str): DataTable filter_query property.
+        required (list): Rows missing any of these columns are left out,
+            like SheetCache.selection; defaults to `columns`.
+    Returns:
+        tuple: (records for the visible page, page_count)
+    """
+    page_current = page_current or 0
+    page_size = page_size or DEFAULT_PAGE_SIZE
+    required = list(columns) if required is None else list(required)
+    where, params = where_clause(filter_query, list(columns) + required, required)
+    source = 'read_parquet(?, file_row_number = true)'
+
+    with _cursor() as cursor:
+        count = cursor.execute(f'SELECT count(*) FROM {source} {where}', [path] + params).fetchone()[0]
+        page_count = max(1, math.ceil(count / page_size))
+        start = min(page_current, page_count - 1) * page_size
+        page = cursor.execute(
+            f"SELECT {', '.join(quote_identifier(col) for col in columns)} FROM {source} {where} "
+            f"{order_clause(sort_by, columns)} LIMIT ? OFFSET ?",
+            [path] + params + [page_size, start],
+        ).df()
+    return page.to_dict('records'), page_count
+
+
+_ABUNDANCE_SQL = """
+WITH report AS (
+    SELECT filename, rank, NCBI_tax_ID AS tax_id, trim(name) AS name, reads_clade AS reads, depth
+    FROM read_parquet(?, filename = true)
+),
+totals AS (
+    SELECT filename, sum(reads) FILTER (WHERE depth = 0) AS total FROM report GROUP BY filename
+),
+subset AS (
+    SELECT s.sample, r.tax_id, r.name,
+           CASE WHEN ? = 'reads' THEN r.reads ELSE coalesce(r.reads / nullif(t.total, 0), 0) END AS value
+    FROM report r JOIN totals t USING (filename) JOIN samples s ON s.path = r.filename
+    WHERE r.rank = ? AND r.reads > 0
+),
+top_taxa AS (
+    SELECT tax_id FROM subset GROUP BY tax_id ORDER BY sum(value) DESC, tax_id LIMIT ?
+)
+SELECT sample, name, sum(value) AS value, tax_id IN (SELECT tax_id FROM top_taxa) AS is_top
+FROM subset GROUP BY sample, name, tax_id
+"""
+
+
+def abundance_matrix(dataset_dirs, rank="S", top_n=15, value="fraction"):
+    """
+    kraken_compare.abundance_matrix computed by DuckDB from the report files.
+
+    All reports are scanned in one parallel query that keeps only the rows
+    of `rank` and aggregates them per sample and taxon, so the per-sample
+    reports and the combined abundance table are never loaded. Samples
+    with identical reports share a dataset directory, which is read once.
+
+    Args:
+        dataset_dirs (dict): {sample label: Kraken dataset directory}.
+        rank (str): Rank to compare.
+        top_n (int): Number of taxa to show.
+        value (str): 'fraction' or 'reads'.
+    Returns:
+        pd.DataFrame indexed by sample, one column per top taxon, largest
+        first, and an "Other" column for the remainder.
+    """
+    samples = pd.DataFrame({
+        'sample': list(dataset_dirs),
+        'path': [os.path.join(dataset_dir, KRAKEN_REPORT_NAME) for dataset_dir in dataset_dirs.values()],
+    })
+    with _cursor() as cursor:
+        cursor.register('samples', samples)
+        rows = cursor.execute(_ABUNDANCE_SQL, [samples['path'].unique().tolist(), value, rank, int(top_n)]).df()
+    rows['sample'] = pd.Categorical(rows['sample'], categories=list(dataset_dirs))
+
+    top = rows[rows['is_top']]
+    matrix = top.pivot_table(index='sample', columns='name', values='value', aggfunc='sum', observed=False, fill_value=0)
+    matrix = matrix.reindex(columns=top.groupby('name')['value'].sum().sort_values(ascending=False).index)
+
+    other = rows.groupby('sample', observed=False)['value'].sum() - matrix.sum(axis=1)
+    if (other > 0).any():
+        matrix[OTHER_LABEL] = other.clip(lower=0)
+    return matrix
@@ -0,0 +1,234 @@
+import datetime
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from plotly.colors import qualitative
+
+
+# One Parquet file per ingested workbook, partitioned by run date:
+#   <history dir>/run_date=2024-05-01/<workbook sha256>.parquet
+# in long form, one row per sample and metric, sorted by metric and sample so
+# row-group statistics let filters on them skip most of each file
+HISTORY_SCHEMA = pa.schema([
+    ('run_id', pa.string()),
+    ('run_name', pa.string()),
+    ('sample', pa.string()),
+    ('metric', pa.string()),
+    ('value', pa.float64()),
+    ('stddev', pa.float32()),
+])
+PARTITIONING = ds.partitioning(pa.schema([('run_date', pa.date32())]), flavor='hive')
+DATASET_SCHEMA = pa.unify_schemas([HISTORY_SCHEMA, PARTITIONING.schema])
+SAMPLE_COLUMN = 'Sample_name'
+DEFAULT_LAST_RUNS = 90
+# Lines drawn at most when samples are picked; otherwise runs are summarized
+MAX_TREND_SAMPLES = 20
+
+
+def summary_sheet(manifest):
+    """The workbook sheet tracked across runs: the first one named like 'Summary' with a sample column, else the first with a sample column."""
+    sheets = [sheet for sheet in manifest['sheets']
+              if any(col.strip() == SAMPLE_COLUMN for col in sheet.get('schema', {}))]
+    named = [sheet for sheet in sheets if 'summary' in sheet['name'].lower()]
+    return (named or sheets or [None])[0]
+
+
+def run_metrics(dataset_dir, manifest):
+    """
+    Long-form metrics of a workbook's summary sheet.
+
+    Numeric columns become one row per sample with their value; composite
+    "mean +/- stddev" columns use the mean and stddev parsed at ingest.
+    Text columns are skipped.
+
+    Returns:
+        pd.DataFrame with sample, metric, value and stddev columns, or None
+        if the workbook has no summary sheet.
+    """
+    sheet = summary_sheet(manifest)
+    if sheet is None:
+        return None
+    df = pq.ParquetFile(os.path.join(dataset_dir, sheet['file'])).read().to_pandas()
+    sample_column = next(col for col in sheet['schema'] if col.strip() == SAMPLE_COLUMN)
+    samples = df[sample_column].astype(str)
+
+    parts = []
+    for column, info in sheet['schema'].items():
+        if column == sample_column:
+            continue
+        if info['kind'] == 'numeric':
+            value, stddev = pd.to_numeric(df[column], errors='coerce'), np.nan
+        elif info['kind'] == 'composite':
+            parsed = sheet['composites'][column]
+            value, stddev = df[parsed['mean']], df[parsed['stddev']]
+        else:
+            continue
+        parts.append(pd.DataFrame({'sample': samples, 'metric': column,
+                                   'value': value.astype('float64'), 'stddev': stddev}))
+    if not parts:
+        return None
+    metrics = pd.concat(parts, ignore_index=True).dropna(subset=['value'])
+    metrics['stddev'] = metrics['stddev'].astype('float32')
+    return metrics.sort_values(['metric', 'sample'], kind='stable', ignore_index=True)
+
+
+def append_run(history_dir, dataset_dir, manifest, run_date=None):
+    """
+    Add an ingested workbook to the run history, once per workbook hash.
+
+    Args:
+        history_dir (str): The run history directory (ingest.get_history_dir).
+        dataset_dir (str): Dataset directory written by ingest.ingest_workbook.
+        manifest (dict): Its manifest.
+        run_date (datetime.date): Partition date; defaults to today.
+    Returns:
+        str: Path of the written (or existing) file, or None without a summary sheet.
+    """
+    run_id = os.path.basename(dataset_dir)
+    for partition in os.listdir(history_dir) if os.path.isdir(history_dir) else []:
+        existing = os.path.join(history_dir, partition, f'{run_id}.parquet')
+        if os.path.exists(existing):
+            return existing
+
+    metrics = run_metrics(dataset_dir, manifest)
+    if metrics is None:
+        return None
+    metrics.insert(0, 'run_name', manifest.get('filename') or run_id)
+    metrics.insert(0, 'run_id', run_id)
+    table = pa.Table.from_pandas(metrics, schema=HISTORY_SCHEMA, preserve_index=False)
+
+    run_date = run_date or datetime.date.today()
+    partition_dir = os.path.join(history_dir, f'run_date={run_date.isoformat()}')
+    os.makedirs(partition_dir, exist_ok=True)
+    path = os.path.join(partition_dir, f'{run_id}.parquet')
+    fd, tmp_path = tempfile.mkstemp(dir=partition_dir, suffix='.tmp')
+    os.close(fd)
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def history_runs(history_dir, last_runs=None, since=None):
+    """
+    Runs in the history, oldest first, from the file layout alone.
+
+    Returns:
+        list of (run_date, run_id, path) tuples.
+    """
+    if not os.path.isdir(history_dir):
+        return []
+    runs = []
+    for partition in os.listdir(history_dir):
+        if not partition.startswith('run_date='):
+            continue
+        run_date = datetime.date.fromisoformat(partition.split('=', 1)[1])
+        if since is not None and run_date < since:
+            continue
+        partition_dir = os.path.join(history_dir, partition)
+        runs += [(run_date, name[:-len('.parquet')], os.path.join(partition_dir, name))
+                 for name in os.listdir(partition_dir) if name.endswith('.parquet')]
+    runs.sort()
+    return runs[-last_runs:] if last_runs else runs
+
+
+def _runs_dataset(runs, history_dir):
+    return ds.dataset([path for _, _, path in runs], schema=DATASET_SCHEMA, format='parquet',
+                      partitioning=PARTITIONING, partition_base_dir=history_dir)
+
+
+def history_metrics(history_dir, last_runs=DEFAULT_LAST_RUNS):
+    """Metric names found in the most recent runs."""
+    runs = history_runs(history_dir, last_runs)
+    if not runs:
+        return []
+    metrics = _runs_dataset(runs, history_dir).to_table(columns=['metric'])['metric']
+    return sorted(pc.unique(metrics).to_pylist())
+
+
+def query_trend(history_dir, metric, last_runs=DEFAULT_LAST_RUNS, samples=None, since=None, columns=None):
+    """
+    One metric across the most recent runs.
+
+    Runs are picked from the partition layout, so only their files are
+    opened, and the metric and sample filters are pushed down to the
+    Parquet reader; nothing outside the result is loaded.
+
+    Args:
+        history_dir (str): The run history directory.
+        metric (str): Metric (summary sheet column) name.
+        last_runs (int): Number of most recent runs; None for all.
+        samples (list): Only these samples, if given.
+        since (datetime.date): Only runs from this date on.
+        columns (list): Columns to return; all by default.
+    Returns:
+        pa.Table with run_date, run_id, run_name, sample, value and stddev.
+    """
+    runs = history_runs(history_dir, last_runs, since)
+    columns = columns or ['run_date', 'run_id', 'run_name', 'sample', 'value', 'stddev']
+    if not runs:
+        return pa.table({name: pa.array([], type=DATASET_SCHEMA.field(name).type) for name in columns})
+    condition = ds.field('metric') == metric
+    if samples:
+        condition &= ds.field('sample').isin(samples)
+    return _runs_dataset(runs, history_dir).to_table(columns=columns, filter=condition)
+
+
+def trend_summary(table):
+    """Per-run mean, min, max and sample count of a query_trend result, oldest first."""
+    summary = table.group_by(['run_date', 'run_id', 'run_name']).aggregate([
+        ('value', 'mean'), ('value', 'min'), ('value', 'max'), ('value', 'count'),
+    ])
+    return summary.sort_by([('run_date', 'ascending'), ('run_id', 'ascending')])
+
+
+def plot_trend(table, metric, samples=None):
+    """
+    Trend figure of a query_trend result.
+
+    With samples picked, one line per sample (with error bars for composite
+    metrics); otherwise the mean over samples per run with a min-max band.
+    """
+    fig = go.Figure()
+    if table.num_rows == 0:
+        return fig.update_layout(title=f"No history for {metric}")
+
+    if samples:
+        df = table.to_pandas().sort_values(['run_date', 'run_id'])
+        palette = qualitative.Plotly
+        for i, (sample, rows) in enumerate(df.groupby('sample', sort=True)):
+            has_error = rows['stddev'].notna().any()
+            fig.add_trace(go.Scatter(
+                x=rows['run_date'], y=rows['value'], mode='lines+markers', name=sample,
+                line=dict(color=palette[i % len(palette)]),
+                error_y=dict(type='data', array=rows['stddev'], visible=bool(has_error)),
+                customdata=rows['run_name'], hovertemplate='%{customdata}<br>%{x}<br>%{y}<extra>' + sample + '</extra>',
+            ))
+    else:
+        summary = trend_summary(table).to_pandas()
+        x = summary['run_date']
+        fig.add_trace(go.Scatter(x=x, y=summary['value_max'], mode='lines', line=dict(width=0),
+                                 showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=x, y=summary['value_min'], mode='lines', line=dict(width=0),
+                                 fill='tonexty', fillcolor='rgba(99,110,250,0.25)', name='Min-max'))
+        fig.add_trace(go.Scatter(
+            x=x, y=summary['value_mean'], mode='lines+markers', name='Mean', line=dict(color='#636efa'),
+            customdata=np.stack([summary['run_name'], summary['value_count']], axis=-1),
+            hovertemplate='%{customdata[0]}<br>%{x}<br>Mean: %{y}<br>Samples: %{customdata[1]}<extra></extra>',
+        ))
+
+    fig.update_layout(
+        title=f"{metric} over {len(pc.unique(table['run_id']))} runs",
+        xaxis_title="Run date",
+        yaxis_title=metric,
+        plot_bgcolor='#2c2f34',
+        paper_bgcolor='#1e1e1e',
+        font_color="white",
+    )
+    return fig
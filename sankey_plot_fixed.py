@@ -1,112 +1,170 @@
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-from dash import dash_table, html
+from dash import html
+from dash.dash_table import FormatTemplate
 import numpy as np
+from kraken_report import nearest_ancestor_in, parent_index, report_depth
+from tables import server_side_table
+
+SANKEY_TABLE_ID = "sankey-data-table"
+
+SANKEY_TABLE_COLUMNS = [
+    {"name": "Percentage", "id": "percentage", "type": "numeric", "format": FormatTemplate.percentage(2)},
+    {"name": "CladeReads", "id": "reads_clade", "type": "numeric"},
+    {"name": "TaxonReads", "id": "reads_taxon", "type": "numeric"},
+    {"name": "TaxRank", "id": "rank"},
+    {"name": "TaxID", "id": "NCBI_tax_ID", "type": "numeric"},
+    {"name": "Name", "id": "name_clean"}
+]
+
+
+def select_sankey_taxa(df, min_reads=1, rank_filter=None, taxonomic_ranks=['G', 'S'], top_n=10):
+    """
+    Pick the taxa shown in the Kraken Sankey and the links between them.
+
+    Args:
+        df (pd.DataFrame): Kraken report in report order.
+        min_reads (int): Minimum reads_clade for a taxon to be shown.
+        rank_filter (str): Only show this rank, if given.
+        taxonomic_ranks (list): Ranks shown in the diagram.
+        top_n (int): Number of taxa kept by reads_clade; None keeps all.
+    Returns:
+        tuple: (taxa DataFrame with name_clean and percentage columns,
+        dict of NumPy 'source', 'target' and 'value' arrays indexing its rows),
+        or (None, None) if required columns are missing.
+    """
+    df = df.rename(columns={"direct_reads": "reads_taxon"})
+
+    required_columns = {"rank", "reads_taxon", "name", "reads_clade"}
+    if not required_columns.issubset(df.columns):
+        return None, None
+
+    # Work in report order so the indentation encodes the taxonomy tree
+    df = df.reset_index(drop=True)
+    depth = report_depth(df)
+    parents = parent_index(depth)
+    reads_clade = df["reads_clade"].to_numpy()
+    total_reads = reads_clade[depth == 0].sum()
+
+    ranks = df["rank"].to_numpy()
+    eligible = np.isin(ranks, taxonomic_ranks) & (ranks != "R") & (reads_clade >= min_reads)
+    if rank_filter:
+        eligible &= ranks == rank_filter
+
+    # Keep the top taxa by reads_clade and pull in their ancestors at the shown
+    # ranks, so every link follows a real parent/child relationship
+    selected = np.zeros(len(df), dtype=bool)
+    candidates = np.flatnonzero(eligible)
+    if top_n is not None and len(candidates) > top_n:
+        order = np.argsort(-reads_clade[candidates].astype(np.int64), kind="stable")
+        candidates = candidates[order[:top_n]]
+    selected[candidates] = True
+
+    ancestor = nearest_ancestor_in(parents, eligible)
+    frontier = ancestor[selected]
+    frontier = frontier[frontier >= 0]
+    while len(frontier):
+        new = frontier[~selected[frontier]]
+        selected[new] = True
+        frontier = ancestor[new]
+        frontier = frontier[frontier >= 0]
+
+    taxa = df[selected].copy()
+    shown = np.flatnonzero(selected)
+
+    # Normalize column names
+    taxa.columns = taxa.columns.str.replace(r'[^\w\s]', '_', regex=True).str.replace(r'\s+', '_', regex=True)
+    taxa["name_clean"] = taxa["name"].str.strip()
+    taxa["percentage"] = taxa["reads_clade"] / total_reads if total_reads else 0.0
+
+    # Map report positions to node indices and link each node to its closest shown ancestor
+    node_of = np.full(len(selected), -1, dtype=np.int64)
+    node_of[shown] = np.arange(len(shown))
+    shown_ancestor = nearest_ancestor_in(parents, selected)[shown]
+    has_parent = shown_ancestor >= 0
+
+    links = {
+        "source": node_of[shown_ancestor[has_parent]],
+        "target": np.flatnonzero(has_parent),
+        "value": reads_clade[shown][has_parent],
+    }
+    return taxa.reset_index(drop=True), links
+
+
+def build_sankey_table(taxa):
+    # Only the first page is sent; the rest is paged server-side from the report
+    return server_side_table(
+        SANKEY_TABLE_ID,
+        taxa,
+        SANKEY_TABLE_COLUMNS,
+        style_data={"color": "black", "backgroundColor": "white"},
+        style_header={"color": "black", "backgroundColor": "white", "fontWeight": "bold"},
+        style_table={"overflowX": "auto"},
+    )
+
+
+def sankey_figure(taxa, links, top_n=10, sample_name=None):
+    """Sankey diagram of the taxa and links picked by select_sankey_taxa or ReportAggregates.sankey_taxa."""
+    nodes = taxa["name_clean"].tolist()
+    sources, targets, values = links["source"], links["target"], links["value"]
+
+    color_palette = px.colors.qualitative.Plotly
+    node_colors = [color_palette[i % len(color_palette)] for i in range(len(nodes))]
+    link_colors = ['rgba(180,180,180,0.5)' for _ in sources]
+
+    fig = go.Figure(data=[go.Sankey(
+        arrangement='snap',
+        node=dict(
+            pad=25,
+            thickness=15,
+            line=dict(color='black', width=1),
+            label=nodes,
+            color=node_colors,
+            hoverinfo='all'
+        ),
+        link=dict(
+            source=sources,
+            target=targets,
+            value=values,
+            color=link_colors,
+            hovertemplate='%{source.label} → %{target.label}: %{value} reads'
+        )
+    )])
+
+    fig.update_layout(
+        title_text=f'{f"Top {top_n} " if top_n is not None else ""}Kraken2 Species-Level Sankey Diagram{f" - {sample_name}" if sample_name else ""}',
+        font_size=12,
+        height=min(1100, max(500, len(nodes) * 40)),
+        width=min(1500, max(700, len(nodes) * 50)),
+        margin=dict(l=90, r=90, t=90, b=90),
+        hovermode='x unified'
+    )
+    return fig
 
-def build_sankey_from_kraken(df, min_reads=1, rank_filter=None, taxonomic_ranks=['G', 'S'], sample_name=None):
-    try:
-        column_mapping = {
-            "direct_reads": "reads_taxon"
-        }
-        df = df.rename(columns=column_mapping)
 
-        required_columns = {"rank", "reads_taxon", "name", "reads_clade"}
-        if not required_columns.issubset(df.columns):
+def build_sankey_from_kraken(df, min_reads=1, rank_filter=None, taxonomic_ranks=['G', 'S'], sample_name=None, top_n=10):
+    try:
+        taxa, links = select_sankey_taxa(df, min_reads, rank_filter, taxonomic_ranks, top_n)
+        if taxa is None:
             return (
                 go.Figure().update_layout(title="Error: Missing Required Columns"),
                 html.Div("Error: Missing Required Columns")
             )
+        return sankey_figure(taxa, links, top_n, sample_name), build_sankey_table(taxa)
 
-        total_reads = df["reads_clade"].sum()
-        df = df[df["reads_clade"] >= min_reads].copy()
-        if rank_filter:
-            df = df[df["rank"] == rank_filter]
-
-        # Remove "R" from ranks explicitly
-        df = df[df["rank"].isin(taxonomic_ranks) & (df["rank"] != "R")]
-
-        # Filter for top 10 taxa by reads_clade
-        top_taxa = df.nlargest(10, "reads_clade")
-        df = df[df["name"].isin(top_taxa["name"])]
-
-        # Normalize column names
-        df.columns = df.columns.str.replace(r'[^\w\s]', '_', regex=True).str.replace(r'\s+', '_', regex=True)
-
-        df["name_clean"] = df["name"].str.strip()
-        df["rank_level"] = df["rank"].apply(lambda x: taxonomic_ranks.index(x) if x in taxonomic_ranks else len(taxonomic_ranks))
-        df = df.sort_values(by=["rank_level", "reads_clade"], ascending=[True, True])
-
-        node_indices = {}
-        nodes = []
-        sources, targets, values = [], [], []
-
-        for _, row in df.iterrows():
-            node_name = row["name_clean"]
-
-            if node_name not in node_indices:
-                node_indices[node_name] = len(nodes)
-                nodes.append(node_name)
-
-            parent_candidates = df[df["rank_level"] < row["rank_level"]]
-            if not parent_candidates.empty:
-                parent_name = parent_candidates.iloc[-1]["name_clean"]
-                if parent_name in node_indices:
-                    sources.append(node_indices[parent_name])
-                    targets.append(node_indices[node_name])
-                    values.append(row["reads_clade"])  # Use actual reads count
-
-        color_palette = px.colors.qualitative.Plotly
-        node_colors = [color_palette[i % len(color_palette)] for i in range(len(nodes))]
-        link_colors = ['rgba(180,180,180,0.5)' for _ in sources]
-
-        fig = go.Figure(data=[go.Sankey(
-            arrangement='snap',
-            node=dict(
-                pad=25,
-                thickness=15,
-                line=dict(color='black', width=1),
-                label=nodes,
-                color=node_colors,
-                hoverinfo='all'
-            ),
-            link=dict(
-                source=sources,
-                target=targets,
-                value=values,
-                color=link_colors,
-                hovertemplate='%{source.label} → %{target.label}: %{value} reads'
-            )
-        )])
-
-        fig.update_layout(
-            title_text=f'Top 10 Kraken2 Species-Level Sankey Diagram{f" - {sample_name}" if sample_name else ""}',
-            font_size=12,
-            height=min(1100, max(500, len(nodes) * 40)),
-            width=min(1500, max(700, len(nodes) * 50)),
-            margin=dict(l=90, r=90, t=90, b=90),
-            hovermode='x unified'
+    except Exception as e:
+        return (
+            go.Figure().update_layout(title=f"Error: {e}"),
+            html.Div(f"Error generating table: {e}")
         )
 
-        df["percentage"] = (df["reads_clade"] / total_reads * 100).map("{:.2f}%".format)
-
-        table = dash_table.DataTable(
-            columns=[
-                {"name": "Percentage", "id": "percentage"},
-                {"name": "CladeReads", "id": "reads_clade"},
-                {"name": "TaxonReads", "id": "reads_taxon"},
-                {"name": "TaxRank", "id": "rank"},
-                {"name": "TaxID", "id": "NCBI_tax_ID"},
-                {"name": "Name", "id": "name_clean"}
-            ],
-            data=df.to_dict("records"),
-            style_data={"color": "black", "backgroundColor": "white"},
-            style_header={"color": "black", "backgroundColor": "white", "fontWeight": "bold"},
-            style_table={"overflowX": "auto"},
-            page_size=10
-        )
 
-        return fig, table
+def build_sankey_from_aggregates(aggregates, sample_name=None, top_n=10):
+    """build_sankey_from_kraken with the default ranks, from the ingest-time ReportAggregates of a report."""
+    try:
+        taxa, links = aggregates.sankey_taxa(top_n)
+        return sankey_figure(taxa, links, top_n, sample_name), build_sankey_table(taxa)
 
     except Exception as e:
         return (
@@ -0,0 +1,189 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pyarrow.parquet as pq
+
+from ingest import read_manifest, touch_dataset
+
+
+# Upper bound on the DataFrames kept in memory per uploaded workbook
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def frame_nbytes(df):
+    """Return the in-memory size of a DataFrame, including object columns."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class SheetCache:
+    """
+    Reads the sheets of an ingested workbook from their Parquet files.
+
+    Only the requested columns are read, through a memory map, and the
+    resulting DataFrames are kept in an LRU bounded by their total size in
+    bytes. The returned DataFrames are shared between callbacks and must
+    not be modified in place. Pickling keeps only the dataset path, so the
+    cache is cheap to hold in any backend of the session dataset store.
+    Every read of the Parquet files counts as a use of the dataset in the
+    catalog (ingest.touch_dataset), so it is not evicted while open.
+
+    Args:
+        dataset_dir (str): Directory written by ingest.ingest_workbook.
+        max_bytes (int): Memory budget for the cached DataFrames.
+    """
+
+    def __init__(self, dataset_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.dataset_dir = dataset_dir
+        self.max_bytes = max_bytes
+        touch_dataset(dataset_dir)
+        manifest = read_manifest(dataset_dir)
+        self.filename = manifest.get('filename')
+        self._files = {sheet['name']: sheet['file'] for sheet in manifest['sheets']}
+        self._composites = {sheet['name']: sheet.get('composites', {}) for sheet in manifest['sheets']}
+        self._schemas = {sheet['name']: sheet.get('schema', {}) for sheet in manifest['sheets']}
+        self.sheet_names = [sheet['name'] for sheet in manifest['sheets']]
+        self._init_cache()
+
+    def _init_cache(self):
+        self._frames = OrderedDict()
+        self._sizes = {}
+        self._columns = {}
+        self.nbytes = 0
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        return {'dataset_dir': self.dataset_dir, 'max_bytes': self.max_bytes, 'filename': self.filename,
+                '_files': self._files, '_composites': self._composites,
+                '_schemas': self._schemas, 'sheet_names': self.sheet_names}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_cache()
+
+    @property
+    def dataset_id(self):
+        """Content hash of the workbook, the name of its dataset directory."""
+        return os.path.basename(self.dataset_dir)
+
+    def __contains__(self, sheet_name):
+        return sheet_name in self._files
+
+    def _path(self, sheet_name):
+        if sheet_name not in self._files:
+            raise KeyError(f"Sheet not found: {sheet_name}")
+        touch_dataset(self.dataset_dir)
+        return os.path.join(self.dataset_dir, self._files[sheet_name])
+
+    def parquet_path(self, sheet_name):
+        """Parquet file of a sheet, for queries that read it directly (see query_engine.py)."""
+        return self._path(sheet_name)
+
+    def columns(self, sheet_name):
+        """
+        Column names of a sheet, read from the Parquet schema without loading data.
+
+        The typed columns parsed from composite metrics at ingest are not
+        listed; they are found through composite_columns.
+        """
+        with self._lock:
+            if sheet_name not in self._columns:
+                derived = {name for parsed in self.composite_columns(sheet_name).values()
+                           for name in (parsed['mean'], parsed['stddev'])}
+                self._columns[sheet_name] = [
+                    name for name in pq.read_schema(self._path(sheet_name)).names if name not in derived
+                ]
+            return self._columns[sheet_name]
+
+    def composite_columns(self, sheet_name):
+        """
+        Composite metric columns of a sheet that were parsed at ingest.
+
+        Returns:
+            dict: {column: {'kind': 'mean_stddev', 'mean': name, 'stddev': name}}.
+        """
+        return self._composites.get(sheet_name, {})
+
+    def schema(self, sheet_name):
+        """
+        Column metadata inferred at ingest.
+
+        Returns:
+            dict: {column: {'dtype', 'kind', 'cardinality', 'null_rate'}}, see
+            sheet_schema.infer_schema.
+        """
+        return self._schemas.get(sheet_name, {})
+
+    def get(self, sheet_name, columns=None):
+        """
+        Return a sheet as a DataFrame.
+
+        Args:
+            sheet_name (str): Sheet to read.
+            columns (list): Only read these columns; all columns listed by
+                self.columns if None.
+        """
+        key = (sheet_name, tuple(columns) if columns is not None else None)
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key]
+            full_key = (sheet_name, None)
+            if columns is not None and full_key in self._frames and set(columns) <= set(self._frames[full_key].columns):
+                return self._frames[full_key][list(columns)]
+
+        df = self._read(sheet_name, columns)
+
+        with self._lock:
+            self._insert(key, df)
+        return df
+
+    def _read(self, sheet_name, columns):
+        # ParquetFile matches column names literally; read_table would parse
+        # names such as 'Coverage_(mean[x]_+/-_stdev[x])' as field paths
+        table = pq.ParquetFile(self._path(sheet_name), memory_map=True).read(
+            columns=list(dict.fromkeys(columns)) if columns is not None else self.columns(sheet_name),
+        )
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+
+    def selection(self, sheet_name, columns):
+        """
+        Rows of the given columns that have no missing values.
+
+        The filtered frame is kept in the same LRU, so every callback that
+        shows a selection (plot, table, table pages) filters it only once.
+        """
+        key = (sheet_name, tuple(columns), 'dropna')
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key]
+
+        # Only the filtered frame is cached, not the columns it was read from
+        df = self._read(sheet_name, columns).dropna()
+
+        with self._lock:
+            self._insert(key, df)
+        return df
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def _insert(self, key, df):
+        if key in self._frames:
+            return
+        size = frame_nbytes(df)
+        self._frames[key] = df
+        self._sizes[key] = size
+        self.nbytes += size
+
+        # Always keep the frame that was just read, even if it alone exceeds the budget
+        while self.nbytes > self.max_bytes and len(self._frames) > 1:
+            evicted, _ = self._frames.popitem(last=False)
+            self.nbytes -= self._sizes.pop(evicted)
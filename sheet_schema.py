@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+
+# "83.7x_+/-_10.3x", "83.7 +/- 10.3", "83.7x ± 10.3x": a mean and a standard
+# deviation with an optional unit suffix, as written by the assembly workflow
+NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+MEAN_STDDEV_PATTERN = (
+    rf'^\s*(?P<mean>{NUMBER})\s*[A-Za-z%]*[\s_]*(?:\+/-|±)[\s_]*(?P<stddev>{NUMBER})\s*[A-Za-z%]*\s*$'
+)
+
+MEAN_SUFFIX = '__mean'
+STDDEV_SUFFIX = '__stddev'
+
+# Rows sampled per sheet for schema inference
+SCHEMA_SAMPLE_ROWS = 10_000
+# A text column counts as numeric, or as composite, when this share of its
+# non-empty values parse
+NUMERIC_TEXT_THRESHOLD = 0.9
+
+
+def parse_mean_stddev(values):
+    """
+    Split composite "mean +/- stddev" strings into numbers.
+
+    Args:
+        values (pd.Series): Strings such as "83.7x_+/-_10.3x".
+    Returns:
+        pd.DataFrame with float32 mean and stddev columns, NaN where a value
+        does not match.
+    """
+    parts = values.astype('string').str.extract(MEAN_STDDEV_PATTERN)
+    return pd.DataFrame({
+        'mean': pd.to_numeric(parts['mean'], errors='coerce').astype(np.float32),
+        'stddev': pd.to_numeric(parts['stddev'], errors='coerce').astype(np.float32),
+    }, index=values.index)
+
+
+def is_mean_stddev(values):
+    """
+    True if most non-empty values of a text column are "mean +/- stddev" strings.
+
+    Placeholders such as "NA" or "-" in a few cells do not disqualify the
+    column; parse_mean_stddev turns them into NaN.
+    """
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return False
+    present = values.dropna().astype(str)
+    present = present[present.str.strip() != '']
+    return not present.empty and bool(present.str.fullmatch(MEAN_STDDEV_PATTERN).mean() >= NUMERIC_TEXT_THRESHOLD)
+
+
+def add_composite_columns(df):
+    """
+    Parse the composite metric columns of a sheet into typed columns.
+
+    Every "mean +/- stddev" text column gets two float32 companions, named
+    with MEAN_SUFFIX and STDDEV_SUFFIX, so plots read numbers instead of
+    parsing strings on each interaction. The original column is kept for
+    display.
+
+    Args:
+        df (pd.DataFrame): A parsed sheet.
+    Returns:
+        Tuple of the sheet with the added columns and a dict
+        {column: {'kind': 'mean_stddev', 'mean': name, 'stddev': name}}.
+    """
+    composites = {}
+    derived = {}
+    for column in df.columns:
+        if not is_mean_stddev(df[column]):
+            continue
+        parsed = parse_mean_stddev(df[column])
+        mean_column, stddev_column = f'{column}{MEAN_SUFFIX}', f'{column}{STDDEV_SUFFIX}'
+        derived[mean_column] = parsed['mean']
+        derived[stddev_column] = parsed['stddev']
+        composites[column] = {'kind': 'mean_stddev', 'mean': mean_column, 'stddev': stddev_column}
+
+    if derived:
+        df = df.assign(**derived)
+    return df, composites
+
+
+def infer_schema(df, composites=None, sample_rows=SCHEMA_SAMPLE_ROWS):
+    """
+    Describe each column of a sheet from a sample of its rows.
+
+    Runs once at ingest; the axis dropdowns are then filled from the
+    stored result instead of converting the sheet on every selection.
+
+    Args:
+        df (pd.DataFrame): A parsed sheet.
+        composites (dict): Output of add_composite_columns; their derived
+            columns are skipped and the source columns marked as such.
+        sample_rows (int): Rows to sample for cardinality and parsing.
+    Returns:
+        dict: {column: {'dtype', 'kind', 'cardinality', 'null_rate'}}, where
+        kind is 'numeric', 'composite', 'datetime' or 'text'. Cardinality is
+        counted in the sample, so it is a lower bound for large sheets.
+    """
+    composites = composites or {}
+    derived = {name for parsed in composites.values() for name in (parsed['mean'], parsed['stddev'])}
+    sample = df.sample(sample_rows, random_state=0) if len(df) > sample_rows else df
+
+    schema = {}
+    for column in df.columns:
+        if column in derived:
+            continue
+        values = sample[column]
+        present = values.dropna()
+        if column in composites:
+            kind = 'composite'
+        elif pd.api.types.is_bool_dtype(values):
+            kind = 'text'
+        elif pd.api.types.is_numeric_dtype(values):
+            kind = 'numeric'
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            kind = 'datetime'
+        elif len(present) and pd.to_numeric(present, errors='coerce').notna().mean() >= NUMERIC_TEXT_THRESHOLD:
+            kind = 'numeric'
+        else:
+            kind = 'text'
+        schema[column] = {
+            'dtype': str(df[column].dtype),
+            'kind': kind,
+            'cardinality': int(present.nunique()),
+            'null_rate': float(values.isna().mean()) if len(values) else 0.0,
+        }
+    return schema
@@ -0,0 +1,165 @@
+import math
+
+import pandas as pd
+from dash import Patch
+from dash.dash_table import DataTable
+
+
+DEFAULT_PAGE_SIZE = 10
+
+# Operators of the DataTable filter syntax, keyword first then symbol form.
+# Checked in order, so '>=' is tried before '>' and '!=' before '='.
+FILTER_OPERATORS = [
+    ('ge', '>='),
+    ('le', '<='),
+    ('lt', '<'),
+    ('gt', '>'),
+    ('ne', '!='),
+    ('eq', '='),
+    ('contains',),
+    ('datestartswith',),
+]
+
+
+def split_filter_part(filter_part):
+    """
+    Parse one clause of a DataTable filter_query, e.g. '{N50_[bp]} >= 50000'.
+
+    Returns:
+        tuple: (column, operator keyword, value), or (None, None, None) if it cannot be parsed.
+    """
+    name_end = filter_part.find('}')
+    name = filter_part[filter_part.find('{') + 1:name_end]
+    expression = filter_part[name_end + 1:].strip()
+
+    for operator_group in FILTER_OPERATORS:
+        for operator in operator_group:
+            if not expression.startswith(operator):
+                continue
+            value_part = expression[len(operator):].strip()
+            if len(value_part) > 1 and value_part[0] == value_part[-1] and value_part[0] in ("'", '"', '`'):
+                value = value_part[1:-1].replace('\\' + value_part[0], value_part[0])
+            else:
+                try:
+                    value = float(value_part)
+                except ValueError:
+                    value = value_part
+            return name, operator_group[0], value
+    return None, None, None
+
+
+def apply_filter(df, filter_query):
+    """Return the rows of df matching a DataTable filter_query."""
+    if not filter_query:
+        return df
+
+    mask = pd.Series(True, index=df.index)
+    for filter_part in filter_query.split(' && '):
+        col_name, operator, value = split_filter_part(filter_part)
+        if col_name not in df.columns:
+            continue
+        column = df[col_name]
+
+        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            if isinstance(value, float):
+                column = pd.to_numeric(column, errors='coerce')
+            else:
+                column = column.astype(str)
+            mask &= getattr(column, operator)(value)
+        elif operator == 'contains':
+            mask &= column.astype(str).str.contains(str(value), case=False, regex=False)
+        elif operator == 'datestartswith':
+            mask &= column.astype(str).str.startswith(str(value))
+    return df[mask]
+
+
+def apply_sort(df, sort_by):
+    """Sort df by the DataTable sort_by list of {'column_id', 'direction'}."""
+    sort_by = [col for col in (sort_by or []) if col['column_id'] in df.columns]
+    if not sort_by:
+        return df
+    return df.sort_values(
+        [col['column_id'] for col in sort_by],
+        ascending=[col['direction'] == 'asc' for col in sort_by],
+        kind='mergesort',
+        na_position='last',
+    )
+
+
+def table_page(df, page_current=0, page_size=DEFAULT_PAGE_SIZE, sort_by=None, filter_query='', columns=None):
+    """
+    Filter, sort and slice a frame for a server-side DataTable.
+
+    Args:
+        df (pd.DataFrame): The full, cached table.
+        page_current (int): Zero-based page index.
+        page_size (int): Rows per page.
+        sort_by (list): DataTable sort_by property.
+        filter_query (str): DataTable filter_query property.
+        columns (list): Column ids to send; defaults to all columns.
+    Returns:
+        tuple: (records for the visible page, page_count)
+    """
+    page_current = page_current or 0
+    page_size = page_size or DEFAULT_PAGE_SIZE
+    view = apply_sort(apply_filter(df, filter_query), sort_by)
+    if columns is not None:
+        view = view[columns]
+
+    page_count = max(1, math.ceil(len(view) / page_size))
+    start = min(page_current, page_count - 1) * page_size
+    return view.iloc[start:start + page_size].to_dict('records'), page_count
+
+
+def server_side_table(table_id, df, columns, page_size=DEFAULT_PAGE_SIZE, **table_props):
+    """
+    Build a DataTable that only ships its first page; later pages, sorting and
+    filtering are served by a callback calling table_page on the cached frame.
+
+    Args:
+        table_id (str): Component id the paging callback listens to.
+        df (pd.DataFrame): The full table.
+        columns (list): DataTable column definitions ({'name', 'id', ...}).
+        page_size (int): Rows per page.
+        **table_props: Styling passed through to DataTable.
+    """
+    data, page_count = table_page(df, 0, page_size, columns=[col['id'] for col in columns])
+    return DataTable(
+        id=table_id,
+        data=data,
+        columns=columns,
+        page_current=0,
+        page_size=page_size,
+        page_count=page_count,
+        page_action='custom',
+        sort_action='custom',
+        sort_mode='multi',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
+        **table_props
+    )
+
+
+def table_patch(df, columns, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Partial update that swaps the rows and columns of a rendered server_side_table.
+
+    Meant for the children of the table's container: only the first page
+    and the column definitions are sent, while the component and its
+    styling stay in place. Paging, sorting and filtering are reset.
+
+    Args:
+        df (pd.DataFrame): The new full table.
+        columns (list): DataTable column definitions ({'name', 'id', ...}).
+        page_size (int): Rows per page, as passed to server_side_table.
+    """
+    data, page_count = table_page(df, 0, page_size, columns=[col['id'] for col in columns])
+    patch = Patch()
+    patch['props']['data'] = data
+    patch['props']['columns'] = columns
+    patch['props']['page_count'] = page_count
+    patch['props']['page_current'] = 0
+    patch['props']['sort_by'] = []
+    patch['props']['filter_query'] = ''
+    return patch
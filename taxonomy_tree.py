@@ -0,0 +1,181 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from kraken_report import parent_index, report_depth
+
+
+TAXONOMY_INDEX_NAME = 'taxonomy.parquet'
+# Node id of the virtual top of the tree, above 'unclassified' and 'root'
+TOP_NODE = -1
+# Levels below the focused node sent per figure
+EXPLORER_DEPTH = 2
+# Children shown per node; the rest are folded into one "Other" segment
+EXPLORER_MAX_CHILDREN = 15
+
+
+def build_taxonomy_index(df):
+    """
+    Parent/child index of a Kraken2 report, written once at ingest.
+
+    Rows are sorted by parent and, within a parent, by clade reads, so the
+    children of any node are one contiguous slice found by binary search.
+
+    Args:
+        df (pd.DataFrame): Kraken report in report order.
+    Returns:
+        pd.DataFrame with node (report row), parent (-1 at the top), rank,
+        NCBI_tax_ID, name, reads_clade, reads_taxon and n_children columns.
+    """
+    depth = report_depth(df)
+    parents = parent_index(depth)
+    names = df['name'] if 'depth' in df.columns else df['name'].str.strip()
+    reads_clade = df['reads_clade'].to_numpy()
+
+    index = pd.DataFrame({
+        'node': np.arange(len(df), dtype=np.int64),
+        'parent': parents,
+        'rank': df['rank'].to_numpy(),
+        'NCBI_tax_ID': df['NCBI_tax_ID'].to_numpy(),
+        'name': names.to_numpy(),
+        'reads_clade': reads_clade,
+        'reads_taxon': df['reads_taxon'].to_numpy(),
+        'n_children': np.bincount(parents[parents >= 0], minlength=len(df)).astype(np.uint32),
+    })
+    order = np.lexsort((-reads_clade.astype(np.int64), parents))
+    return index.iloc[order].reset_index(drop=True)
+
+
+class TaxonomyTree:
+    """
+    Read access to a taxonomy index: children, lineage and single nodes.
+
+    Args:
+        index (pd.DataFrame): Output of build_taxonomy_index.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._parents = index['parent'].to_numpy()
+        self._row_of = np.empty(len(index), dtype=np.int64)
+        self._row_of[index['node'].to_numpy()] = np.arange(len(index))
+
+    def node(self, node):
+        """The index row of a node, as a Series."""
+        return self.index.iloc[self._row_of[node]]
+
+    def children(self, node):
+        """Children of a node, largest clade first."""
+        lo, hi = np.searchsorted(self._parents, [node, node + 1])
+        return self.index.iloc[lo:hi]
+
+    def parent(self, node):
+        return TOP_NODE if node == TOP_NODE else int(self._parents[self._row_of[node]])
+
+    def lineage(self, node):
+        """Nodes from the top of the tree down to node, both excluded."""
+        path = []
+        while node != TOP_NODE:
+            node = self.parent(node)
+            if node != TOP_NODE:
+                path.append(node)
+        return path[::-1]
+
+
+@lru_cache(maxsize=16)
+def load_taxonomy_tree(dataset_dir):
+    """TaxonomyTree of an ingested Kraken report; dataset directories never change, so it is cached."""
+    return TaxonomyTree(pd.read_parquet(os.path.join(dataset_dir, TAXONOMY_INDEX_NAME)))
+
+
+def taxonomy_sunburst(tree, node=TOP_NODE, depth=EXPLORER_DEPTH, max_children=EXPLORER_MAX_CHILDREN, sample_name=None):
+    """
+    Sunburst of the subtree below one node, a few levels deep.
+
+    Only the focused node and `depth` levels below it are included, with at
+    most `max_children` children per node, so the figure stays small for any
+    report size. Clicking a segment loads the levels below it.
+
+    Args:
+        tree (TaxonomyTree): The report's taxonomy.
+        node (int): Focused node, TOP_NODE for the whole report.
+        depth (int): Levels shown below the focused node.
+        max_children (int): Children kept per node.
+        sample_name (str): Shown in the title.
+    Returns:
+        Plotly figure; segment ids are node ids, "<parent>:other" for the
+        folded remainders.
+    """
+    ids, labels, parents, values, customdata = [], [], [], [], []
+
+    def add(segment_id, label, parent_id, value, rank='', tax_id='', reads_taxon='', n_children=0):
+        ids.append(segment_id)
+        labels.append(label)
+        parents.append(parent_id)
+        values.append(int(value))
+        customdata.append([rank, tax_id, reads_taxon, n_children])
+
+    if node == TOP_NODE:
+        top = tree.children(TOP_NODE)
+        title = "All reads"
+        add(str(TOP_NODE), title, '', top['reads_clade'].sum(), n_children=len(top))
+    else:
+        focus = tree.node(node)
+        title = str(focus['name'])
+        add(str(node), title, '', focus['reads_clade'], str(focus['rank']), int(focus['NCBI_tax_ID']),
+            int(focus['reads_taxon']), int(focus['n_children']))
+
+    frontier = [node]
+    for _ in range(depth):
+        next_frontier = []
+        for parent in frontier:
+            children = tree.children(parent)
+            children = children[children['reads_clade'] > 0]
+            shown, rest = children.iloc[:max_children], children.iloc[max_children:]
+            for row in shown.itertuples(index=False):
+                add(str(row.node), str(row.name), str(parent), row.reads_clade, str(row.rank),
+                    int(row.NCBI_tax_ID), int(row.reads_taxon), int(row.n_children))
+                if row.n_children:
+                    next_frontier.append(row.node)
+            if len(rest):
+                add(f'{parent}:other', f'Other ({len(rest)} taxa)', str(parent), rest['reads_clade'].sum())
+        frontier = next_frontier
+
+    fig = go.Figure(go.Sunburst(
+        ids=ids,
+        labels=labels,
+        parents=parents,
+        values=values,
+        customdata=customdata,
+        branchvalues='total',
+        hovertemplate='%{label}<br>Rank: %{customdata[0]}<br>TaxID: %{customdata[1]}'
+                      '<br>Clade reads: %{value}<br>Taxon reads: %{customdata[2]}<extra></extra>',
+        insidetextorientation='radial',
+    ))
+    fig.update_layout(
+        title=f"Taxonomy Explorer - {title}{f' ({sample_name})' if sample_name else ''}",
+        font=dict(size=12, color="white"),
+        paper_bgcolor="#1e1e1e",
+        margin=dict(t=60, l=10, r=10, b=10),
+    )
+    return fig
+
+
+def explorer_target(tree, focused, point_id):
+    """
+    Node to focus after a click on a sunburst segment, or None to keep the view.
+
+    The centre segment goes one level up; folded "Other" segments and leaves
+    have nothing to load.
+    """
+    if point_id is None or str(point_id).endswith(':other'):
+        return None
+    clicked = int(point_id)
+    if clicked == focused:
+        return None if focused == TOP_NODE else tree.parent(focused)
+    if clicked == TOP_NODE or not tree.node(clicked)['n_children']:
+        return None
+    return clicked
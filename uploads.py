@@ -0,0 +1,114 @@
+import os
+import re
+import tempfile
+import time
+
+from flask import jsonify, request
+
+
+DEFAULT_SPOOL_DIR = os.path.join(tempfile.gettempdir(), 'asm-dashboard-uploads')
+MAX_UPLOAD_BYTES = 2 * 1024 * 1024 * 1024
+# Unfinished uploads older than this are removed from the spool
+STALE_UPLOAD_SECONDS = 24 * 60 * 60
+READ_BLOCK_BYTES = 1024 * 1024
+
+_UPLOAD_ID = re.compile(r'^[A-Za-z0-9-]{16,64}$')
+
+
+def get_spool_dir():
+    return os.environ.get('DASHBOARD_SPOOL_DIR', DEFAULT_SPOOL_DIR)
+
+
+def _checked_id(upload_id):
+    # Upload ids end up in file names, so only accept plain uuid-like tokens
+    if not _UPLOAD_ID.match(upload_id or ''):
+        raise ValueError(f"Invalid upload id: {upload_id!r}")
+    return upload_id
+
+
+def upload_path(handle):
+    """Path of a completed upload in the spool directory."""
+    return os.path.join(get_spool_dir(), _checked_id(handle))
+
+
+def discard_upload(handle):
+    """Remove a completed upload from the spool once it has been ingested."""
+    try:
+        os.remove(upload_path(handle))
+    except FileNotFoundError:
+        pass
+
+
+def _remove_stale_uploads(spool_dir):
+    cutoff = time.time() - STALE_UPLOAD_SECONDS
+    for entry in os.scandir(spool_dir):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def register_upload_routes(server):
+    """
+    Add the chunked upload endpoints to the Flask server.
+
+    The browser (assets/chunked_upload.js) streams each file in slices to
+    POST /upload/<id>/chunk?offset=N, which appends them to a spool file,
+    then calls POST /upload/<id>/complete. The returned handle is what the
+    Dash callbacks receive instead of a base64 data URI.
+    """
+
+    @server.route('/upload/<upload_id>/chunk', methods=['POST'])
+    def receive_upload_chunk(upload_id):
+        try:
+            part_path = upload_path(upload_id) + '.part'
+            offset = int(request.args.get('offset', 0))
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+
+        spool_dir = get_spool_dir()
+        os.makedirs(spool_dir, exist_ok=True)
+        if offset == 0:
+            _remove_stale_uploads(spool_dir)
+            open(part_path, 'wb').close()
+
+        try:
+            received = os.path.getsize(part_path)
+        except FileNotFoundError:
+            return jsonify(error="Unknown upload"), 404
+        # A retried chunk may overlap what was already written, a gap is an error
+        if offset > received:
+            return jsonify(error=f"Expected offset {received}, got {offset}"), 409
+
+        with open(part_path, 'r+b') as fh:
+            fh.seek(offset)
+            while True:
+                block = request.stream.read(READ_BLOCK_BYTES)
+                if not block:
+                    break
+                if fh.tell() + len(block) > MAX_UPLOAD_BYTES:
+                    fh.close()
+                    os.remove(part_path)
+                    return jsonify(error="Upload too large"), 413
+                fh.write(block)
+            fh.truncate()
+            received = fh.tell()
+
+        return jsonify(received=received)
+
+    @server.route('/upload/<upload_id>/complete', methods=['POST'])
+    def complete_upload(upload_id):
+        try:
+            path = upload_path(upload_id)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+
+        payload = request.get_json(silent=True) or {}
+        filename = os.path.basename(str(payload.get('filename', '')))
+        try:
+            os.replace(path + '.part', path)
+        except FileNotFoundError:
+            return jsonify(error="Unknown upload"), 404
+
+        return jsonify(handle=upload_id, filename=filename, size=os.path.getsize(path))
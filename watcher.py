@@ -0,0 +1,219 @@
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process watches
+    fcntl = None
+
+from batch import find_workflow_outputs
+from ingest import content_hash, get_data_dir, ingest_kraken_report, ingest_workbook
+from jobs import get_executor
+from kraken_report import kraken_sample_label
+
+
+WATCH_INDEX_NAME = 'watch-index.json'
+DEFAULT_WATCH_INTERVAL = 10
+# A file is ingested once its size and mtime have not changed for this long
+DEFAULT_WATCH_SETTLE = 5
+
+logger = logging.getLogger('dashboard.watcher')
+
+
+def get_watch_dir():
+    """Results directory to watch (DASHBOARD_WATCH_DIR), or None when watching is off."""
+    return os.environ.get('DASHBOARD_WATCH_DIR') or None
+
+
+def get_watch_index_path():
+    return os.path.join(get_data_dir(), WATCH_INDEX_NAME)
+
+
+def read_watch_index(path=None):
+    """
+    The watcher's index: {'files': {path relative to the watched directory:
+    {'kind', 'label', 'mtime_ns', 'size', 'sha256', 'dataset', 'error'}}}.
+    """
+    try:
+        with open(path or get_watch_index_path()) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'files': {}}
+
+
+def watched_datasets(kind, index=None):
+    """
+    Ingested files of one kind ('workbook' or 'kraken'), sorted by label.
+
+    Returns:
+        list of (key, label, dataset directory); the key is the file's path
+        relative to the watched directory.
+    """
+    files = (index or read_watch_index())['files']
+    entries = [(key, entry['label'], entry['dataset']) for key, entry in files.items()
+               if entry['kind'] == kind and entry.get('dataset') and os.path.isdir(entry['dataset'])]
+    return sorted(entries, key=lambda entry: entry[1])
+
+
+def _is_available(entry):
+    # Failed files wait for a change; ingested ones are redone if the catalog evicted them
+    return bool(entry.get('error')) or bool(entry.get('dataset') and os.path.isdir(entry['dataset']))
+
+
+def _write_index(path, index):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as fh:
+        json.dump(index, fh)
+    os.replace(tmp_path, path)
+
+
+class ResultsWatcher:
+    """
+    Polls a results directory and ingests new or changed workflow outputs.
+
+    A file is picked up once its size and mtime have stayed the same for
+    `settle` seconds, so files still being copied are not parsed half
+    written. A changed mtime alone does not re-ingest a file: its SHA-256 is
+    compared with the indexed one first. Ingest runs in the shared process
+    pool of jobs.py, into the regular data directory, so uploads of the same
+    files reuse the conversion.
+
+    Args:
+        results_dir (str): Directory to watch.
+        index_path (str): Where the index is kept.
+        settle (float): Seconds a file must be unchanged before it is ingested.
+    """
+
+    def __init__(self, results_dir, index_path=None, settle=DEFAULT_WATCH_SETTLE):
+        self.results_dir = results_dir
+        self.index_path = index_path or get_watch_index_path()
+        self.settle = settle
+        self._pending = {}
+
+    def scan(self, now=None):
+        """
+        One pass over the results directory.
+
+        Returns:
+            int: Number of files ingested, re-ingested or removed.
+        """
+        now = time.monotonic() if now is None else now
+        index = read_watch_index(self.index_path)
+        files = index['files']
+        workbooks, reports = find_workflow_outputs(self.results_dir)
+        found = {os.path.relpath(path, self.results_dir): (path, 'workbook') for path in workbooks}
+        found.update({os.path.relpath(path, self.results_dir): (path, 'kraken') for path in reports})
+
+        changes = 0
+        for key in set(files) - set(found):
+            logger.info("Removed from watch index: %s", key)
+            del files[key]
+            changes += 1
+
+        ready = []
+        for key, (path, kind) in found.items():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            entry = files.get(key)
+            if entry is not None and (entry['mtime_ns'], entry['size']) == signature and _is_available(entry):
+                self._pending.pop(key, None)
+                continue
+            # Debounce: wait until the file has stopped changing
+            seen = self._pending.get(key)
+            if seen is None or seen[0] != signature:
+                self._pending[key] = (signature, now)
+                continue
+            if now - seen[1] >= self.settle:
+                del self._pending[key]
+                ready.append((key, path, kind, signature))
+
+        futures = []
+        for key, path, kind, (mtime_ns, size) in ready:
+            entry = files.get(key)
+            sha256 = content_hash(path)
+            if entry is not None and entry['sha256'] == sha256 and _is_available(entry) and not entry.get('error'):
+                entry.update(mtime_ns=mtime_ns, size=size)
+                continue
+            if entry is not None:
+                label = entry['label']
+            elif kind == 'kraken':
+                label = kraken_sample_label(os.path.basename(path), {e['label'] for e in files.values() if e['kind'] == 'kraken'})
+            else:
+                label = key
+            files[key] = {'kind': kind, 'label': label, 'mtime_ns': mtime_ns, 'size': size,
+                          'sha256': sha256, 'dataset': None, 'error': None}
+            if kind == 'workbook':
+                # The run history is dated by when the workflow wrote the file
+                run_date = datetime.date.fromtimestamp(mtime_ns / 1e9)
+                future = get_executor().submit(ingest_workbook, path, filename=os.path.basename(path), run_date=run_date)
+            else:
+                future = get_executor().submit(ingest_kraken_report, path, filename=os.path.basename(path))
+            futures.append((key, future))
+
+        for key, future in futures:
+            try:
+                files[key]['dataset'] = future.result()
+                logger.info("Ingested %s", key)
+            except Exception as e:
+                files[key]['error'] = str(e)
+                logger.error("Could not ingest %s: %s", key, e)
+            changes += 1
+
+        if changes or ready:
+            index['results_dir'] = os.path.abspath(self.results_dir)
+            _write_index(self.index_path, index)
+        return changes
+
+    def run(self, interval=DEFAULT_WATCH_INTERVAL, stop=None):
+        """
+        Scan every `interval` seconds until stop (a threading.Event) is set.
+
+        With several web workers only the one holding the index lock scans;
+        the others keep trying, and take over if it exits.
+        """
+        stop = stop or threading.Event()
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        with open(self.index_path + '.lock', 'w') as lock:
+            while not stop.is_set():
+                try:
+                    if fcntl is not None:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    stop.wait(interval)
+                    continue
+                try:
+                    self.scan()
+                except Exception:
+                    logger.exception("Scan of %s failed", self.results_dir)
+                stop.wait(interval)
+
+
+def start_watcher():
+    """
+    Start the watcher thread if DASHBOARD_WATCH_DIR is set.
+
+    DASHBOARD_WATCH_INTERVAL (default 10) and DASHBOARD_WATCH_SETTLE
+    (default 5) are in seconds.
+
+    Returns:
+        The started thread, or None.
+    """
+    results_dir = get_watch_dir()
+    # Spawned ingest workers import the app module too; only the web process watches
+    if results_dir is None or multiprocessing.current_process().name != 'MainProcess':
+        return None
+    watcher = ResultsWatcher(results_dir, settle=float(os.environ.get('DASHBOARD_WATCH_SETTLE', DEFAULT_WATCH_SETTLE)))
+    interval = float(os.environ.get('DASHBOARD_WATCH_INTERVAL', DEFAULT_WATCH_INTERVAL))
+    thread = threading.Thread(target=watcher.run, args=(interval,), name='results-watcher', daemon=True)
+    thread.start()
+    logger.info("Watching %s every %ss", results_dir, interval)
+    return thread